@@ -9,61 +9,119 @@ presented by LiYongKang
 import pygame
 import sys
 from multiprocessing import Event, Queue
+import queue
 import random
-from utils import Message
+from utils import decode_frame, decode_snapshot, FRAME_INIT_FLOOR, FRAME_INIT_ELEVATOR, FRAME_INIT_PASSENGER, FRAME_ELEVATOR, FRAME_PASSENGER
 import time
 import os
-#定义常量
+import math
+import numpy as np
+from motion import AnimationClock, MotionTable, MovingSprite
+from tick_log import DEBUG, TickLog
+from viewport import Camera, ShaftLayout
+#定义常量（世界坐标，见 viewport.py；电梯井、墙和销毁位置的横坐标由 ShaftLayout 按电梯数计算）
 WAITING = 100
 WAITING_RANDOM = 50
-ELEVATOR_X = [250, 350, 450, 550, 650]
 ELEVATOR_RANDOM = 24
-DESTROY = 750
 FLOOR_HEIGHT = 96
+#缩放级别低于 LOD_ZOOM 时不画乘客，改为显示每层的等待人数和每台电梯的载客数；
+#任何缩放级别下一层等待的人超过 CROWD_LIMIT 时，多出来的乘客也不画，只显示人数
+LOD_ZOOM = 0.375
+CROWD_LIMIT = 10
+#W/A/S/D 平移速度（屏幕像素/秒）和鼠标滚轮一格滚动的屏幕像素
+PAN_SPEED = 800
+SCROLL_STEP = 60
+LABEL_SIZE = 22
+LABEL_COLOR = (20, 20, 20)
 MAX_FRAME = 60
+#每个 tick 的动画时长（秒，1 倍速时）
 RATE = 0.05
+CAPTION = "电梯调度算法可视化"
+#回放模式的跳转按键 -> 步数偏移（None 表示跳到开头/结尾）
+REPLAY_KEYS = {
+    pygame.K_LEFT: -1,
+    pygame.K_RIGHT: 1,
+    pygame.K_PAGEUP: -100,
+    pygame.K_PAGEDOWN: 100,
+    pygame.K_HOME: None,
+    pygame.K_END: None,
+}
 SPRITEDIR = 'Sprite'
 
 SCREEN_WIDTH = 800
 SCREEN_HEIGHT = 800
 
-#楼层的高度不是最大6层，因此必须要根据楼层的高度来动态调整每个sprite的大小。
-#默认楼层高度是6层
-DEFAULT_FLOOR = 6
-num_of_floors = 0
-scale_factor = 1.0
-
-#楼层到y坐标的转换函数，记住，楼层是从第0层开始的。
-#根据scale factor调整每一层层间距的大小。
-def Floor_To_Y(floor, scale_factor = 1.0):
-    print(scale_factor)
-    return SCREEN_HEIGHT - 100 - (floor) * FLOOR_HEIGHT * scale_factor
-
-
 
 # 设置颜色
 GRAY = (200, 200, 200)
 
+
+class SpriteCache:
+    '''
+    贴图缓存：Sprite 目录下的每个文件只解码一次，并转换成与屏幕相同的像素格式，
+    缩放后的结果按 (文件名, 缩放参数) 缓存。缩放比例变化（摄像机换了缩放级别）时丢弃旧的缩放结果。
+    必须在 pygame.display.set_mode 之后使用
+    '''
+    def __init__(self, directory = SPRITEDIR):
+        self.directory = directory
+        self.scale_factor = None
+        self._images = {}
+        self._scaled = {}
+
+    def set_scale(self, scale_factor):
+        if scale_factor != self.scale_factor:
+            self.scale_factor = scale_factor
+            self._scaled.clear()
+
+    def image(self, name):
+        '''原始尺寸的贴图'''
+        image = self._images.get(name)
+        if image is None:
+            image = pygame.image.load(os.path.join(self.directory, name))
+            #带透明通道的 PNG 用 convert_alpha，其余用 convert，之后的 blit 不再需要逐像素转换格式
+            image = image.convert_alpha() if image.get_flags() & pygame.SRCALPHA else image.convert()
+            self._images[name] = image
+        return image
+
+    def scaled(self, name, scale_x = None, scale_y = None):
+        '''按当前缩放比例缩放的贴图；scale_x/scale_y 为 None 时使用当前比例，也可以单独指定某个方向的比例'''
+        scale_x = self.scale_factor if scale_x is None else scale_x
+        scale_y = self.scale_factor if scale_y is None else scale_y
+        key = (name, scale_x, scale_y)
+        image = self._scaled.get(key)
+        if image is None:
+            image = self.image(name)
+            image = pygame.transform.scale(image, (int(image.get_width() * scale_x), int(image.get_height() * scale_y)))
+            self._scaled[key] = image
+        return image
+
+    def sized(self, name, size):
+        '''缩放到指定尺寸的贴图'''
+        key = (name, size)
+        image = self._scaled.get(key)
+        if image is None:
+            image = pygame.transform.scale(self.image(name), size)
+            self._scaled[key] = image
+        return image
+
 # 定义电梯类
-class Elevator(pygame.sprite.Sprite):
+class Elevator(MovingSprite, pygame.sprite.DirtySprite):
     #输入的x和y是电梯锚点的位置，锚点位于image的bottom center位置上
-    def __init__(self, x, y, _image_path = None, _id = None, scale_factor = 1.0):
+    #anchor/src/target 保存在 motion（MotionTable）中，由 MotionTable.step 统一插值
+    #进入屏幕时加入绘制用的精灵组的哪一层
+    scene_layer = 1
+    def __init__(self, x, y, _image_path = None, _id = None, scale_factor = 1.0, image = None, motion = None):
         super().__init__()
-        #加载图像并进行缩放
-        self.image = pygame.image.load(_image_path) 
-        self.image = pygame.transform.scale_by(self.image, scale_factor)
+        #加载图像并进行缩放；传入 image 时直接使用已经缩放好的（缓存中的）贴图
+        if image is None:
+            image = pygame.transform.scale_by(pygame.image.load(_image_path), scale_factor)
+        self.image = image
         self.id = _id
-        #定义sprite的锚点
-        self.anchor = [x, y]
-        self.src = [x,y]
         self.rect = self.image.get_rect()
-        self.rect.x = self.anchor[0] - self.rect.width // 2
-        self.rect.y = self.anchor[1] - self.rect.height
+        #定义sprite的锚点
+        self.attach_motion(motion if motion is not None else MotionTable(1), x, y)
         self.velocityx = 0
         self.velocityy = 0
-
-        self.target = (x, y)
-        
     
     def Rect_To_Anchor(self):
         self.anchor = (self.rect.x + self.rect.width // 2, self.rect.y + self.rect.height)
@@ -72,32 +130,25 @@ class Elevator(pygame.sprite.Sprite):
         self.rect.x = self.anchor[0] - self.rect.width // 2
         self.rect.y = self.anchor[1] - self.rect.height
         return self.rect
-
-    def update(self, frame):
-        #根据anchor和target之间的距离，计算相对位置
-        self.anchor[0] = self.anchor[0] + (self.target[0] - self.src[0]) * 1 / (MAX_FRAME * RATE)
-        self.anchor[1] = self.anchor[1] + (self.target[1] - self.src[1]) * 1 / (MAX_FRAME * RATE)
-        self.Anchor_To_Rect()
-        if frame >= (MAX_FRAME * RATE):
-            self.src = self.anchor.copy()
         
 
 # 定义乘客类
-class Person(pygame.sprite.Sprite):
-    def __init__(self, x, y, _image_path, _id = None, scale_factor = 1.0):
+class Person(MovingSprite, pygame.sprite.DirtySprite):
+    scene_layer = 2
+    motion_tag = 1
+
+    def __init__(self, x, y, _image_path = None, _id = None, scale_factor = 1.0, image = None, motion = None):
         super().__init__()
-        #加载图像并进行缩放
-        self.image = pygame.image.load(_image_path) 
-        self.image = pygame.transform.scale_by(self.image, scale_factor)
+        #加载图像并进行缩放；传入 image 时直接使用已经缩放好的（缓存中的）贴图
+        if image is None:
+            image = pygame.transform.scale_by(pygame.image.load(_image_path), scale_factor)
+        self.image = image
         self.id = _id
-        #定义sprite的锚点
-        self.anchor = [x, y]
-        self.src = [x,y]
         self.rect = self.image.get_rect()
-        self.rect.x = self.anchor[0] - self.rect.width // 2
-        self.rect.y = self.anchor[1] - self.rect.height
-
-        self.target = (x, y)
+        #定义sprite的锚点
+        self.attach_motion(motion if motion is not None else MotionTable(1), x, y)
+        #所在电梯的 id，不在电梯里时为 None（解耦模式使用）
+        self.elevator = None
     
     def Rect_To_Anchor(self):
         self.anchor = (self.rect.x + self.rect.width // 2, self.rect.y + self.rect.height)
@@ -106,53 +157,412 @@ class Person(pygame.sprite.Sprite):
         self.rect.x = self.anchor[0] - self.rect.width // 2
         self.rect.y = self.anchor[1] - self.rect.height
         return self.rect
-    
-    def update(self, frame):
-        if self.anchor[0] == DESTROY:
-            return
-        #根据anchor和target之间的距离，计算相对位置
-        self.anchor[0] = self.anchor[0] + (self.target[0] - self.src[0]) * 1 / (MAX_FRAME * RATE)
-        self.anchor[1] = self.anchor[1] + (self.target[1] - self.src[1]) * 1 / (MAX_FRAME * RATE)
-        self.Anchor_To_Rect()
-        if frame >= (MAX_FRAME * RATE):
-            self.src = self.anchor.copy()
+            
+   
+class SpriteRegistry:
+    '''
+    按 id 索引的精灵表，同时维护用于 update/draw 的精灵组。
+    查找是 O(1) 的字典访问，不依赖精灵的创建顺序；已经 kill 的精灵由 evict 移出。
+    scene 为 None 时不负责绘制（GUI 中电梯和乘客只在进入屏幕时才加入绘制用的精灵组，见 MotionTable 的视野裁剪）
+    '''
+    def __init__(self, scene = None, layer = 0):
+        self.group = pygame.sprite.Group()
+        self.sprites = {}
+        #绘制用的分层精灵组（LayeredDirty），精灵同时加入其中的 layer 层
+        self.scene = scene
+        self.layer = layer
+
+    def add(self, id, sprite):
+        #id 重复（例如新一轮流量的乘客重新从 1 编号）时替换旧的精灵
+        old = self.sprites.get(id)
+        if old is not None:
+            old.kill()
+        self.sprites[id] = sprite
+        self.group.add(sprite)
+        if self.scene is not None:
+            self.scene.add(sprite, layer = self.layer)
+
+    def get(self, id):
+        return self.sprites.get(id)
+
+    def evict(self, sprites = None):
+        '''移除已经离开所有精灵组的精灵；给出 sprites 时只检查这些精灵'''
+        if sprites is None:
+            sprites = self.sprites.values()
+        dead = [sprite.id for sprite in sprites if not sprite.alive() and self.sprites.get(sprite.id) is sprite]
+        for id in dead:
+            del self.sprites[id]
+        return len(dead)
+
+    def clear(self):
+        for sprite in self.sprites.values():
+            sprite.kill()
+        self.group.empty()
+        self.sprites.clear()
+
+    def __contains__(self, id):
+        return id in self.sprites
+
+    def __len__(self):
+        return len(self.sprites)
+
+    def keys(self):
+        return self.sprites.keys()
+
+    def items(self):
+        return self.sprites.items()
+
+    def values(self):
+        return self.sprites.values()
         
             
    
  
-def GUI(start_event, finish_event, message_queue):
+def GUI(start_event, finish_event, message_queue, decoupled = False, shared_state = None, replay = None, replay_start = 0,
+        log_level = 'warning', log_file = None, metrics_file = None, metrics_port = None):
+    '''
+    decoupled=False：与调度算法锁步，消费增量消息，播放完一个 tick 的动画后再通知算法继续
+    两种模式下 message_queue 中的每个元素都是一个 tick 的紧凑编码帧 (bytes)：
+    锁步模式为 utils.FrameBuilder 编码的消息记录，解耦模式为 utils.encode_snapshot 编码的完整快照。
+    decoupled=True：调度算法从不等待 GUI，
+    GUI 每帧只取最新的一份，落后时直接跳过中间的 tick
+    shared_state 不为 None 时（共享内存表的名字），解耦模式的状态直接从共享内存读取，不再使用 message_queue
+    replay 不为 None 时（trace 文件路径），不需要调度算法和模拟器，直接回放 trace，从第 replay_start 步开始；
+    左/右 前后一步，PageUp/PageDown 前后 100 步，Home/End 跳到开头/结尾
+    视图：鼠标滚轮或拖动、W/A/S/D 平移，Ctrl+滚轮或 [ / ] 以鼠标位置为中心缩放，F 切换全楼概览；
+    只有屏幕内的电梯和乘客参与绘制，缩小到 LOD_ZOOM 以下时乘客换成每层的等待人数和每台电梯的载客数，
+    一层等待的人超过 CROWD_LIMIT 时只画前 CROWD_LIMIT 个
+    log_level / log_file：GUI 进程自己的日志（见 tick_log.py）
+    metrics_file / metrics_port：GUI 进程自己的埋点（帧耗时、慢帧、跳过的 tick），见 metrics.py
+    '''
+    log = TickLog(log_file, log_level)
+    metrics = None
+    if metrics_file is not None or metrics_port is not None:
+        from metrics import Metrics
+        metrics = Metrics(prefix = 'elevator_gui', snapshot_path = metrics_file, port = metrics_port)
+        frame_hist = metrics.histogram('frame_seconds')
+    last_snapshot_tick = None
+    last_snapshot_round = None
     # 初始化 Pygame
     pygame.init()
 
     # 设置窗口大小
     screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-    pygame.display.set_caption("电梯调度算法可视化")
-
-    #创建环境精灵组
-    background = pygame.sprite.Sprite()
-    background.image = pygame.image.load(os.path.join(SPRITEDIR, 'background.png'))
-
-    wall = pygame.sprite.Sprite()
-    wall.image = pygame.image.load(os.path.join(SPRITEDIR, 'wall.png'))
-    wall.rect = wall.image.get_rect()
-    wall.rect.x = 700
-
-    floors = pygame.sprite.Group()
-    
-    
-    floorbackgrounds = pygame.sprite.Group()
-    
-
+    pygame.display.set_caption(CAPTION)
+    sprite_cache = SpriteCache()
+
+    #电梯井布局和摄像机：精灵的位置都是世界坐标，摄像机决定屏幕上显示哪一部分、缩放多少
+    layout = ShaftLayout()
+    camera = Camera(SCREEN_WIDTH, SCREEN_HEIGHT, FLOOR_HEIGHT)
+    sprite_cache.set_scale(camera.zoom)
+    view_version = None
+    #缩小到 LOD_ZOOM 以下时为 True：乘客不参与绘制，改为显示人数标签
+    lod = False
+    view_overview = False
 
     # 创建电梯和乘客的精灵组
-    elevators = pygame.sprite.Group()
-    passengers = pygame.sprite.Group()
-    tunnels = pygame.sprite.Group()
+    #保留模式渲染：屏幕内的楼层背景和电梯井烘焙进背景图，楼板和墙壁烘焙进最上层的覆盖图，
+    #只有移动的电梯和乘客产生脏矩形，每帧只重绘并提交这些矩形；视图变化时重新烘焙
+    scene = pygame.sprite.LayeredDirty()
+    overlay = pygame.sprite.DirtySprite()
+    overlay.image = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT), pygame.SRCALPHA)
+    overlay.rect = overlay.image.get_rect()
+    scene.add(overlay, layer = 3)
+    static_dirty = True
+
+    #所有电梯和乘客的位置、起点、目标保存在同一张数组表中，每帧批量插值；
+    #只有屏幕内的精灵在绘制用的精灵组里，进入/离开屏幕时由 motion 通知
+    motion = MotionTable(screen_size = (SCREEN_WIDTH, SCREEN_HEIGHT))
+
+    def sprite_enter(sprite):
+        scene.add(sprite, layer = sprite.scene_layer)
+
+    def sprite_leave(sprite):
+        scene.remove(sprite)
+
+    motion.on_enter = sprite_enter
+    motion.on_leave = sprite_leave
+
+    #按 id 索引
+    elevator_sprites = SpriteRegistry()
+    passenger_sprites = SpriteRegistry()
+    elevators = elevator_sprites.group
+    passengers = passenger_sprites.group
+
+    #人数标签：楼层 -> 标签，电梯 id -> 标签；数字的贴图按人数缓存
+    label_font = pygame.font.Font(None, LABEL_SIZE)
+    label_images = {}
+    floor_labels = {}
+    elevator_labels = {}
+    #每个 tick 统计一次的每层等待人数和每台电梯的载客数
+    waiting_count = np.zeros(0, dtype = np.int64)
+    riding_count = []
+    counts_dirty = False
+    #是否有楼层等待的人超过 CROWD_LIMIT
+    crowded = False
 
     elevator_num = 0
-
-    #处理特殊情况使用的队列
-    delayed_queue = Queue()
+    num_of_floors = 0
+
+    if shared_state is not None:
+        from shared_state import SharedWorldState
+        shared_state = SharedWorldState(shared_state)
+        decoupled = True
+    shared_seq = -1
+
+    def init_floors(n):
+        '''设定楼层数；换了一栋楼时重新计算布局，摄像机缩放到合适的级别并对准一楼'''
+        nonlocal num_of_floors, static_dirty
+        num_of_floors = n
+        static_dirty = True
+        log.info('gui_floors', floors=num_of_floors)
+        #回放跳转等重建同一栋楼的场景时保留当前视图
+        if n != camera.num_floors:
+            layout.resize(0)
+            camera.fit(layout.width, n)
+
+    def init_elevator(id, floor_number):
+        '''创建电梯精灵，电梯井在烘焙静态图层时画出；电梯多到放不下时加宽布局并重新调整摄像机'''
+        nonlocal elevator_num, static_dirty
+        static_dirty = True
+        new_elevator = Elevator(layout.shaft_x(elevator_num), camera.world_y(floor_number), image = sprite_cache.scaled('elevator.png'), motion = motion)
+        new_elevator.id = id
+        new_elevator.image_name = 'elevator.png'
+        log.info('gui_elevator', elevator=id, floor=floor_number)
+        elevator_sprites.add(id, new_elevator)
+        elevator_num += 1
+        if elevator_num > layout.num_elevators and layout.resize(elevator_num):
+            camera.fit(layout.width, num_of_floors)
+        return new_elevator
+
+    def init_passenger(id, floor_number):
+        '''在waiting位置上随机偏移一个位置生成对应的角色，先创建在camera外面，然后走进视野内'''
+        target = random.randint(1,4)
+        new_person = Person(-100, camera.world_y(floor_number), image = sprite_cache.scaled(f'passenger{target}.png'), motion = motion)
+        new_person.target = (WAITING + random.randint(-WAITING_RANDOM,WAITING_RANDOM), camera.world_y(floor_number))
+        new_person.src = new_person.anchor.copy()
+        new_person.id = id
+        new_person.image_name = f'passenger{target}.png'
+        passenger_sprites.add(id, new_person)
+        return new_person
+
+    def reset_scene():
+        '''清空所有楼层、电梯和乘客，下一份快照会重新创建整个场景'''
+        nonlocal elevator_num, num_of_floors, static_dirty
+        elevator_sprites.clear()
+        passenger_sprites.clear()
+        clear_labels()
+        elevator_num = 0
+        num_of_floors = 0
+        static_dirty = True
+
+    def update_view():
+        '''摄像机变化后：换成当前缩放级别的贴图，重新摆放并裁剪所有精灵，切换 LOD，重新烘焙静态图层'''
+        nonlocal view_version, lod, static_dirty
+        view_version = camera.version
+        zoom = camera.zoom
+        if zoom != sprite_cache.scale_factor:
+            sprite_cache.set_scale(zoom)
+            for registry in (elevator_sprites, passenger_sprites):
+                for sprite in registry.values():
+                    sprite.image = sprite_cache.scaled(sprite.image_name)
+                    sprite.rect.size = sprite.image.get_size()
+                    motion.resize(sprite)
+        motion.set_view(camera.x0, camera.y0, zoom)
+        if (zoom < LOD_ZOOM) != lod:
+            lod = not lod
+            count_passengers()
+        static_dirty = True
+
+    def clear_labels():
+        for labels in (floor_labels, elevator_labels):
+            for label in labels.values():
+                label.kill()
+            labels.clear()
+
+    def set_label(labels, key, count, position = None, anchor = 'midbottom'):
+        '''显示人数标签，rect 的 anchor 点（默认底边中点）在屏幕坐标 position 处；count 为 0 或 position 为 None 时移除'''
+        label = labels.get(key)
+        if count <= 0 or position is None:
+            if label is not None:
+                label.kill()
+                del labels[key]
+            return
+        if label is None:
+            label = pygame.sprite.DirtySprite()
+            label.count = None
+            label.rect = pygame.Rect(0, 0, 0, 0)
+            labels[key] = label
+            scene.add(label, layer = 4)
+        if label.count != count:
+            label.count = count
+            label.image = label_images.get(count)
+            if label.image is None:
+                label.image = label_images[count] = label_font.render(str(count), True, LABEL_COLOR).convert_alpha()
+            label.rect.size = label.image.get_size()
+            label.dirty = 1
+        if getattr(label.rect, anchor) != position:
+            setattr(label.rect, anchor, position)
+            label.dirty = 1
+
+    def count_passengers():
+        '''
+        按乘客的目标位置统计每层的等待人数（目标在等待区）和每台电梯的载客数（目标在电梯井，不含走向销毁位置的），
+        并隐藏不画的乘客：LOD 时全部隐藏，否则每层等待的乘客按槽位排在 CROWD_LIMIT 之后的隐藏
+        '''
+        nonlocal waiting_count, riding_count, counts_dirty, crowded
+        counts_dirty = False
+        slots = motion.tagged(Person.motion_tag)
+        x = motion.target[slots, 0]
+        y = motion.target[slots, 1]
+        waiting = x < layout.first - layout.spacing // 2
+        floor = np.clip(np.rint(-y / FLOOR_HEIGHT).astype(np.int64), 0, max(num_of_floors - 1, 0))
+        waiting_count = np.bincount(floor[waiting], minlength = num_of_floors)
+        crowded = bool((waiting_count > CROWD_LIMIT).any())
+        riding = ~waiting & (x != layout.destroy_x)
+        car = np.clip(layout.shaft_index(x[riding]).astype(np.int64), 0, max(elevator_num - 1, 0))
+        riding_count = np.bincount(car, minlength = elevator_num).tolist()
+
+        if lod:
+            hidden = np.ones(len(slots), dtype = bool)
+        else:
+            hidden = np.zeros(len(slots), dtype = bool)
+            waiting_slots = np.flatnonzero(waiting)
+            order = waiting_slots[np.argsort(floor[waiting_slots], kind = 'stable')]
+            sorted_floor = floor[order]
+            rank = np.arange(len(order)) - np.searchsorted(sorted_floor, sorted_floor)
+            hidden[order] = rank >= CROWD_LIMIT
+        motion.set_hidden(slots, hidden)
+
+    def update_labels():
+        '''
+        每帧更新屏幕内的人数标签。楼层标签：LOD 时为每层的等待人数，否则只标出等待的人超过 CROWD_LIMIT 的楼层；
+        缩得很小、一层放不下一个标签时把相邻的几层合并成一个标签。LOD 时电梯上方显示载客数（电梯井太窄时不显示）
+        '''
+        zoom = camera.zoom
+        band = max(1, math.ceil(label_font.get_linesize() / (FLOOR_HEIGHT * zoom)))
+        visible = camera.visible_floors()
+        first = visible.start // band * band
+        counts = waiting_count[first:visible.stop]
+        counts = np.add.reduceat(counts, np.arange(0, len(counts), band)).tolist() if len(counts) else []
+        shown = set()
+        label_x = max(camera.screen_x(WAITING - WAITING_RANDOM), 0)
+        for i, count in enumerate(counts):
+            floor = first + i * band
+            if not lod and count <= CROWD_LIMIT:
+                continue
+            shown.add(floor)
+            set_label(floor_labels, floor, count, (label_x, camera.screen_y(camera.world_y(floor))), 'bottomleft')
+        for floor in [floor for floor in floor_labels if floor not in shown]:
+            set_label(floor_labels, floor, 0)
+        wide = layout.spacing * zoom >= LABEL_SIZE
+        for id, elevator in elevator_sprites.items():
+            on_screen = lod and wide and elevator.motion_slot is not None and motion.visible[elevator.motion_slot]
+            count = riding_count[id] if on_screen and id < len(riding_count) else 0
+            set_label(elevator_labels, id, count, elevator.rect.midtop)
+
+    def apply_snapshot(snapshot):
+        '''
+        用一份完整快照重新设定所有精灵的目标位置（解耦模式）。
+        所有精灵都从当前位置出发重新插值，因此中间被跳过的 tick 不会造成跳变以外的问题
+        '''
+        nonlocal last_snapshot_tick, last_snapshot_round, counts_dirty
+        counts_dirty = True
+        if snapshot.num_floors <= 0:
+            #调度算法还没有初始化完成
+            return
+        new_round = snapshot.round != last_snapshot_round
+        #解耦模式下 GUI 跟不上时中间的 tick 会被跳过（新一轮流量 tick 从头开始，不算）
+        if metrics is not None and not new_round and snapshot.tick > last_snapshot_tick + 1:
+            metrics.inc('dropped_ticks', snapshot.tick - last_snapshot_tick - 1)
+        last_snapshot_tick = snapshot.tick
+        last_snapshot_round = snapshot.round
+        if new_round or snapshot.num_floors != num_of_floors:
+            #第一次收到快照或切换了流量：新一轮的乘客 id 从 1 重新编号，即使楼层数相同也要重建整个场景
+            reset_scene()
+            init_floors(snapshot.num_floors)
+
+        for id, floor_number in enumerate(snapshot.elevators):
+            elevator = elevator_sprites.get(id)
+            if elevator is None:
+                elevator = init_elevator(id, floor_number)
+            elevator.target = (layout.shaft_x(id), camera.world_y(floor_number))
+
+        #等待的乘客只需要找出新来的（集合运算，不逐个访问已有的精灵），编号按到达顺序递增
+        waiting = dict(snapshot.waiting)
+        for id in sorted(waiting.keys() - passenger_sprites.keys()):
+            init_passenger(id, waiting[id])
+
+        present = set(waiting)
+        for id, elevator_id in snapshot.riding:
+            present.add(id)
+            y = camera.world_y(snapshot.elevators[elevator_id])
+            passenger = passenger_sprites.get(id)
+            if passenger is None:
+                #错过了这位乘客的等待阶段，直接在电梯里生成
+                passenger = init_passenger(id, snapshot.elevators[elevator_id])
+                passenger.anchor = [layout.shaft_x(elevator_id), y]
+            if passenger.elevator != elevator_id:
+                #走进电梯
+                passenger.elevator = elevator_id
+                passenger.target = (layout.shaft_x(elevator_id)+random.randint(-ELEVATOR_RANDOM,ELEVATOR_RANDOM), y)
+            else:
+                #随电梯移动
+                passenger.target = (passenger.target[0], y)
+
+        for id in passenger_sprites.keys() - present:
+            passenger = passenger_sprites.get(id)
+            if passenger.target[0] != layout.destroy_x:
+                #已经到达目的地，前往销毁位置处
+                passenger.target = (layout.destroy_x, passenger.anchor[1])
+
+        motion.settle()
+
+    def bake_static_layers():
+        '''按当前视图重新烘焙静态图层（只画屏幕内的楼层），并让整个屏幕重绘一次'''
+        zoom = camera.zoom
+        background = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT)).convert()
+        background.fill(GRAY)
+        overlay.image.fill((0, 0, 0, 0))
+        if num_of_floors > 0:
+            left = camera.screen_x(0)
+            width = round(layout.width * zoom)
+            visible = camera.visible_floors()
+            floorbackground = sprite_cache.sized('floorbackground.png', (width, max(1, round(FLOOR_HEIGHT * zoom))))
+            for floor in visible:
+                if floor < num_of_floors:
+                    background.blit(floorbackground, (left, camera.screen_y(camera.world_y(floor + 1))))
+
+            #电梯井：贴图按缩放级别缩放后竖直平铺，裁剪到楼的范围
+            top = camera.screen_y(camera.world_y(num_of_floors))
+            bottom = camera.screen_y(0)
+            tunnel = sprite_cache.scaled('tunnel.png')
+            tile_width, tile_height = tunnel.get_size()
+            first_tile = top + max(0, -top) // tile_height * tile_height
+            background.set_clip(pygame.Rect(0, top, SCREEN_WIDTH, bottom - top))
+            for i in range(elevator_num):
+                x = camera.screen_x(layout.shaft_x(i)) - tile_width // 2
+                for y in range(first_tile, min(bottom, SCREEN_HEIGHT), tile_height):
+                    background.blit(tunnel, (x, y))
+            background.set_clip(None)
+
+            slab = sprite_cache.sized('floor.png', (width, max(1, round(sprite_cache.image('floor.png').get_height() * zoom))))
+            for floor in visible:
+                overlay.image.blit(slab, (left, camera.screen_y(camera.world_y(floor))))
+        #墙随视图缩放并竖直平铺，默认视图下正好是原来的一整张
+        wall = sprite_cache.scaled('wall.png')
+        wall_height = wall.get_height()
+        wall_x = camera.screen_x(layout.wall_x)
+        for y in range(camera.screen_y(-(SCREEN_HEIGHT - camera.margin)) % wall_height - wall_height, SCREEN_HEIGHT, wall_height):
+            overlay.image.blit(wall, (wall_x, y))
+        overlay.dirty = 1
+
+        scene.clear(screen, background)
+        screen.blit(background, (0, 0))
+        scene.repaint_rect(screen.get_rect())
+
+    #处理特殊情况使用的列表：需要暂缓一个 tick 处理的记录
+    delayed_records = []
     delayed_process = False
 
 
@@ -160,99 +570,161 @@ def GUI(start_event, finish_event, message_queue):
     running = True
     updateing = False
     clock = pygame.time.Clock()
-    frame = 0
+    #动画按真实时间推进，与帧率无关；播放速度可以在运行时用键盘调整
+    anim_clock = AnimationClock(RATE, fps = MAX_FRAME)
+    elapsed = 0.0
+
+    #回放模式：seek_to 不为 None 时在下一帧跳转到该步
+    trace_replay = None
+    if replay is not None:
+        from tick_trace import TraceReplay
+        trace_replay = TraceReplay(replay)
+        decoupled = True
+    seek_to = replay_start if trace_replay is not None else None
+    replay_position = None
+
     t2 = 0
     while running:
+        frame_start = time.perf_counter()
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            elif event.type == pygame.KEYDOWN:
+                #上/+ 加速，下/- 减速，M 最快速度（直接跳到终点），空格暂停，0 恢复 1 倍速
+                if event.key in (pygame.K_UP, pygame.K_EQUALS, pygame.K_PLUS, pygame.K_KP_PLUS):
+                    anim_clock.faster()
+                elif event.key in (pygame.K_DOWN, pygame.K_MINUS, pygame.K_KP_MINUS):
+                    anim_clock.slower()
+                elif event.key == pygame.K_m:
+                    anim_clock.toggle_max_speed()
+                elif event.key == pygame.K_SPACE:
+                    anim_clock.toggle_pause()
+                elif event.key in (pygame.K_0, pygame.K_KP0):
+                    anim_clock.reset_speed()
+                elif trace_replay is not None and event.key in REPLAY_KEYS:
+                    offset = REPLAY_KEYS[event.key]
+                    if offset is None:
+                        seek_to = 0 if event.key == pygame.K_HOME else trace_replay.total_steps - 1
+                    else:
+                        seek_to = trace_replay.position + offset
+                #[ / ] 以鼠标位置为中心缩小/放大，F 在全楼概览和默认视图之间切换
+                elif event.key in (pygame.K_LEFTBRACKET, pygame.K_RIGHTBRACKET):
+                    camera.zoom_by(1 if event.key == pygame.K_RIGHTBRACKET else -1, *pygame.mouse.get_pos())
+                    continue
+                elif event.key == pygame.K_f:
+                    view_overview = not view_overview
+                    if view_overview:
+                        camera.overview()
+                    else:
+                        camera.fit(layout.width, num_of_floors)
+                    continue
+                else:
+                    continue
+                pygame.display.set_caption(f'{CAPTION} [{anim_clock.label()}]')
+            elif event.type == pygame.MOUSEWHEEL:
+                #滚轮滚动，按住 Ctrl 时缩放
+                if pygame.key.get_mods() & pygame.KMOD_CTRL:
+                    camera.zoom_by(event.y, *pygame.mouse.get_pos())
+                else:
+                    camera.scroll(-event.x * SCROLL_STEP, -event.y * SCROLL_STEP)
+            elif event.type == pygame.MOUSEMOTION and event.buttons[0]:
+                camera.scroll(-event.rel[0], -event.rel[1])
+
+        keys = pygame.key.get_pressed()
+        pan_x = keys[pygame.K_d] - keys[pygame.K_a]
+        pan_y = keys[pygame.K_s] - keys[pygame.K_w]
+        if pan_x or pan_y:
+            camera.scroll(pan_x * PAN_SPEED * elapsed, pan_y * PAN_SPEED * elapsed)
+
+        #回放模式：跳转时直接摆到目标状态，否则在上一个 tick 的动画播完后前进一步
+        if trace_replay is not None:
+            if seek_to is not None:
+                snapshot = trace_replay.seek(seek_to)
+                seek_to = None
+                reset_scene()
+                if snapshot is not None:
+                    apply_snapshot(snapshot)
+                    motion.snap()
+                updateing = False
+            elif not updateing and not anim_clock.paused:
+                previous_round = trace_replay.state.round
+                snapshot = trace_replay.next()
+                if snapshot is not None:
+                    if trace_replay.state.round != previous_round:
+                        reset_scene()
+                    apply_snapshot(snapshot)
+                    updateing = True
+                    anim_clock.start()
+            if trace_replay.position != replay_position:
+                replay_position = trace_replay.position
+                pygame.display.set_caption(f'{CAPTION} [{anim_clock.label()}] 回放 第{trace_replay.state.round}轮 tick {trace_replay.state.tick} ({trace_replay.position + 1}/{trace_replay.total_steps})')
         
+        #解耦模式：取出队列中全部快照，只应用最新的一份，然后从当前位置重新开始插值
+        elif shared_state is not None:
+            #共享内存：序号没变说明没有新 tick，读取开销只有一次头部解析
+            snapshot, shared_seq = shared_state.read(shared_seq)
+            if snapshot is not None:
+                apply_snapshot(snapshot)
+                updateing = True
+                anim_clock.start()
+        elif decoupled:
+            snapshot = None
+            while True:
+                try:
+                    snapshot = message_queue.get_nowait()
+                except queue.Empty:
+                    break
+            if snapshot is not None:
+                apply_snapshot(decode_snapshot(snapshot))
+                updateing = True
+                anim_clock.start()
+
         #必须等到调度算法的一个tick完成之后，同时不处在更新状态时才能进行下一次更新
-        if start_event.is_set() and not updateing:
+        elif start_event.is_set() and not updateing:
         # if not updateing:
             # print(f'updating current time',time.perf_counter())
             #根据message_queue中的信息，更新电梯和乘客的target位置
-            while not message_queue.empty():
-                message = message_queue.get()
-                if message.delay == True:
-                #如果出现了delay的message，表示此消息要暂缓一个tick执行，放在下一个tick执行，因此先将其暂存到delaye queue当中。
-                    message.delay = False
-                    delayed_queue.put(message)
+            #补一个tick时只处理上次暂缓的记录（此时算法仍在等待，队列里不会有新帧）
+            if delayed_process == True:
+                delayed_process = False
+                records = delayed_records
+                delayed_records = []
+                replay = True
+            else:
+                records = []
+                while not message_queue.empty():
+                    records.extend(decode_frame(message_queue.get()))
+                replay = False
+            for kind, id, floor_number, state, delay in records:
+                if delay and not replay:
+                #如果出现了delay的记录，表示此消息要暂缓一个tick执行，放在下一个tick执行，因此先将其暂存到delayed_records当中。
+                    delayed_records.append((kind, id, floor_number, state, False))
                     delayed_process = True
                 else:
                 #消息分为三类，实例化消息，电梯消息和乘客消息
                 #对于实例化消息，根据传入的类型，创建相应的电梯和乘客对象
                 #对于电梯消息，更新电梯位置
                 #对于乘客消息，更新电梯位置，需要注意的是，位于电梯中的乘客随电梯上升或者下降位置也需要设置成事件发送过来
-                    if message.type == 'init':
-                        if message.object== 'elevator':
-                            new_elevator = Elevator(ELEVATOR_X[elevator_num], Floor_To_Y(message.floor,scale_factor=scale_factor), os.path.join(SPRITEDIR, 'elevator.png'), scale_factor = scale_factor)
-                            new_elevator.id = message.id
-                            print("创建电梯对象：", new_elevator)
-                            elevators.add(new_elevator)
-                            elevator_num += 1
-
-                            #创建电梯的同时增减电梯井
-                            tunnel = pygame.sprite.Sprite()
-                            tunnel.image = pygame.image.load(os.path.join(SPRITEDIR, 'tunnel.png'))
-                            #高度不变，只变宽度
-                            tunnel.image = pygame.transform.scale(tunnel.image, (int(tunnel.image.get_width()*scale_factor), FLOOR_HEIGHT * num_of_floors * scale_factor))
-                            tunnel.rect = tunnel.image.get_rect()
-                            tunnel.rect.x = ELEVATOR_X[elevator_num-1] - tunnel.rect.width // 2
-                            tunnel.rect.y = 100 
-                            tunnel.rect.y = 700 - FLOOR_HEIGHT * scale_factor * num_of_floors
-                            tunnels.add(tunnel)
-
-                        elif message.object== 'passenger':
-                            #在waiting位置上随机偏移一个位置生成对应的角色
-                            #先创建在camera外面，然后走进视野内
-                            target = random.randint(1,4)
-                            new_person = Person(-100, Floor_To_Y(message.floor,scale_factor=scale_factor), os.path.join(SPRITEDIR, f'passenger{target}.png'), scale_factor= scale_factor)
-                            new_person.target = (WAITING + random.randint(-WAITING_RANDOM,WAITING_RANDOM), Floor_To_Y(message.floor,scale_factor=scale_factor))
-                            new_person.src = new_person.anchor.copy()
-                            new_person.id = message.id
-                            passengers.add(new_person)
-                        
-                        elif message.object== 'floor':
-                            num_of_floors = message.floor
-                            print('floor num:',num_of_floors)
-                            scale_factor = DEFAULT_FLOOR / num_of_floors
-                            print('scale factor:',scale_factor)
-
-                            #初始化楼层
-                            for i in range(num_of_floors + 1):
-                                floor = pygame.sprite.Sprite()
-                                floor.image = pygame.image.load(os.path.join(SPRITEDIR, 'floor.png'))
-                                #宽度不变，只变高度
-                                
-                                floor.image = pygame.transform.scale(floor.image, (int(floor.image.get_width()), int(floor.image.get_height()*scale_factor)))
-                                
-                                floor.rect = floor.image.get_rect()
-                                floor.rect.x = 0
-                                floor.rect.y = Floor_To_Y(i,scale_factor=scale_factor)
-                                floors.add(floor)
-                            
-                            for i in range(num_of_floors):
-                                floor = pygame.sprite.Sprite()
-                                floor.image = pygame.image.load(os.path.join(SPRITEDIR, 'floorbackground.png'))
-                                print('floor size:',floor.image.get_size())
-                                floor.image = pygame.transform.scale(floor.image, (int(floor.image.get_width()), int(floor.image.get_height()*scale_factor)))
-                                print('floor size:',floor.image.get_size())
-                                floor.rect = floor.image.get_rect()
-                                floor.rect.x = 0
-                                floor.rect.y = Floor_To_Y(i,scale_factor=scale_factor) - FLOOR_HEIGHT  * scale_factor
-                                floorbackgrounds.add(floor)
-
-                            
-
-                    elif message.type == 'elevator':
-                        elevator = elevators.sprites()[message.id]
-                        elevator.target = (ELEVATOR_X[message.id], Floor_To_Y(message.floor,scale_factor=scale_factor))   
+                    if kind == FRAME_INIT_ELEVATOR:
+                        init_elevator(id, floor_number)
+
+                    elif kind == FRAME_INIT_PASSENGER:
+                        init_passenger(id, floor_number)
+                    
+                    elif kind == FRAME_INIT_FLOOR:
+                        init_floors(int(floor_number))
+
+                    elif kind == FRAME_ELEVATOR:
+                        elevator = elevator_sprites.get(id)
+                        if elevator is None:
+                            log.warning('gui_unknown_elevator', elevator=id)
+                            continue
+                        elevator.target = (layout.shaft_x(id), camera.world_y(floor_number))
                         elevator.src = elevator.anchor.copy()
-                        print(message.floor)
-                        print('------elevator message----------:',elevator.id,elevator.anchor,elevator.target)
+                        if log.enabled(DEBUG):
+                            log.debug('gui_elevator_target', elevator=elevator.id, floor=floor_number, anchor=list(elevator.anchor), target=list(elevator.target))
 
-                    elif message.type == 'passenger':
+                    elif kind == FRAME_PASSENGER:
                         #这里还需要处理一个特殊情况，因为离开电梯和电梯停在某一层是同一tick发生的，因此必须特殊处理，我真是艹了。
                         #处理的方式是先将这些事件收集起来，在本次tick不进行处理，本tick处理完后额外增加一个tick，再来处理这些乘客的离开。
                         
@@ -262,50 +734,58 @@ def GUI(start_event, finish_event, message_queue):
                     
                         #电梯是从0开始编号的，乘客却是从1开始编号的，吐了
                         
-                        passenger = passengers.sprites()[message.id-1]
-                        print('------passenger message----------:',message.id,passenger.id)
+                        passenger = passenger_sprites.get(id)
+                        if passenger is None:
+                            log.warning('gui_unknown_passenger', passenger=id)
+                            continue
+                        log.debug('gui_passenger', passenger=id, state=state)
                         #视情况而定，passenger要去往哪里
                         #到达楼层，前往销毁位置处
-                        if message.state == -1:
-                            passenger.target = (DESTROY, passenger.anchor[1])
+                        if state == -1:
+                            passenger.target = (layout.destroy_x, passenger.anchor[1])
                             passenger.src = passenger.anchor.copy()
                         #站在电梯里，随电梯前往特定位置
-                        elif message.state == -2:
-                            passenger.target = (passenger.anchor[0], Floor_To_Y(message.floor,scale_factor=scale_factor))
+                        elif state == -2:
+                            passenger.target = (passenger.anchor[0], camera.world_y(floor_number))
                             passenger.src = passenger.anchor.copy()
                         #位于等待位置上，前往电梯里
                         else:
                             #这里最好再添加一个检查电梯id号是否存在的逻辑
-                            passenger.target = (ELEVATOR_X[message.state]+random.randint(-ELEVATOR_RANDOM,ELEVATOR_RANDOM)*scale_factor, passenger.anchor[1])  
+                            passenger.target = (layout.shaft_x(state)+random.randint(-ELEVATOR_RANDOM,ELEVATOR_RANDOM), passenger.anchor[1])
                             passenger.src = passenger.anchor.copy()
                     else:
-                        print("未知消息类型")
+                        log.warning('gui_unknown_frame', kind=kind)
         
             updateing = True
-            frame = 0
-            t1 = time.perf_counter()
-            print(f'update start time',t1)
+            counts_dirty = True
+            anim_clock.start()
+            log.debug('gui_update', time=time.perf_counter())
            
             
         
         if updateing:
-            frame += 1
-            # 更新电梯和乘客的状态
-            elevators.update(frame)
-            passengers.update(frame)
-
-            #在60帧内完成动画更新工作，然后设置finish_event，通知algorithm进程继续执行
-            if frame >= (MAX_FRAME * RATE):
+            # 更新电梯和乘客的状态：按上一帧经过的时间推进
+            fraction = anim_clock.advance(elapsed)
+            if fraction > 0:
+                motion.advance(fraction)
+            if anim_clock.finished:
+                motion.settle()
+                #走到销毁位置的乘客从所有精灵组中移除，再从索引中移除，之后每帧的开销只与在场人数有关
+                destroyed = motion.sprites_at_target_x(layout.destroy_x)
+                for passenger in destroyed:
+                    passenger.kill()
+                passenger_sprites.evict(destroyed)
+
+            #在 RATE / 播放速度 秒内完成动画更新工作，然后设置finish_event，通知algorithm进程继续执行
+            if anim_clock.finished and decoupled:
+                #解耦模式没有握手，动画播完后等待下一份快照即可
+                updateing = False
+            elif anim_clock.finished:
                 updateing = False
                 #我们要这里考虑特殊情况，即是否需要补一个tick
                 if delayed_process == True:
-                    # print(f'delay current time',time.perf_counter())
-                    #需要补一个tick，那我们就delayed queue中的内容全部补充道message queue当中。
-                    delayed_process = False
-                    while not delayed_queue.empty():
-                        item = delayed_queue.get()
-                        message_queue.put(item)
-                    # print(f'delay1 current time',time.perf_counter())
+                    #需要补一个tick：start_event 保持置位，下一帧直接处理 delayed_records 中暂缓的记录
+                    pass
                 else:
                     #无特殊情况需要处理，通知调度算法继续即可
                     start_event.clear()
@@ -313,29 +793,41 @@ def GUI(start_event, finish_event, message_queue):
                     pass
 
 
-        # 绘制背景
-        screen.fill(GRAY)
-
-        #screen.blit(background.image, (0, 0))
-        
-        # 绘制电梯和乘客
-        floorbackgrounds.draw(screen)
-        
-        tunnels.draw(screen)
-        elevators.draw(screen)
-        passengers.draw(screen)
-        floors.draw(screen)
-
-        #最后绘制墙壁
-        screen.blit(wall.image, wall.rect)
-
-        # 更新屏幕
-        pygame.display.flip()
-
-        # 控制帧率
-        clock.tick(MAX_FRAME)
+        #滚动、缩放或换了一栋楼后重新摆放精灵；视图、楼层或电梯数量变化后重新烘焙静态图层
+        if camera.version != view_version:
+            update_view()
+        if static_dirty:
+            bake_static_layers()
+            static_dirty = False
+        if counts_dirty:
+            count_passengers()
+        if lod or crowded or floor_labels or elevator_labels:
+            update_labels()
+
+        # 只重绘移动过的精灵（以及被它们覆盖的楼板和墙壁），只提交变化的区域
+        pygame.display.update(scene.draw(screen))
+
+        # 控制帧率：一个 tick 不足一帧时不限帧率（没有动画要播时每毫秒检查一次），让 tick 尽快推进
+        if anim_clock.frame_limited:
+            fps = MAX_FRAME
+        else:
+            fps = 0 if updateing else 1000
+        if metrics is not None:
+            frame_time = time.perf_counter() - frame_start
+            frame_hist.observe(frame_time)
+            if frame_time > 1 / MAX_FRAME:
+                metrics.inc('slow_frames')
+            metrics.tick()
+        elapsed = clock.tick(fps) / 1000
         
 
+    if shared_state is not None:
+        shared_state.close()
+    if trace_replay is not None:
+        trace_replay.close()
+    log.close()
+    if metrics is not None:
+        metrics.close()
     pygame.quit()
     sys.exit()
 
@@ -1,163 +1,464 @@
 #!/usr/bin/env python3
 from typing import List
+import sys
 import time
+import queue
 from elevator_saga.client.base_controller import ElevatorController
 from elevator_saga.client.proxy_models import ProxyElevator, ProxyFloor, ProxyPassenger
 from elevator_saga.core.models import Direction, SimulationEvent
-from GUI import GUI
-from utils import Message
+from utils import HallCallIndex, Snapshot, FrameBuilder, encode_snapshot, FRAME_INIT_FLOOR, FRAME_INIT_ELEVATOR, FRAME_INIT_PASSENGER, FRAME_ELEVATOR, FRAME_PASSENGER
+from command_buffer import CommandBuffer
+from group_control import CarState, HallCallAssigner
+from parking import DemandHistogram, match_parking, plan_parking
+from rollout import RolloutEvaluator
+from tick_log import DEBUG, INFO, TickLog
 from collections import Counter
+import numpy as np
+
+# 埋点时计时的回调
+CALLBACKS = (
+    'on_init', 'on_event_execute_start', 'on_event_execute_end', 'on_passenger_call', 'on_elevator_idle',
+    'on_elevator_stopped', 'on_passenger_board', 'on_passenger_alight', 'on_elevator_passing_floor',
+    'on_elevator_approaching', 'on_elevator_move',
+)
+
+
+# dispatch / parking 参数的取值
+DISPATCH_POLICIES = ('bus', 'look', 'group')
+PARKING_POLICIES = ('demand', 'idle_floor')
+
 
 class ElevatorBusExampleController(ElevatorController):
-    def __init__(self, start_event, finish_event, message_queue) -> None: # 初始化函数，传入用于与GUI进程通信的同步变量和消息队列
-        super().__init__("http://127.0.0.1:8000", True)
+    def __init__(self, start_event, finish_event, message_queue, engine = None,
+                 idle_floor = 2, init_spread = 'even', reverse_rule = 'here_or_ahead', decoupled = False, shared_state = None,
+                 trace = None, trace_compress = False, dispatch = 'group', assign_budget = 0.005,
+                 parking = 'demand', demand_half_life = 300, rollout = 0, rollout_samples = 32, rollout_budget = 0.05,
+                 log_level = 'warning', log_file = None, metrics = None, profiler = None) -> None: # 初始化函数，传入用于与GUI进程通信的同步变量和消息队列
+        # 先检查参数再连接模拟器：拼错的取值不能悄悄退化成另一种策略
+        if dispatch not in DISPATCH_POLICIES:
+            raise ValueError(f'unknown dispatch {dispatch!r}, expected one of {DISPATCH_POLICIES}')
+        if parking not in PARKING_POLICIES:
+            raise ValueError(f'unknown parking {parking!r}, expected one of {PARKING_POLICIES}')
+        if engine is None:
+            super().__init__("http://127.0.0.1:8000", True)
+        else:
+            # 使用本地仿真引擎：不创建 HTTP 客户端（也不去注册），直接把引擎当作 api_client
+            self.server_url = engine.base_url
+            self.debug = False
+            self.elevators = []
+            self.floors = []
+            self.current_tick = 0
+            self.is_running = False
+            self.current_traffic_max_tick = 0
+            self.client_type = "algorithm"
+            self.api_client = engine
+        # 电梯指令先缓冲，每个 tick 结束时合并后统一发送
+        self.command_buffer = CommandBuffer(self.api_client)
+        self.api_client = self.command_buffer
+
+        # 可选：埋点（metrics 为 metrics.Metrics，见 metrics.py）。回调和客户端调用套上计时，每个 tick 末尾更新 KPI
+        self.metrics = metrics
+        if metrics is not None:
+            self.command_buffer.metrics = metrics
+            for name in CALLBACKS:
+                setattr(self, name, metrics.timed('callback_seconds', getattr(self, name), callback=name))
+            self._tick_hist = metrics.histogram('tick_seconds')
+            self._handshake_hist = metrics.histogram('gui_handshake_seconds')
+            self._last_tick_end = None
+            self._sent_before = 0
+
+        # 可选：性能剖析（profiler 为 profiler.CallProfiler，见 profiler.py）。回调、客户端调用和日志分别计时，每轮流量结束时输出
+        self.profiler = profiler
+        if profiler is not None:
+            self.command_buffer.profiler = profiler
+            self.command_buffer.flush = profiler.wrap('client', 'flush', self.command_buffer.flush)
+            for name in CALLBACKS:
+                setattr(self, name, profiler.wrap('controller', name, getattr(self, name)))
+            profiler.start()
         self.all_passengers: List[ProxyPassenger] = []
         self.max_floor = 0
+        self.traffic_round = -1
+
+        # 可调的调度参数（供 sweep.py 做参数搜索）
+        # idle_floor: 电梯空闲时停靠的楼层
+        # init_spread: 初始位置，'even' 均匀分布 / 'lobby' 全部停在 0 层 / 'idle' 全部停在 idle_floor
+        # reverse_rule: 没有车内乘客时何时保持方向，'here_or_ahead' 本层同向或前方有人 / 'ahead' 只看前方
+        # dispatch: 'look' 直接驶向当前方向上最远的停靠点，途中按需插入停靠 / 'bus' 原来的每次移动一层
+        #           'group' 在 LOOK 的基础上由群控把每个楼层呼叫分配给一台电梯（见 group_control.py）
+        # assign_budget: 群控每个 tick 重新分配呼叫的时间预算（秒）
+        # parking: 没有需求的电梯停在哪里，'demand' 按呼叫历史分区停靠（见 parking.py）/ 'idle_floor' 回到 idle_floor
+        #          （没有呼叫历史时 'demand' 也退回到 idle_floor 和 init_spread）
+        # demand_half_life: 呼叫历史的半衰期（tick）
+        # rollout: 大于 0 时电梯停靠后用前向仿真在几个候选目标中选择（见 rollout.py），值为仿真的 tick 数；0 关闭
+        # rollout_samples / rollout_budget: 每个候选初始的未来到达样本数，以及一次评估的时间预算（秒）
+        self.idle_floor = idle_floor
+        self.init_spread = init_spread
+        self.reverse_rule = reverse_rule
+        self.dispatch = dispatch
+        self.assign_budget = assign_budget
+        self.parking = parking
+        # 呼叫历史跨轮次保留，在 on_init 中按楼层数调整
+        self.demand = DemandHistogram(0, demand_half_life)
+        self.rollout = rollout
+        self.rollout_samples = rollout_samples
+        self.rollout_budget = rollout_budget
+        self.evaluator = None
+
+        # 结构化日志（见 tick_log.py）：默认 warning 级别，每个 tick 的事件/电梯状态为 debug，乘客和停靠事件为 info
+        self.log = TickLog(log_file, log_level)
+        if self.profiler is not None:
+            self.log.log = self.profiler.wrap('log', 'log', self.log.log)
 
         #用于与GUI进程进行通信的同步变量和消息队列
         self.start_event = start_event
         self.finish_event = finish_event    
         self.message_queue = message_queue
         self.board = False
+        # 解耦模式：不再与 GUI 锁步，每个 tick 只向有界队列发布一份完整快照，从不等待 GUI
+        self.decoupled = decoupled
+        # 可选：解耦模式下把状态写入共享内存表（shared_state 为共享内存的名字），不再经过队列
+        self.shared_state = None
+        if shared_state is not None:
+            from shared_state import SharedWorldState
+            self.shared_state = SharedWorldState(shared_state)
+            self.decoupled = True
+
+        # 可选：把每个 tick 的事件、电梯状态和发出的指令追加写入二进制 trace 文件（trace 为文件路径）
+        self.trace = None
+        if trace is not None:
+            from tick_trace import TraceWriter
+            self.trace = TraceWriter(trace, compress = trace_compress)
 
         # 新增：记录还在等待的乘客 -> {passenger_id: (origin_floor:int, dir:str 'up'|'down')}
         self.waiting_passengers = {}
+        # 按楼层/方向索引的等待呼叫，在 on_init 中根据楼层数创建
+        self.hall_calls = HallCallIndex(0)
 
         # NEW: 每台电梯的“车内目的层计数”
         self.in_car_targets = {}   # {elevator_id: Counter({floor: count})}
+        # LOOK 调度：每台电梯当前驶向的停靠点，以及没有任何需求、原地停着的电梯
+        self.committed = {}   # {elevator_id: floor}
+        self.parked = set()
+        # 群控：呼叫分配表，以及每个 tick 缓存一次的电梯位置/目标/载客数
+        self.assigner = None
+        self._cars = []
+        self._cars_tick = -1
+        self._rebalanced_tick = -1
 
     def on_init(self, elevators: List[ProxyElevator], floors: List[ProxyFloor]) -> None: # 最开始给电梯下达第一条指令
         self.max_floor = floors[-1].floor
         self.floors = floors
+        # 第几轮流量，随快照发给 GUI（新一轮的乘客 id 从 1 重新编号）
+        self.traffic_round += 1
 
         # NEW: 为每台电梯建一个 Counter
         self.in_car_targets = {e.id: Counter() for e in elevators}
+        self.committed = {}
+        self.parked = set()
+        if self.dispatch == 'group':
+            self.assigner = HallCallAssigner(len(elevators), len(floors), self.assign_budget)
+            self._cars_tick = self._rebalanced_tick = -1
+        if self.rollout and self.dispatch != 'bus':
+            self.evaluator = RolloutEvaluator(len(floors), elevators[0].max_capacity, self.rollout,
+                                              self.rollout_samples, self.rollout_budget)
+        # 新一轮流量开始，重建呼叫索引
+        self.waiting_passengers = {}
+        self.hall_calls = HallCallIndex(len(floors))
+        self.demand.resize(len(floors))
+
+        # 有呼叫历史时按历史需求分区摆放电梯
+        spread = []
+        if self.parking == 'demand':
+            spread = [median for _, median, _ in plan_parking(self.demand.weights(), len(elevators))]
 
         for i, elevator in enumerate(elevators):
             # 计算目标楼层 - 均匀分布在不同楼层
-            target_floor = (i * (len(floors) - 1)) // len(elevators)
+            if spread:
+                target_floor = spread[i]
+            elif self.init_spread == 'lobby':
+                target_floor = 0
+            elif self.init_spread == 'idle':
+                target_floor = min(self.idle_floor, self.max_floor)
+            else:
+                target_floor = (i * (len(floors) - 1)) // len(elevators)
             # 立刻移动到目标位置并开始循环
             elevator.go_to_floor(target_floor, immediate=True)
-        # 初始化阶段，打印电梯的初始位置
-        print("-----------------------------------")
-        print('begin initialization')
-        for e in elevators:
-            print(f'{e.id} floor:{e.current_floor_float}')
-        print("---------------------------------")
+        # 初始化阶段，记录电梯的初始位置
+        if self.log.enabled(INFO):
+            self.log.info('init', floors=len(floors), elevators=self._log_elevators())
         # 把楼层的数量传递给GUI
-        if self.message_queue != None:
-            new_message = Message(type = 'init', object= 'floor', id = -1, floor = len(floors), state = None)
-            self.message_queue.put(new_message)
+        if self.shared_state is not None:
+            # 新一轮流量的乘客 id 从 1 重新编号，先清空共享表
+            self.shared_state.clear(0, len(floors), self.traffic_round)
+            self._publish_snapshot(0, elevators)
+        elif self.message_queue != None and self.decoupled:
+            self._publish_snapshot(0, elevators)
+        elif self.message_queue != None:
+            frame = FrameBuilder()
+            frame.add(FRAME_INIT_FLOOR, -1, len(floors))
             
-            # 将电梯的初始化事件加入到 message queue 当中
+            # 将电梯的初始化事件加入到同一帧当中
             for e in elevators:
-                new_message = Message(type = 'init', object= 'elevator', id = e.id, floor = e.current_floor, state = None)
-                self.message_queue.put(new_message)
+                frame.add(FRAME_INIT_ELEVATOR, e.id, e.current_floor)
+            self.message_queue.put(frame.to_bytes())
+
+        if self.trace is not None:
+            self.trace.write_round(len(floors), len(elevators))
+            self._write_trace(0, [], elevators)
+
+        # 初始化阶段下达的指令需要在第一个 tick 之前发出
+        self.command_buffer.flush()
 
+    def on_stop(self) -> None:
+        self.command_buffer.close()
+        if self.profiler is not None:
+            self._profile_round()
+            self.profiler.close()
+        self.log.close()
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.trace is not None:
+            self.trace.close()
+        if self.shared_state is not None:
+            self.shared_state.close()
+        super().on_stop()
 
-    def on_event_execute_start( # 打印即将处理的事件数量及每个事件的类型
+    def _profile_round(self) -> None:
+        '''一轮流量结束：写出剖析结果，汇总同时输出到标准输出'''
+        sys.stdout.write(self.profiler.end_round())
+        sys.stdout.flush()
+
+    def _reset_and_reinit(self) -> None:
+        '''
+        切换流量后重置并重新初始化。
+        不同流量文件的楼层数/电梯数可能不同，因此这里允许按新状态重建代理对象（基类版本会直接报错）
+        '''
+        if self.profiler is not None:
+            self._profile_round()
+        self.api_client.reset()
+        self.current_tick = 0
+        state = self.api_client.get_state()
+        self._update_wrappers(state, init=True)
+        self._update_traffic_info()
+        self._internal_init(self.elevators, self.floors)
+
+    def on_event_execute_start( # 记录即将处理的事件类型及电梯状态（debug 级别）
         self, tick: int, events: List[SimulationEvent], elevators: List[ProxyElevator], floors: List[ProxyFloor]
     ) -> None:
-        print(f"Tick {tick}: 即将处理 {len(events)} 个事件 {[e.type.value for e in events]}")
-        for i in elevators:
-            print(
-                f"\t{i.id}[{i.target_floor_direction.value},{i.current_floor_float}/{i.target_floor}]"
-                + "[Man]" * len(i.passengers),
-                end="",
-            )
-        print()
+        if self.log.enabled(DEBUG):
+            self.log.debug('tick_start', tick=tick, events=[e.type.value for e in events], elevators=self._log_elevators())
+
+    def _log_elevators(self) -> List[dict]:
+        '''日志用的电梯状态，一次读取整个状态（代理对象每次属性访问都会重新查询）'''
+        return [
+            {'id': e.id, 'direction': e.target_floor_direction.value, 'floor': e.current_floor_float,
+             'target': e.target_floor, 'passengers': list(e.passengers)}
+            for e in self.api_client.get_state().elevators
+        ]
 
     def on_event_execute_end( 
         self, tick: int, events: List[SimulationEvent], elevators: List[ProxyElevator], floors: List[ProxyFloor]
     ) -> None:
         '''
-        1. 再次打印这一 tick 已处理的事件类型与电梯状态；
-        2. 遍历 events，把与乘客相关的消息按规则塞进 message_queue；
-        3. 遍历 elevators，把电梯和电梯内乘客的“同步”消息塞进 message_queue；
+        1. 记录这一 tick 已处理的事件类型与电梯状态（debug 级别）；
+        2. 遍历 events，把与乘客相关的消息按规则写入本 tick 的帧；
+        3. 遍历 elevators，把电梯和电梯内乘客的“同步”消息写入本 tick 的帧，整帧一次性放入 message_queue；
         4. 用 start_event.set() 通知 GUI 可以消费消息；随后 finish_event.wait() 阻塞，等 GUI 处理完再 clear() 继续。
         '''
-        print(f"Tick {tick}: 处理了 {len(events)} 个事件 {[e.type.value for e in events]}")
-        for i in elevators:
-            print(
-                f"\t{i.id}[{i.target_floor_direction.value},{i.current_floor_float}/{i.target_floor}]"
-                + "[Man]" * len(i.passengers),
-                end="",
-            )
-            print(i.passengers)
-        for e in events:
-            print(e.type)
-        print()
+        if self.log.enabled(DEBUG):
+            self.log.debug('tick_end', tick=tick, events=[e.type.value for e in events], elevators=self._log_elevators())
 
         # 在每一个tick处理完毕之后，我们需要通知GUI进程进行更新，然后等待GUI完成更新
-        # Ops: Message 里面的 object 字段好像没用，但目前还是不删掉。
         
+        # 解耦模式：发布快照后直接继续仿真
+        if self.shared_state is not None or (self.message_queue != None and self.decoupled):
+            self._publish_snapshot(tick, elevators)
         # 处理 events
-        if self.message_queue != None:
+        elif self.message_queue != None:
+            # 本 tick 的所有消息写入同一帧，最后只 put 一次
+            frame = FrameBuilder()
             self.board = False
             for e in events:
                 # 乘客的初始化事件
                 if e.type.value == 'down_button_pressed' or e.type.value == 'up_button_pressed':
-                    new_message = Message(type = 'init', object= 'passenger', id = e.data['passenger'], floor = e.data['floor'], state = None, delay = False)
-                    self.message_queue.put(new_message)
+                    frame.add(FRAME_INIT_PASSENGER, e.data['passenger'], e.data['floor'])
                 # 乘客登上电梯事件
                 elif e.type.value == 'passenger_board':
-                    print('------passenger board----------:\n')
-                    print(f"{e.data['passenger']} floor = {e.data['floor']}, state = {e.data['elevator']}")
-                    new_message = Message(type = 'passenger', object= None, id = e.data['passenger'], floor = e.data['floor'], state = e.data['elevator'], delay = False)
-                    self.message_queue.put(new_message)
-
-                    # 新增：该乘客已上车，不再算“等待中”
-                    self.waiting_passengers.pop(e.data['passenger'], None)
+                    self.log.debug('frame_board', tick=tick, passenger=e.data['passenger'], floor=e.data['floor'], elevator=e.data['elevator'])
+                    frame.add(FRAME_PASSENGER, e.data['passenger'], e.data['floor'], e.data['elevator'])
 
                     # 本 tick 有乘客上电梯 -> 后续电梯内乘客刷新消息用 delay
                     self.board = True
                 # 乘客离开电梯事件，注意，由于模拟器把停靠和离开放在同一 tick 里，因此这里是 delay 事件
                 elif e.type.value == 'passenger_alight':
                     # 乘客下电梯时不在电梯内了，检索不到，所以这里再塞入一个事件
-                    new_message = Message(type = 'passenger', object= 'passenger', id = e.data['passenger'], floor = (e.data['floor']), state = -2, delay = False)
-                    self.message_queue.put(new_message)
+                    frame.add(FRAME_PASSENGER, e.data['passenger'], e.data['floor'], -2)
                     # 如果没有下面这句，GUI 里面，乘客会“漂浮在空中”
-                    new_message2 = Message(type = 'passenger', object= 'passenger', id = e.data['passenger'], floor = e.data['floor'], state = -1, delay = True)
-                    self.message_queue.put(new_message2)
+                    frame.add(FRAME_PASSENGER, e.data['passenger'], e.data['floor'], -1, True)
             
             # 处理 elevators
             for e in elevators:
                 # 如果有乘客上电梯，则 delay
-                if self.board:
-                    delay = True    
-                else:
-                    delay = False   
-                new_message = Message(type = 'elevator', object= None, id = e.id, floor = e.current_floor_float, state = 0, delay= delay)
-                self.message_queue.put(new_message)
+                delay = self.board
+                floor_float = e.current_floor_float
+                frame.add(FRAME_ELEVATOR, e.id, floor_float, 0, delay)
                 # 为电梯中的每个用户创建事件
                 for p in e.passengers:
-                    new_message = Message(type = 'passenger', object= None, id = p, floor = e.current_floor_float, state = -2,delay= delay)
-                    self.message_queue.put(new_message)
+                    frame.add(FRAME_PASSENGER, p, floor_float, -2, delay)
+            self.message_queue.put(frame.to_bytes())
             # 消息已经准备好了，通知 GUI 进程可以进行更新
             self.start_event.set()
             # 等待 GUI 进程完成更新，这里的 wait 必须后面跟着一个 clear，否则无法生效
+            wait_start = time.perf_counter()
             self.finish_event.wait()
             self.finish_event.clear()
+            if self.metrics is not None:
+                self._handshake_hist.observe(time.perf_counter() - wait_start)
+
+        # 群控：这个 tick 没有电梯停靠时也重新分配一次（例如满载电梯留下的呼叫）
+        if self.dispatch == 'group' and self.assigner.owner:
+            self._rebalance()
+
+        if self.trace is not None:
+            self._write_trace(tick, events, elevators)
+
+        # 本 tick 所有回调已经执行完，把缓冲的电梯指令合并后一次性发出
+        self.command_buffer.flush()
+        if self.metrics is not None:
+            self._record_tick(tick, events)
+
+    def _record_tick(self, tick: int, events: List[SimulationEvent]) -> None:
+        '''每个 tick 末尾：tick 耗时（相邻两次 tick 结束之间，含客户端 I/O 和 GUI 握手）、指令数、队列深度和 KPI'''
+        metrics = self.metrics
+        now = time.perf_counter()
+        if self._last_tick_end is not None:
+            self._tick_hist.observe(now - self._last_tick_end)
+        self._last_tick_end = now
+        sent = self.command_buffer.sent
+        metrics.inc('commands_sent', sent - self._sent_before)
+        self._sent_before = sent
+        metrics.set('commands_coalesced', self.command_buffer.coalesced)
+        for e in events:
+            metrics.inc('events', event=e.type.value)
+        if self.message_queue is not None:
+            try:
+                metrics.set('message_queue_depth', self.message_queue.qsize())
+            except NotImplementedError:
+                # macOS 的 multiprocessing.Queue 不支持 qsize
+                pass
+        metrics.set('tick', tick)
+        metrics.set('waiting_passengers', self.hall_calls.total)
+        metrics.set('in_car_passengers', sum(sum(c.values()) for c in self.in_car_targets.values()))
+        metrics.tick()
+
+    def _write_trace(self, tick: int, events: List[SimulationEvent], elevators: List[ProxyElevator]) -> None:
+        '''
+        把本 tick 的事件、电梯状态和即将发出的指令追加到 trace。
+        代理对象的每次属性访问都会重新查询一次状态，这里直接取一次状态后读取电梯模型
+        '''
+        state = self.api_client.get_state()
+        self.trace.write_tick(
+            tick, events,
+            [(e.current_floor_float, e.target_floor_direction.value, len(e.passengers)) for e in state.elevators],
+            self.command_buffer.pending_commands(),
+        )
+
+    def _publish_snapshot(self, tick: int, elevators: List[ProxyElevator]) -> None:
+        '''
+        把当前 tick 的完整状态放入有界队列。
+        队列满说明 GUI 跟不上，此时丢掉最旧的一份快照再放入，控制器永远不会因为 GUI 而阻塞。
+        使用共享内存表时直接原地写入
+        '''
+        waiting = [(pid, floor) for pid, (floor, _) in self.waiting_passengers.items()]
+        riding = [(p, e.id) for e in elevators for p in e.passengers]
+        if self.shared_state is not None:
+            self.shared_state.write(
+                tick, len(self.floors),
+                [(e.current_floor_float, e.target_floor_direction.value, len(e.passengers)) for e in elevators],
+                waiting, riding,
+            )
+            return
+        snapshot = encode_snapshot(Snapshot(
+            tick = tick,
+            num_floors = len(self.floors),
+            elevators = [e.current_floor_float for e in elevators],
+            waiting = waiting,
+            riding = riding,
+            round = self.traffic_round,
+        ))
+        try:
+            self.message_queue.put_nowait(snapshot)
+        except queue.Full:
+            try:
+                self.message_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.message_queue.put_nowait(snapshot)
+            except queue.Full:
+                pass
 
     # 以下均为细粒度事件回调（在仿真内核处理 events 时，按需触发）
     def on_passenger_call(self, passenger: ProxyPassenger, floor: ProxyFloor, direction: str) -> None:
         '''
-        把乘客记入 self.all_passengers，打印
+        把乘客记入 self.all_passengers，记录日志
         '''
-        print(f"[Call] 乘客 P{passenger.id} 在 F{floor.floor} 呼叫电梯 {direction}")
+        self.log.info('call', tick=self.current_tick, passenger=passenger.id, floor=floor.floor, direction=direction)
         self.all_passengers.append(passenger)
 
         # 新增：登记该乘客为“等待中”
         # direction 由仿真回调给出，通常为 'up' 或 'down'
         self.waiting_passengers[passenger.id] = (floor.floor, direction)
-
-        pass
+        self.hall_calls.add(floor.floor, direction)
+        self.demand.add(floor.floor, direction, self.current_tick)
+        if self.dispatch == 'group':
+            call = (floor.floor, direction)
+            if self.assigner.owner_of(call) is None:
+                self.assigner.add_call(call, self.current_tick)
+                elevator_id = self.assigner.assign(call, self._car_states())
+                if elevator_id in self.parked:
+                    self._go(self.elevators[elevator_id], floor.floor)
+        elif self.dispatch == 'look' and self.parked:
+            self._wake_parked(floor.floor)
 
     def on_elevator_idle(self, elevator: ProxyElevator) -> None:
         '''
-        电梯空闲时发一条“去 1 层”的指令
+        电梯空闲时去停靠楼层：按呼叫历史分区（parking='demand'），没有历史时为 idle_floor（默认 2 层）；
+        LOOK 调度下有需求时先去服务需求
         '''
-        elevator.go_to_floor(2)
+        idle_floor = min(self.idle_floor, self.max_floor)
+        if self.dispatch == 'bus':
+            park = self._parking_floor(elevator.id)
+            elevator.go_to_floor(idle_floor if park is None else park)
+            return
+        if self._dispatch(elevator, elevator.current_floor, Direction.STOPPED):
+            return
+        self._park(elevator, idle_floor)
+
+    def _park(self, elevator: ProxyElevator, fallback = None) -> None:
+        '''
+        没有需求的电梯：记为停靠中（新呼叫可以唤醒它），按需求分区去停靠楼层；
+        没有呼叫历史时去 fallback，fallback 为 None 时原地停着
+        '''
+        self.committed.pop(elevator.id, None)
+        self.parked.add(elevator.id)
+        floor = self._parking_floor(elevator.id)
+        if floor is None:
+            floor = fallback
+        if floor is not None and floor != elevator.current_floor:
+            elevator.go_to_floor(floor)
+
+    def _parking_floor(self, elevator_id: int):
+        '''按呼叫历史把所有停靠中的电梯（含 elevator_id）分到各需求区，返回 elevator_id 的停靠楼层'''
+        if self.parking != 'demand':
+            return None
+        idle = self.parked | {elevator_id}
+        zones = plan_parking(self.demand.weights(), len(idle))
+        if not zones:
+            return None
+        state = self.api_client.get_state()
+        positions = {e.id: e.current_floor_float for e in state.elevators if e.id in idle}
+        return match_parking(positions, zones).get(elevator_id)
 
     # 新增工具函数：判断“当前方向上是否还有人在等”
     def _has_waiting_ahead(self, current_floor: int, direction: Direction) -> bool:
@@ -165,9 +466,9 @@ class ElevatorBusExampleController(ElevatorController):
         是否存在位于当前层“前方”的等待呼叫（不区分 up/down，只要有人就算“有需求”）
         """
         if direction == Direction.UP:
-            return any(origin > current_floor for origin, _ in self.waiting_passengers.values())
+            return self.hall_calls.any_above(current_floor)
         elif direction == Direction.DOWN:
-            return any(origin < current_floor for origin, _ in self.waiting_passengers.values())
+            return self.hall_calls.any_below(current_floor)
         return False
     
     def _has_waiting_here(self, current_floor: int, direction: Direction) -> bool:
@@ -177,8 +478,7 @@ class ElevatorBusExampleController(ElevatorController):
         if direction not in (Direction.UP, Direction.DOWN):
             return False
         want = 'up' if direction == Direction.UP else 'down'
-        return any(origin == current_floor and dir_str == want
-                for origin, dir_str in self.waiting_passengers.values())
+        return self.hall_calls.count_here(current_floor, want) > 0
 
     def _get_passenger_dest(self, passenger: ProxyPassenger):
         '''获取乘客的目的层'''
@@ -189,9 +489,208 @@ class ElevatorBusExampleController(ElevatorController):
 
     def on_elevator_stopped(self, elevator: ProxyElevator, floor: ProxyFloor) -> None:
         '''
-        实现调度策略：(最开始是 BUS 调度算法)
+        实现调度策略：默认为群控 + LOOK，dispatch='bus' 时为原来的 BUS 调度算法
+        '''
+        self.log.info('stopped', tick=self.current_tick, elevator=elevator.id, floor=floor.floor)
+        if self.dispatch == 'group':
+            self._rebalance()
+        if self.dispatch != 'bus':
+            if not self._dispatch(elevator, floor.floor, elevator.last_tick_direction):
+                # 没有任何需求：去需求区停靠（没有呼叫历史时原地停着），等新的呼叫唤醒
+                self._park(elevator)
+            return
+        self._bus_dispatch(elevator)
+
+    # ---------------- LOOK 调度 ----------------
+    def _furthest_stop(self, elevator_id: int, current_floor: int, direction: Direction):
+        '''
+        direction 方向上最远的停靠点（车内目的层或任意方向的等待呼叫），没有时返回 None。
+        已经是别的电梯停靠点的呼叫楼层留给那台电梯，避免所有电梯追同一批呼叫
+        '''
+        targets = self.in_car_targets.get(elevator_id, ())
+        if self.dispatch == 'group':
+            # 群控：只考虑分配给这台电梯的呼叫
+            floors = [f for f, _ in self.assigner.assigned[elevator_id]]
+            floors.extend(targets)
+            if direction == Direction.UP:
+                return max((f for f in floors if f > current_floor), default=None)
+            return min((f for f in floors if f < current_floor), default=None)
+        claimed = {f for eid, f in self.committed.items() if eid != elevator_id}
+        calls = self.hall_calls
+        if direction == Direction.UP:
+            far = max((f for f in targets if f > current_floor), default=None)
+            call = calls.highest()
+            while call is not None and call > current_floor and call in claimed:
+                call = next((f for f in range(call - 1, current_floor, -1) if calls.up[f] or calls.down[f]), None)
+            if call is not None and call > current_floor and (far is None or call > far):
+                far = call
+        else:
+            far = min((f for f in targets if f < current_floor), default=None)
+            call = calls.lowest()
+            while call is not None and call < current_floor and call in claimed:
+                call = next((f for f in range(call + 1, current_floor) if calls.up[f] or calls.down[f]), None)
+            if call is not None and call < current_floor and (far is None or call < far):
+                far = call
+        return far
+
+    def _go(self, elevator: ProxyElevator, target: int) -> None:
+        moving = False
+        if elevator.id in self.parked:
+            # 正在去停靠楼层的电梯要立即改道，否则要等到了停靠楼层才会执行新目标
+            self.parked.discard(elevator.id)
+            moving = elevator.target_floor != elevator.current_floor or elevator.current_floor_float != elevator.current_floor
+        self.committed[elevator.id] = target
+        elevator.go_to_floor(target, immediate=moving)
+
+    def _go_furthest(self, elevator: ProxyElevator, current_floor: int, direction: Direction) -> bool:
+        far = self._furthest_stop(elevator.id, current_floor, direction)
+        if far is None:
+            return False
+        self._go(elevator, far)
+        return True
+
+    def _board_here(self, elevator: ProxyElevator, current_floor: int, direction: Direction) -> bool:
+        '''本层有同向乘客但前方没有别的停靠点：至少走一层，让他们按这个方向上车'''
+        if direction == Direction.UP and self.hall_calls.count_here(current_floor, 'up') > 0:
+            self._go(elevator, current_floor + 1)
+            return True
+        if direction == Direction.DOWN and self.hall_calls.count_here(current_floor, 'down') > 0:
+            self._go(elevator, current_floor - 1)
+            return True
+        return False
+
+    def _look_dispatch(self, elevator: ProxyElevator, current_floor: int, direction: Direction) -> bool:
+        '''
+        保持方向直到前方没有停靠点，目标直接设为该方向上最远的停靠点，沿途的停靠由 on_elevator_approaching 插入。
+        电梯停着（没有方向）时先看本层呼叫的方向。没有任何需求时返回 False
+        '''
+        if direction == Direction.DOWN:
+            order = (Direction.DOWN, Direction.UP)
+        elif direction == Direction.UP:
+            order = (Direction.UP, Direction.DOWN)
+        elif self.hall_calls.count_here(current_floor, 'down') > 0:
+            order = (Direction.DOWN, Direction.UP)
+        else:
+            order = (Direction.UP, Direction.DOWN)
+        first, second = order
+        if self._go_furthest(elevator, current_floor, first):
+            return True
+        if self.reverse_rule == 'here_or_ahead' and self._board_here(elevator, current_floor, first):
+            return True
+        if self._go_furthest(elevator, current_floor, second):
+            return True
+        return self._board_here(elevator, current_floor, second) or self._board_here(elevator, current_floor, first)
+
+    def _dispatch(self, elevator: ProxyElevator, current_floor: int, direction: Direction) -> bool:
+        '''开启 rollout 时先由前向仿真在候选目标中选择，否则（或只有一个候选时）按 LOOK'''
+        if self.evaluator is not None and self._rollout_dispatch(elevator, current_floor, direction):
+            return True
+        return self._look_dispatch(elevator, current_floor, direction)
+
+    # ---------------- 前向仿真 ----------------
+    def _rollout_candidates(self, elevator_id: int, current_floor: int) -> List[int]:
+        '''
+        候选目标：LOOK 在两个方向上的最远停靠点，上方和下方最近的需求（车内目的层或任意等待呼叫），
+        以及本层有人等待时向那个方向走一层（让他们上车）
+        '''
+        candidates = [self._furthest_stop(elevator_id, current_floor, Direction.UP),
+                      self._furthest_stop(elevator_id, current_floor, Direction.DOWN)]
+        calls = self.hall_calls
+        floors = set(self.in_car_targets.get(elevator_id, ()))
+        floors.update(f for f in range(calls.num_floors) if calls.up[f] or calls.down[f])
+        candidates.append(min((f for f in floors if f > current_floor), default=None))
+        candidates.append(max((f for f in floors if f < current_floor), default=None))
+        if calls.count_here(current_floor, 'up') and current_floor < self.max_floor:
+            candidates.append(current_floor + 1)
+        if calls.count_here(current_floor, 'down') and current_floor > 0:
+            candidates.append(current_floor - 1)
+        return sorted({f for f in candidates if f is not None and f != current_floor})
+
+    def _rollout_dispatch(self, elevator: ProxyElevator, current_floor: int, direction: Direction) -> bool:
+        '''把整个楼宇向前仿真，选出让未来一段时间内乘客总等待+乘梯时间最小的候选目标'''
+        candidates = self._rollout_candidates(elevator.id, current_floor)
+        if len(candidates) < 2:
+            return False
+        state = self.api_client.get_state()
+        positions = [e.current_floor_float for e in state.elevators]
+        targets = [self.committed.get(e.id, e.target_floor) for e in state.elevators]
+        riders = np.zeros((len(positions), len(self.floors)))
+        for elevator_id, counter in self.in_car_targets.items():
+            for floor, count in counter.items():
+                riders[elevator_id, floor] = count
+        waiting = np.array([self.hall_calls.up, self.hall_calls.down], dtype=float).T
+        best, _ = self.evaluator.choose(elevator.id, candidates, positions, targets, riders, waiting,
+                                        self.demand.rates(self.current_tick))
+        self._go(elevator, candidates[best])
+        return True
+
+    def _wake_parked(self, call_floor: int) -> None:
+        '''新呼叫到来时，派离呼叫楼层最近的一台停着的电梯过去'''
+        nearest = min(
+            (e for e in self.elevators if e.id in self.parked),
+            key=lambda e: abs(e.current_floor - call_floor),
+            default=None,
+        )
+        if nearest is not None:
+            self._go(nearest, call_floor)
+
+    def _needed_stop(self, elevator_id: int, floor: int, direction: str) -> bool:
+        '''电梯经过 floor 时是否需要停靠：有人在这层下车，或这层有同向等待的乘客'''
+        if self.in_car_targets.get(elevator_id, {}).get(floor, 0) > 0:
+            return True
+        if self.dispatch == 'group':
+            return self.assigner.owner_of((floor, direction)) == elevator_id
+        return direction in ('up', 'down') and self.hall_calls.count_here(floor, direction) > 0
+
+    # ---------------- 群控 ----------------
+    def _car_states(self) -> List[CarState]:
         '''
-        print(f"[Alert] 电梯 E{elevator.id} 停靠在 F{floor.floor}")
+        群控代价估计用的电梯状态。位置/载客数每个 tick 只读一次状态（代理对象每次属性访问都会重新查询），
+        方向按当前承诺的停靠点实时计算
+        '''
+        if self._cars_tick != self.current_tick:
+            state = self.api_client.get_state()
+            self._cars = [(e.current_floor_float, e.target_floor, len(e.passengers), e.max_capacity) for e in state.elevators]
+            self._cars_tick = self.current_tick
+        cars = []
+        for elevator_id, (position, target, load, capacity) in enumerate(self._cars):
+            target = self.committed.get(elevator_id, target)
+            direction = (target > position) - (target < position)
+            cars.append(CarState(position, direction, load, capacity))
+        return cars
+
+    def _claim_on_the_way(self, elevator_id: int, call) -> bool:
+        '''
+        电梯即将经过一个同向呼叫：已经分配给它，或者它比当前负责的电梯更早到达时，把呼叫改派给它并在这一层停靠
+        '''
+        owner = self.assigner.owner_of(call)
+        if owner == elevator_id:
+            return True
+        if owner is None and self.hall_calls.count_here(*call) == 0:
+            return False
+        cars = self._car_states()
+        self.assigner.update_cars(cars)
+        if owner is not None and self.assigner.cost(owner, cars[owner], call) <= self.assigner.cost(elevator_id, cars[elevator_id], call):
+            return False
+        self.assigner.assign_to(call, elevator_id)
+        return True
+
+    def _rebalance(self) -> None:
+        '''每个 tick 第一次有电梯停靠时重新分配所有呼叫，分到呼叫的停着的电梯立即出发'''
+        if self._rebalanced_tick == self.current_tick:
+            return
+        self._rebalanced_tick = self.current_tick
+        for elevator_id in self.assigner.rebalance(self._car_states()):
+            calls = self.assigner.assigned[elevator_id]
+            if elevator_id in self.parked and calls:
+                # 先去 ETA 最小的那个呼叫
+                eta = self.assigner.eta
+                floor, _ = min(calls, key=lambda call: eta.lookup(elevator_id, *call))
+                self._go(self.elevators[elevator_id], floor)
+
+    # ---------------- BUS 调度 ----------------
+    def _bus_dispatch(self, elevator: ProxyElevator) -> None:
+        '''每次只移动一层的 BUS 调度'''
         # 先拿到上一 tick 的运动方向
         dir_last = elevator.last_tick_direction
         curr = elevator.current_floor
@@ -210,7 +709,7 @@ class ElevatorBusExampleController(ElevatorController):
             dir_last = next_dir
         else:
             # 维持你现在的“本层同向/前方任意方向→保持；否则反转”的逻辑
-            has_here  = self._has_waiting_here(curr, dir_last)
+            has_here  = self.reverse_rule == 'here_or_ahead' and self._has_waiting_here(curr, dir_last)
             has_ahead = self._has_waiting_ahead(curr, dir_last)
             if not (has_here or has_ahead):
                 dir_last = Direction.DOWN if dir_last == Direction.UP else Direction.UP
@@ -243,20 +742,36 @@ class ElevatorBusExampleController(ElevatorController):
 
     def on_passenger_board(self, elevator: ProxyElevator, passenger: ProxyPassenger) -> None:
         '''
-        1. 仅打印乘客上电梯的信息;
+        1. 记录乘客上电梯的日志，并更新等待呼叫和车内目的层;
         2. 真正把乘客上电梯的信息发给 GUI 的动作是在 on_event_execute_end 里统一完成
         '''
-        print(f"[Man] 乘客 P{passenger.id} 进入电梯 E{elevator.id}")
+        self.log.info('board', tick=self.current_tick, passenger=passenger.id, elevator=elevator.id)
+        # 该乘客已上车，不再算“等待中”，同步更新呼叫索引
+        call = self.waiting_passengers.pop(passenger.id, None)
+        if call is not None:
+            self.hall_calls.remove(*call)
+            if self.dispatch == 'group' and self.hall_calls.count_here(*call) == 0:
+                self.assigner.remove_call(call)
         dest = getattr(passenger, "destination", None)
         if dest is not None and dest != elevator.current_floor:
             self.in_car_targets.setdefault(elevator.id, Counter())[int(dest)] += 1
+            if self.dispatch == 'group':
+                self.assigner.add_car_stop(elevator.id, int(dest))
+            if self.dispatch != 'bus':
+                # 目的层在当前目标之外时直接延长目标，不必先停一次再出发
+                dest = int(dest)
+                target = elevator.target_floor
+                curr = elevator.current_floor
+                if (target > curr and dest > target) or (target < curr and dest < target):
+                    self.committed[elevator.id] = dest
+                    elevator.go_to_floor(dest, immediate=True)
 
     def on_passenger_alight(self, elevator: ProxyElevator, passenger: ProxyPassenger, floor: ProxyFloor) -> None:
         '''
-        1. 仅打印乘客下电梯的信息;
+        1. 记录乘客下电梯的日志，并更新车内目的层;
         2. 真正把乘客下电梯的信息发给 GUI 的动作是在 on_event_execute_end 里统一完成
         '''
-        print(f"[Man] 乘客 P{passenger.id} 离开电梯 E{elevator.id} 在 F{floor.floor}")
+        self.log.info('alight', tick=self.current_tick, passenger=passenger.id, elevator=elevator.id, floor=floor.floor)
         ctr = self.in_car_targets.get(elevator.id)
         if ctr:
             f = floor.floor
@@ -264,22 +779,73 @@ class ElevatorBusExampleController(ElevatorController):
                 ctr[f] -= 1
                 if ctr[f] == 0:
                     del ctr[f]
+                if self.dispatch == 'group':
+                    self.assigner.remove_car_stop(elevator.id, f)
 
     def on_elevator_passing_floor(self, elevator: ProxyElevator, floor: ProxyFloor, direction: str) -> None:
         '''
-        目前是空实现
+        LOOK 调度：驶向的停靠点已经没有需求（呼叫被别的电梯接走了）时，改为前方仍然需要的最远停靠点
         '''
-        pass
+        if self.dispatch == 'bus':
+            return
+        target = self.committed.get(elevator.id)
+        if target is None or self._needed_stop(elevator.id, target, 'up') or self._needed_stop(elevator.id, target, 'down'):
+            return
+        far = self._furthest_stop(elevator.id, floor.floor, Direction.UP if direction == 'up' else Direction.DOWN)
+        if far is not None and far != target:
+            self.committed[elevator.id] = far
+            elevator.go_to_floor(far, immediate=True)
 
     def on_elevator_approaching(self, elevator: ProxyElevator, floor: ProxyFloor, direction: str) -> None:
         '''
-        目前是空实现
+        LOOK 调度：即将到达的楼层有人下车，或有同向乘客在等（且电梯没满）时，立即在这一层插入停靠；
+        群控下只停分配给这台电梯的呼叫
         '''
-        pass
+        if self.dispatch == 'bus':
+            return
+        f = floor.floor
+        if f == self.committed.get(elevator.id):
+            return
+        if self.dispatch == 'group':
+            pickup = self._claim_on_the_way(elevator.id, (f, direction))
+        else:
+            pickup = self.hall_calls.count_here(f, direction) > 0 and f not in self.committed.values()
+        if self.in_car_targets.get(elevator.id, {}).get(f, 0) > 0 or (pickup and not elevator.is_full):
+            self.committed[elevator.id] = f
+            elevator.go_to_floor(f, immediate=True)
 
 
-def Start_Algorithm(start_event, finish_event, message_queue):
-    algorithm = ElevatorBusExampleController(start_event, finish_event, message_queue)
+def Start_Algorithm(start_event, finish_event, message_queue, local = False, traffic_dir = None, decoupled = False, shared_state = None,
+                    trace = None, trace_compress = False, log_level = 'warning', log_file = None,
+                    metrics_file = None, metrics_port = None, profile = None, profile_sample = 0.0,
+                    dispatch = 'group', parking = 'demand', rollout = 0):
+    '''
+    local=True 时使用进程内的 LocalEngine 运行 traffic_dir 下的流量（默认为模拟器自带的流量目录），
+    不需要启动 127.0.0.1:8000 上的模拟器服务器。
+    decoupled=True 时控制器不等待 GUI，只向 message_queue 发布每个 tick 的快照；
+    shared_state 为共享内存表的名字时，快照改为写入共享内存；
+    trace 为文件路径时把整个运行过程记录为二进制 trace（见 tick_trace.py），trace_compress 开启块压缩；
+    log_level / log_file 为日志级别和 JSON lines 日志文件（默认写到标准输出，见 tick_log.py）；
+    metrics_file / metrics_port 不为 None 时开启埋点，定期写 JSON 快照 / 在本地端口提供 Prometheus 指标（见 metrics.py）；
+    profile 为文件路径时开启性能剖析，每轮流量结束时写出 collapsed-stack 文件和汇总，profile_sample 为采样间隔（秒，0 不采样），见 profiler.py；
+    dispatch / parking / rollout 直接传给控制器
+    '''
+    metrics = None
+    if metrics_file is not None or metrics_port is not None:
+        from metrics import Metrics
+        metrics = Metrics(snapshot_path = metrics_file, port = metrics_port)
+    profiler = None
+    if profile is not None:
+        from profiler import CallProfiler
+        profiler = CallProfiler(profile, profile_sample)
+    engine = None
+    if local:
+        from local_engine import LocalEngine
+        engine = LocalEngine.from_dir(traffic_dir)
+    algorithm = ElevatorBusExampleController(start_event, finish_event, message_queue, engine, decoupled = decoupled, shared_state = shared_state,
+                                             trace = trace, trace_compress = trace_compress, log_level = log_level, log_file = log_file,
+                                             metrics = metrics, profiler = profiler,
+                                             dispatch = dispatch, parking = parking, rollout = rollout)
     algorithm.start()
 
 # Start_Algorithm(None,None,None)
\ No newline at end of file
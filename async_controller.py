@@ -0,0 +1,481 @@
+'''
+asyncio 控制器模式（main_no_gui.py --async）
+基类的同步事件循环里，发送指令、步进、取状态各是一次独立的 HTTP 往返，依次等待。这里用 asyncio 驱动同一个控制器的回调：
+- 上一个 tick 缓冲的指令、这一个 tick 的 step 和 state 请求在同一条 keep-alive 连接上一次写出（HTTP 管线化），
+  服务器按顺序处理，客户端再依次读回响应，每个 tick 只有一次往返；
+- 连接从按 (host, port) 复用的连接池中取出，用完放回；
+- 多个互相独立的仿真会话（各自的模拟器服务器，或各自的 LocalEngine）在同一个事件循环中运行，
+  一个会话等待 I/O 时其它会话执行回调。
+控制器本身不需要改动：它拿到的 api_client 是一个同步的门面，get_state 返回本 tick 取回的状态，go_to_floor 只记入待发队列。
+'''
+import asyncio
+import json
+import os
+import sys
+import time
+from collections import defaultdict
+from pprint import pformat
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import urlparse
+
+from elevator_saga.core.models import (
+    ElevatorState,
+    EventType,
+    FloorState,
+    PassengerInfo,
+    PerformanceMetrics,
+    SimulationEvent,
+    SimulationState,
+    StepResponse,
+)
+from elevator_saga.utils.logger import warning
+
+from algorithm import ElevatorBusExampleController
+
+# [(elevator_id, floor, immediate)]
+Commands = List[Tuple[int, int, bool]]
+
+
+# ---------------- 连接池与 HTTP/1.1 管线化 ----------------
+class ConnectionPool:
+    '''按 (host, port) 保存空闲的 keep-alive 连接，所有会话共用'''
+    def __init__(self, limit: int = 8):
+        self.limit = limit
+        self._idle: Dict[Tuple[str, int], list] = defaultdict(list)
+        self.opened = 0  # 新建的连接数
+
+    async def acquire(self, host: str, port: int):
+        idle = self._idle[(host, port)]
+        while idle:
+            reader, writer = idle.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        self.opened += 1
+        return await asyncio.open_connection(host, port)
+
+    def release(self, host: str, port: int, conn) -> None:
+        idle = self._idle[(host, port)]
+        if len(idle) < self.limit:
+            idle.append(conn)
+        else:
+            conn[1].close()
+
+    async def close(self) -> None:
+        for conns in self._idle.values():
+            for _, writer in conns:
+                writer.close()
+                try:
+                    await writer.wait_closed()
+                except ConnectionError:
+                    pass
+        self._idle.clear()
+
+
+async def _read_response(reader: asyncio.StreamReader) -> Tuple[int, Dict[str, Any], bool]:
+    '''读一个 HTTP 响应，返回 (状态码, JSON, 连接能否复用)'''
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed by server')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    keep_alive = headers.get('connection', '').lower() != 'close'
+    if 'content-length' in headers:
+        body = await reader.readexactly(int(headers['content-length']))
+    elif headers.get('transfer-encoding', '').lower() == 'chunked':
+        chunks = []
+        while True:
+            size = int((await reader.readline()).split(b';')[0], 16)
+            chunk = await reader.readexactly(size + 2)
+            if not size:
+                break
+            chunks.append(chunk[:-2])
+        body = b''.join(chunks)
+    else:
+        body = await reader.read()
+        keep_alive = False
+    return status, json.loads(body.decode('utf-8')) if body else {}, keep_alive
+
+
+def _checked(response: Tuple[int, Dict[str, Any]], what: str) -> Dict[str, Any]:
+    status, data = response
+    if status >= 400 or 'error' in data:
+        raise RuntimeError(f'{what} failed: {data.get("error_message") or data.get("error") or status}')
+    return data
+
+
+class _LazyPassengers(dict):
+    '''
+    {乘客 id: PassengerInfo}，先保存服务器返回的原始字典，第一次读到某个乘客时才构造 PassengerInfo。
+    state 里是所有乘客（含已送达的），而控制器每个 tick 只查看少数几个；SerializableModel.from_dict 每次都要
+    inspect.signature，逐个构造会成为客户端最大的开销
+    '''
+    def __getitem__(self, key):
+        value = dict.__getitem__(self, key)
+        if isinstance(value, dict):
+            value = PassengerInfo.from_dict(value)
+            dict.__setitem__(self, key, value)
+        return value
+
+    def get(self, key, default=None):
+        return self[key] if key in self else default
+
+    def values(self):
+        return [self[key] for key in self]
+
+    def items(self):
+        return [(key, self[key]) for key in self]
+
+
+def _parse_state(data: Dict[str, Any]) -> SimulationState:
+    '''与 ElevatorAPIClient.get_state 相同的解析，乘客按需构造'''
+    passengers_data = data.get('passengers', {})
+    if isinstance(passengers_data, dict) and 'completed' in passengers_data:
+        passengers: Dict[int, PassengerInfo] = {}
+    else:
+        passengers = _LazyPassengers((int(k), v) for k, v in passengers_data.items() if isinstance(v, dict))
+    metrics_data = data.get('metrics', {})
+    return SimulationState(
+        tick=data.get('tick', 0),
+        elevators=[ElevatorState.from_dict(e) for e in data.get('elevators', [])],
+        floors=[FloorState.from_dict(f) for f in data.get('floors', [])],
+        passengers=passengers,
+        metrics=PerformanceMetrics.from_dict(metrics_data) if metrics_data else PerformanceMetrics(),
+        events=[],
+    )
+
+
+def _parse_step(data: Dict[str, Any]) -> StepResponse:
+    '''与 ElevatorAPIClient.step 相同的解析，未知的事件类型跳过'''
+    events = []
+    for event_data in data.get('events', []):
+        event_dict = dict(event_data)
+        if isinstance(event_dict.get('type'), str):
+            try:
+                event_dict['type'] = EventType(event_dict['type'])
+            except ValueError:
+                warning(f"Unknown event type: {event_dict['type']}", prefix="CLIENT")
+                continue
+        events.append(SimulationEvent.from_dict(event_dict))
+    return StepResponse(success=True, tick=data.get('tick', 0), events=events)
+
+
+class AsyncHTTPClient:
+    '''
+    模拟器服务器的异步客户端。每个方法把需要的请求一次写出（HTTP/1.1 管线化），再按顺序读回全部响应，
+    例如一个 tick 的 [go_to_floor ..., step, state] 只花一次往返
+    '''
+    def __init__(self, base_url: str, pool: ConnectionPool, client_type: str = 'algorithm'):
+        url = urlparse(base_url)
+        self.base_url = base_url.rstrip('/')
+        self.host = url.hostname
+        self.port = url.port or 80
+        self.pool = pool
+        self.client_type = client_type
+        self.client_id: Optional[str] = None
+        self.round_trips = 0
+
+    def _encode(self, method: str, endpoint: str, data: Optional[dict]) -> bytes:
+        lines = [f'{method} {endpoint} HTTP/1.1', f'Host: {self.host}:{self.port}', f'X-Client-Type: {self.client_type}']
+        if self.client_id:
+            lines.append(f'X-Client-ID: {self.client_id}')
+        body = b''
+        if data is not None:
+            body = json.dumps(data).encode('utf-8')
+            lines.append('Content-Type: application/json')
+        lines.append(f'Content-Length: {len(body)}')
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body
+
+    async def pipeline(self, requests: Sequence[Tuple[str, str, Optional[dict]]]) -> List[Tuple[int, Dict[str, Any]]]:
+        '''requests 为 [(method, endpoint, JSON 或 None)]，全部写出后按顺序读回 [(状态码, JSON)]'''
+        responses = []
+        retried = False
+        while len(responses) < len(requests):
+            remaining = requests[len(responses):]
+            reader, writer = await self.pool.acquire(self.host, self.port)
+            keep_alive = True
+            try:
+                writer.write(b''.join(self._encode(*request) for request in remaining))
+                await writer.drain()
+                self.round_trips += 1
+                for _ in remaining:
+                    status, data, keep_alive = await _read_response(reader)
+                    responses.append((status, data))
+                    # 服务器在这个响应之后关闭连接（例如 hypercorn 每条连接最多处理 1000 个请求），
+                    # 后面的请求没有被处理，换一条新连接重发
+                    if not keep_alive:
+                        break
+            except (ConnectionError, asyncio.IncompleteReadError):
+                writer.close()
+                # 池里的空闲连接可能已被服务器关闭：这一批一个响应都没收到时换一条新连接重发一次
+                if retried or len(responses) > len(requests) - len(remaining):
+                    raise
+                retried = True
+                continue
+            if keep_alive:
+                self.pool.release(self.host, self.port, (reader, writer))
+            else:
+                writer.close()
+        return responses
+
+    def _registered(self, response: Tuple[int, Dict[str, Any]]) -> None:
+        status, data = response
+        if status < 400 and data.get('success'):
+            self.client_id = data.get('client_id')
+        else:
+            warning(f"Client registration failed: {data.get('error')}", prefix="CLIENT")
+
+    async def open(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        '''注册客户端，同时取回状态和流量信息'''
+        register, state, traffic = await self.pipeline([
+            ('POST', '/api/client/register', {}), ('GET', '/api/state', None), ('GET', '/api/traffic/info', None),
+        ])
+        self._registered(register)
+        return _parse_state(_checked(state, 'Get state')), _checked(traffic, 'Get traffic info')
+
+    async def fetch(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        state, traffic = await self.pipeline([('GET', '/api/state', None), ('GET', '/api/traffic/info', None)])
+        return _parse_state(_checked(state, 'Get state')), _checked(traffic, 'Get traffic info')
+
+    async def reset(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        '''重置模拟并重新注册（服务器重置时会清除客户端记录），同时取回状态和流量信息'''
+        reset, register, state, traffic = await self.pipeline([
+            ('POST', '/api/reset', {}), ('POST', '/api/client/register', {}),
+            ('GET', '/api/state', None), ('GET', '/api/traffic/info', None),
+        ])
+        _checked(reset, 'Reset')
+        self._registered(register)
+        return _parse_state(_checked(state, 'Get state')), _checked(traffic, 'Get traffic info')
+
+    def _command_requests(self, commands: Commands) -> list:
+        return [
+            ('POST', f'/api/elevators/{elevator_id}/go_to_floor', {'floor': floor, 'immediate': immediate})
+            for elevator_id, floor, immediate in commands
+        ]
+
+    def _check_commands(self, responses) -> None:
+        for status, data in responses:
+            if status >= 400 or not data.get('success'):
+                raise RuntimeError(f"Command failed: {data.get('error_message') or data.get('error')}")
+
+    async def tick(self, commands: Commands, current_tick: int) -> Tuple[StepResponse, SimulationState]:
+        '''发出上一个 tick 的指令，步进一个 tick 并取回新状态'''
+        responses = await self.pipeline(self._command_requests(commands) + [
+            ('POST', '/api/step', {'ticks': 1, 'current_tick': current_tick}), ('GET', '/api/state', None),
+        ])
+        self._check_commands(responses[:-2])
+        return _parse_step(_checked(responses[-2], 'Step')), _parse_state(_checked(responses[-1], 'Get state'))
+
+    async def next_traffic_round(self, commands: Commands, full_reset: bool = False) -> bool:
+        '''发出剩下的指令后切换到下一个流量文件，没有更多流量时返回 False'''
+        responses = await self.pipeline(self._command_requests(commands) + [
+            ('POST', '/api/traffic/next', {'full_reset': full_reset}),
+        ])
+        self._check_commands(responses[:-1])
+        status, data = responses[-1]
+        return status < 400 and bool(data.get('success'))
+
+
+class AsyncLocalClient:
+    '''LocalEngine 的异步包装，接口与 AsyncHTTPClient 相同；每个 tick 让出一次事件循环，多个本地会话轮流推进'''
+    def __init__(self, engine):
+        self.engine = engine
+        self.base_url = engine.base_url
+        self.round_trips = 0
+
+    async def open(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        return await self.fetch()
+
+    async def fetch(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        return self.engine.get_state(), self.engine.get_traffic_info()
+
+    async def reset(self) -> Tuple[SimulationState, Dict[str, Any]]:
+        self.engine.reset()
+        return await self.fetch()
+
+    def _send(self, commands: Commands) -> None:
+        for elevator_id, floor, immediate in commands:
+            self.engine.go_to_floor(elevator_id, floor, immediate)
+
+    async def tick(self, commands: Commands, current_tick: int) -> Tuple[StepResponse, SimulationState]:
+        await asyncio.sleep(0)
+        self._send(commands)
+        step = self.engine.step(1)
+        self.round_trips += 1
+        return step, self.engine.get_state()
+
+    async def next_traffic_round(self, commands: Commands, full_reset: bool = False) -> bool:
+        self._send(commands)
+        return self.engine.next_traffic_round(full_reset)
+
+
+# ---------------- 会话 ----------------
+class _SessionClient:
+    '''交给控制器的同步 api_client：状态由会话在每个 tick 写入，go_to_floor 记入待发队列，随下一次步进一起发出'''
+    def __init__(self, base_url: str):
+        # 不是 http:// 开头，CommandBuffer 在 flush 时调用这里的 go_to_floor，而不是自己发 HTTP 请求
+        self.base_url = f'async+{base_url}'
+        self.client_type = 'algorithm'
+        self.state: Optional[SimulationState] = None
+        self.traffic_info: Dict[str, Any] = {}
+        self.outbox: Commands = []
+
+    def get_state(self, force_reload: bool = False) -> SimulationState:
+        return self.state
+
+    def mark_tick_processed(self) -> None:
+        pass
+
+    def get_traffic_info(self) -> Dict[str, Any]:
+        return self.traffic_info
+
+    def go_to_floor(self, elevator_id: int, floor: int, immediate: bool = False) -> bool:
+        self.outbox.append((elevator_id, floor, immediate))
+        return True
+
+    def take(self) -> Commands:
+        commands, self.outbox = self.outbox, []
+        return commands
+
+
+class AsyncSession:
+    '''
+    用 asyncio 驱动一个 ElevatorBusExampleController，事件顺序与基类的 _run_event_driven_simulation 相同。
+    client 为 AsyncHTTPClient 或 AsyncLocalClient，controller_args 原样传给控制器（调度参数、日志、埋点等）
+    '''
+    def __init__(self, client, name: str = '', **controller_args):
+        self.client = client
+        self.name = name
+        self.facade = _SessionClient(client.base_url)
+        self.controller = ElevatorBusExampleController(None, None, None, self.facade, **controller_args)
+        # 每轮流量结束时的指标
+        self.results: List[dict] = []
+        self._io_hist = None
+        if self.controller.metrics is not None:
+            self._io_hist = self.controller.metrics.histogram('client_seconds', method='pipeline')
+
+    async def run(self) -> List[dict]:
+        controller = self.controller
+        controller.on_start()
+        controller.is_running = True
+        try:
+            await self._run()
+        finally:
+            controller.is_running = False
+            controller.on_stop()
+        return self.results
+
+    def _load(self, state: SimulationState, traffic: Dict[str, Any]) -> None:
+        '''新一轮流量：按新状态重建代理对象并初始化控制器（on_init 下达的指令进入待发队列）'''
+        controller = self.controller
+        self.facade.state = state
+        self.facade.traffic_info = traffic
+        controller.current_tick = 0
+        controller._update_wrappers(state, init=True)
+        controller.current_traffic_max_tick = int(traffic.get('max_tick', 0))
+        controller._internal_init(controller.elevators, controller.floors)
+
+    async def _run(self) -> None:
+        controller = self.controller
+        client = self.client
+        state, traffic = await client.open()
+        while state.tick > 0 or not traffic.get('max_tick'):
+            if state.tick > 0:
+                warning("模拟器可能已经开始了一次模拟，执行重置...", prefix="CONTROLLER")
+                state, traffic = await client.reset()
+            else:
+                warning("模拟器接收到的最大tick时间为0，可能所有的测试案例已用完，请求重置...", prefix="CONTROLLER")
+                await client.next_traffic_round([], full_reset=True)
+                state, traffic = await client.fetch()
+            await asyncio.sleep(0.3)
+        self._load(state, traffic)
+
+        while controller.is_running and controller.current_tick < controller.current_traffic_max_tick:
+            start = time.perf_counter()
+            step, state = await client.tick(self.facade.take(), controller.current_tick)
+            if self._io_hist is not None:
+                self._io_hist.observe(time.perf_counter() - start)
+            self.facade.state = state
+            controller._update_wrappers(state)
+            controller.current_tick = step.tick
+            events = step.events
+
+            controller.on_event_execute_start(controller.current_tick, events, controller.elevators, controller.floors)
+            for event in events:
+                controller._handle_single_event(event)
+            controller.on_event_execute_end(controller.current_tick, events, controller.elevators, controller.floors)
+
+            if controller.current_tick >= controller.current_traffic_max_tick:
+                self._report(state)
+                if not await client.next_traffic_round(self.facade.take()):
+                    break
+                if controller.profiler is not None:
+                    controller._profile_round()
+                self._load(*await client.reset())
+
+    def _report(self, state: SimulationState) -> None:
+        '''一轮流量结束：记录并输出指标（与同步模式的输出相同，多个会话时先输出会话名）'''
+        metrics = state.metrics.to_dict()
+        self.results.append(metrics)
+        header = f'[{self.name}]\n' if self.name else ''
+        sys.stdout.write(f'{header}{pformat(metrics)}\n')
+        sys.stdout.flush()
+
+
+async def run_sessions(sessions: Sequence[AsyncSession]) -> List[List[dict]]:
+    '''在当前事件循环中并发运行所有会话，返回每个会话每轮的指标'''
+    return list(await asyncio.gather(*(session.run() for session in sessions)))
+
+
+def _session_path(path: Optional[str], index: int) -> Optional[str]:
+    '''多个会话时第 i 个（i > 0）会话的输出文件名加 .s<i> 后缀'''
+    if path is None or index == 0:
+        return path
+    root, ext = os.path.splitext(path)
+    return f'{root}.s{index}{ext}'
+
+
+def Start_Async(servers: Optional[Sequence[str]] = None, local: bool = False, traffic_dir: Optional[str] = None,
+                sessions: int = 1, trace = None, trace_compress = False, log_level = 'warning', log_file = None,
+                metrics_file = None, metrics_port = None, profile = None, profile_sample = 0.0,
+                dispatch = 'group', parking = 'demand', rollout = 0):
+    '''
+    asyncio 模式的入口：servers 中的每个模拟器服务器一个会话（默认 http://127.0.0.1:8000）；
+    local=True 时改为 sessions 个各自独立的 LocalEngine 会话（流量都来自 traffic_dir）。
+    其余参数与 Start_Algorithm 相同，多个会话时文件名加 .s<i> 后缀、指标端口依次加 1
+    '''
+    async def main():
+        pool = ConnectionPool()
+        if local:
+            from local_engine import LocalEngine
+            clients = [AsyncLocalClient(LocalEngine.from_dir(traffic_dir)) for _ in range(sessions)]
+        else:
+            clients = [AsyncHTTPClient(url, pool) for url in (servers or ['http://127.0.0.1:8000'])]
+        runs = []
+        for i, client in enumerate(clients):
+            metrics = None
+            if metrics_file is not None or metrics_port is not None:
+                from metrics import Metrics
+                metrics = Metrics(snapshot_path = _session_path(metrics_file, i),
+                                  port = None if metrics_port is None else metrics_port + i)
+            profiler = None
+            if profile is not None:
+                from profiler import CallProfiler
+                profiler = CallProfiler(_session_path(profile, i), profile_sample)
+            name = client.base_url if len(clients) > 1 and not local else (f'session {i}' if len(clients) > 1 else '')
+            runs.append(AsyncSession(client, name, trace = _session_path(trace, i), trace_compress = trace_compress,
+                                     log_level = log_level, log_file = _session_path(log_file, i),
+                                     metrics = metrics, profiler = profiler,
+                                     dispatch = dispatch, parking = parking, rollout = rollout))
+        try:
+            return await run_sessions(runs)
+        finally:
+            await pool.close()
+
+    return asyncio.run(main())
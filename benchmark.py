@@ -0,0 +1,189 @@
+'''
+调度算法基准测试
+用可复现（固定随机种子）的合成流量驱动控制器在 LocalEngine 上运行，统计等待时间、乘梯时间、吞吐量、
+电梯运行距离以及仿真速度，结果写成 CSV 表格，方便不同版本之间逐行对比。
+
+用法：
+python benchmark.py [--policies bus look group] [--profiles up_peak down_peak] [--sizes 6x2 12x4] [--seeds 1 2 3] [--output bench.csv]
+'''
+import argparse
+import contextlib
+import csv
+import importlib
+import os
+import random
+import time
+from typing import Any, Dict, List
+
+from local_engine import LocalEngine
+
+# 可参与测试的调度策略：名字 -> ("模块:类名", 构造参数)，类的构造函数签名与 ElevatorBusExampleController 相同
+CONTROLLER = 'algorithm:ElevatorBusExampleController'
+POLICIES = {
+    'bus': (CONTROLLER, {'dispatch': 'bus'}),
+    'look': (CONTROLLER, {'dispatch': 'look'}),
+    'group': (CONTROLLER, {'dispatch': 'group'}),
+}
+
+PROFILES = ['up_peak', 'down_peak', 'lunch', 'inter_floor']
+SIZES = ['6x2', '12x4', '20x6']
+
+FIELDS = [
+    'policy', 'profile', 'floors', 'elevators', 'seed', 'ticks', 'passengers', 'delivered',
+    'avg_wait', 'p95_wait', 'max_wait', 'avg_journey', 'p95_journey', 'max_journey',
+    'delivered_per_tick', 'travel_distance', 'wall_time', 'ticks_per_second',
+]
+
+
+# ---------------- 合成流量 ----------------
+def _pick_other(rng: random.Random, floors: int, floor: int) -> int:
+    '''随机选一个不等于 floor 的楼层'''
+    other = rng.randrange(floors - 1)
+    return other + 1 if other >= floor else other
+
+
+def generate_traffic(profile: str, floors: int, elevators: int, seed: int,
+                     duration: int = 200, passengers: int = 0, capacity: int = 10) -> Dict[str, Any]:
+    '''
+    生成一轮流量，格式与模拟器的流量文件相同
+    up_peak: 大部分乘客从大堂 (0 层) 去往各楼层
+    down_peak: 大部分乘客从各楼层去往大堂
+    lunch: 前半段以下行到大堂为主，后半段以从大堂上行为主
+    inter_floor: 楼层之间均匀随机
+    '''
+    rng = random.Random(seed)
+    if passengers <= 0:
+        passengers = floors * elevators * 3
+    # 乘客只在前 80% 的时间内到达，留出时间让电梯送完
+    last_tick = max(1, int(duration * 0.8))
+    traffic = []
+    for _ in range(passengers):
+        tick = rng.randint(1, last_tick)
+        lobby_share = 0.8
+        if profile == 'up_peak':
+            to_lobby = False
+        elif profile == 'down_peak':
+            to_lobby = True
+        elif profile == 'lunch':
+            to_lobby = tick < last_tick / 2
+        elif profile == 'inter_floor':
+            lobby_share = 0.0
+            to_lobby = False
+        else:
+            raise ValueError(f'unknown traffic profile: {profile}')
+
+        if rng.random() < lobby_share:
+            upper = rng.randint(1, floors - 1)
+            origin, destination = (upper, 0) if to_lobby else (0, upper)
+        else:
+            origin = rng.randrange(floors)
+            destination = _pick_other(rng, floors, origin)
+        traffic.append({'origin': origin, 'destination': destination, 'tick': tick})
+
+    building = {'floors': floors, 'elevators': elevators, 'elevator_capacity': capacity, 'duration': duration}
+    return {'building': building, 'traffic': traffic}
+
+
+# ---------------- 运行与统计 ----------------
+def load_policy(name: str):
+    '''按名字或 "模块:类名" 加载控制器类，返回 (类, 该策略固定的构造参数)'''
+    path, params = POLICIES.get(name, (name, {}))
+    module_name, class_name = path.split(':')
+    return getattr(importlib.import_module(module_name), class_name), params
+
+
+def _percentile(data: List[float], percent: float) -> float:
+    if not data:
+        return 0.0
+    data = sorted(data)
+    return data[min(len(data) - 1, int(len(data) * percent / 100))]
+
+
+def run_controller(controller_cls, traffic: Dict[str, Any], **kwargs) -> Dict[str, Any]:
+    '''在本地引擎上运行一轮流量，返回 KPI；控制器的控制台输出全部丢弃'''
+    engine = LocalEngine([traffic])
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        controller = controller_cls(None, None, None, engine, **kwargs)
+        t0 = time.perf_counter()
+        controller.start()
+        wall_time = time.perf_counter() - t0
+    return collect_kpis(engine, wall_time)
+
+
+def collect_kpis(engine: LocalEngine, wall_time: float) -> Dict[str, Any]:
+    '''
+    等待时间 = 上梯 tick - 到达 tick，统计所有乘客（到结束仍未上梯的按结束时刻截断，与模拟器的算法一致）；
+    乘梯时间 = 下梯 tick - 到达 tick，只统计真正送达的乘客
+    '''
+    passengers = list(engine.state.passengers.values())
+    waits = [float(p.pickup_tick - p.arrive_tick) for p in passengers]
+    journeys = [float(p.dropoff_tick - p.arrive_tick) for p in passengers if p.arrived]
+    ticks = engine.state.tick
+    return {
+        'ticks': ticks,
+        'passengers': len(passengers),
+        'delivered': len(journeys),
+        'avg_wait': round(sum(waits) / len(waits), 3) if waits else 0.0,
+        'p95_wait': _percentile(waits, 95),
+        'max_wait': max(waits, default=0.0),
+        'avg_journey': round(sum(journeys) / len(journeys), 3) if journeys else 0.0,
+        'p95_journey': _percentile(journeys, 95),
+        'max_journey': max(journeys, default=0.0),
+        'delivered_per_tick': round(len(journeys) / ticks, 4) if ticks else 0.0,
+        'travel_distance': round(sum(engine.travel_distance), 1),
+        'wall_time': round(wall_time, 4),
+        'ticks_per_second': round(ticks / wall_time, 1) if wall_time > 0 else 0.0,
+    }
+
+
+def run_case(policy: str, profile: str, floors: int, elevators: int, seed: int,
+             duration: int = 200, passengers: int = 0, params: Dict[str, Any] = None) -> Dict[str, Any]:
+    '''跑一个 (策略, 流量, 规模, 种子) 组合，返回一行结果；params 覆盖策略固定的构造参数'''
+    traffic = generate_traffic(profile, floors, elevators, seed, duration, passengers)
+    row = {'policy': policy, 'profile': profile, 'floors': floors, 'elevators': elevators, 'seed': seed}
+    controller_cls, preset = load_policy(policy)
+    row.update(run_controller(controller_cls, traffic, **{**preset, **(params or {})}))
+    return row
+
+
+def parse_size(size: str):
+    floors, elevators = size.lower().split('x')
+    return int(floors), int(elevators)
+
+
+def write_table(rows: List[Dict[str, Any]], path: str, fields: List[str] = FIELDS) -> None:
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='电梯调度基准测试')
+    parser.add_argument('--policies', nargs='+', default=['group'], help='策略名（bus / look / group）或 模块:类名')
+    parser.add_argument('--profiles', nargs='+', default=PROFILES, choices=PROFILES)
+    parser.add_argument('--sizes', nargs='+', default=SIZES, help='楼层数x电梯数，例如 12x4')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[1, 2, 3])
+    parser.add_argument('--duration', type=int, default=200)
+    parser.add_argument('--passengers', type=int, default=0, help='每轮乘客数，0 表示按建筑规模自动决定')
+    parser.add_argument('--output', default='bench.csv')
+    args = parser.parse_args()
+
+    rows = []
+    for policy in args.policies:
+        for profile in args.profiles:
+            for size in args.sizes:
+                floors, elevators = parse_size(size)
+                for seed in args.seeds:
+                    row = run_case(policy, profile, floors, elevators, seed, args.duration, args.passengers)
+                    rows.append(row)
+                    print(f"{policy:8} {profile:12} {floors:3}F x{elevators:2} seed={seed:<4} "
+                          f"wait avg/p95/max={row['avg_wait']}/{row['p95_wait']}/{row['max_wait']} "
+                          f"journey avg={row['avg_journey']} delivered={row['delivered']}/{row['passengers']} "
+                          f"{row['ticks_per_second']} ticks/s")
+    write_table(rows, args.output)
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
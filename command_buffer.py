@@ -0,0 +1,111 @@
+'''
+电梯指令缓冲
+控制器在一个 tick 的回调里发出的 go_to_floor 指令先写入缓冲区，同一电梯被后来的指令覆盖的旧指令直接合并掉，
+在 tick 结束时 (on_event_execute_end) 统一 flush。
+HTTP 模式下 flush 复用一条 keep-alive 连接，不再为每条指令新建一次 urllib 连接；
+本地引擎 (LocalEngine) 下直接调用引擎的 go_to_floor。
+'''
+import http.client
+import json
+import time
+from urllib.parse import urlparse
+
+from elevator_saga.utils.logger import debug
+
+
+class CommandBuffer:
+    '''
+    包装控制器的 api_client：go_to_floor 只做缓冲，其余方法原样转发给被包装的客户端。
+    因为 ProxyElevator.go_to_floor 调用的就是 api_client.go_to_floor，所以所有电梯指令都会经过这里。
+    '''
+    def __init__(self, client):
+        # 可选的埋点（metrics.Metrics）：转发的客户端调用和 flush 的耗时记入 client_seconds
+        self.metrics = None
+        # 可选的性能剖析（profiler.CallProfiler）：转发的客户端调用计入 client 分类
+        self.profiler = None
+        self._timed = {}
+        self._client = client
+        # {(elevator_id, immediate): floor}
+        # 模拟器里 immediate 指令改的是当前目标层，非 immediate 指令改的是下一目标层，两者互不覆盖，
+        # 因此按 (电梯, immediate) 合并，同一键只保留最后一条，最终效果与逐条发送完全一致
+        self.pending = {}
+        self.sent = 0  # 实际发出的指令数
+        self.coalesced = 0  # 被合并掉的指令数
+        self._conn = None
+        url = urlparse(getattr(client, 'base_url', '') or '')
+        self._http = url.scheme == 'http'
+        self._host = url.hostname
+        self._port = url.port or 80
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if (self.metrics is None and self.profiler is None) or not callable(attr):
+            return attr
+        timed = self._timed.get(name)
+        if timed is None:
+            timed = attr
+            if self.metrics is not None:
+                timed = self.metrics.timed('client_seconds', timed, method=name)
+            if self.profiler is not None:
+                timed = self.profiler.wrap('client', name, timed)
+            self._timed[name] = timed
+        return timed
+
+    def go_to_floor(self, elevator_id: int, floor: int, immediate: bool = False) -> bool:
+        key = (elevator_id, immediate)
+        if key in self.pending:
+            self.coalesced += 1
+        self.pending[key] = floor
+        return True
+
+    def pending_commands(self):
+        '''按发送顺序排列的待发指令 [(elevator_id, floor, immediate)]，immediate 指令在前'''
+        return [
+            (elevator_id, floor, immediate)
+            for (elevator_id, immediate), floor in sorted(self.pending.items(), key=lambda item: not item[0][1])
+        ]
+
+    def flush(self) -> None:
+        '''把缓冲区里的指令一次性发出，immediate 指令先于普通指令'''
+        if not self.pending:
+            return
+        start = time.perf_counter()
+        commands = self.pending_commands()
+        self.pending = {}
+        if self._http:
+            debug(f"Sending {len(commands)} buffered elevator commands", prefix="CLIENT")
+        for elevator_id, floor, immediate in commands:
+            if self._http:
+                self._post(f"/api/elevators/{elevator_id}/go_to_floor", {"floor": floor, "immediate": immediate})
+            else:
+                self._client.go_to_floor(elevator_id, floor, immediate)
+            self.sent += 1
+        if self.metrics is not None:
+            self.metrics.histogram('client_seconds', method='flush').observe(time.perf_counter() - start)
+
+    def _post(self, endpoint: str, data: dict) -> dict:
+        '''在持久连接上发送 POST；连接被服务器关闭时重连一次'''
+        body = json.dumps(data).encode("utf-8")
+        # 旧版 SDK 的客户端没有 _get_request_headers
+        get_headers = getattr(self._client, "_get_request_headers", None)
+        headers = get_headers() if get_headers else {"Content-Type": "application/json"}
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self._host, self._port, timeout=600)
+            try:
+                self._conn.request("POST", endpoint, body=body, headers=headers)
+                response = self._conn.getresponse()
+                response_data = json.loads(response.read().decode("utf-8"))
+                break
+            except (http.client.HTTPException, ConnectionError):
+                self.close()
+                if attempt == 1:
+                    raise
+        if not response_data.get("success"):
+            raise RuntimeError(f"Command failed: {response_data.get('error_message') or response_data.get('error')}")
+        return response_data
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
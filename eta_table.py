@@ -0,0 +1,161 @@
+'''
+电梯 × 楼层 × 方向的预计到达时间表 (ETA)
+eta[e, f, 0] / eta[e, f, 1]：电梯 e 沿 LOOK 路线到达 f 层并能按上行 / 下行方向接客的估计 tick 数。
+路线：先沿当前方向走到最远的停靠点，掉头走到另一端，再掉头；途中每个停靠点（第一次经过时）多花 TICKS_PER_STOP。
+
+表按行增量维护，查询是 O(1) 的数组下标：
+- 电梯在两层之间匀速前进、没有越过楼层时，整行统一减去行驶时间；
+- 停靠点增减不改变路线两端时，只给路线上排在该停靠点之后的表项加减一次停靠时间；
+- 其余情况（换方向、越过楼层、路线两端变化）只把这一行标记为脏，下次查询时用 NumPy 整行重算
+'''
+import math
+
+import numpy as np
+
+# 行驶一层的 tick 数（一层 10 个单位，匀速时每 tick 走 2 个单位）
+TICKS_PER_FLOOR = 5
+# 每次中途停靠额外花费的 tick 数（减速、停靠上下客、起步）
+TICKS_PER_STOP = 4
+
+UP = 0
+DOWN = 1
+# 比较路线距离时的容差（增量更新累积的浮点误差不能改变“先经过哪个停靠点”的判断）
+EPS = 1e-6
+
+
+class EtaTable:
+    def __init__(self, num_elevators: int, num_floors: int):
+        self.num_floors = num_floors
+        self.floors = np.arange(num_floors, dtype=float)
+        # 路线上的行驶距离（层）和 ETA（tick），最后一维为 [上行, 下行]
+        self.dist = np.zeros((num_elevators, num_floors, 2))
+        self.eta = np.zeros((num_elevators, num_floors, 2))
+        # 每台电梯在每层的停靠点计数（车内目的层 + 分配给它的呼叫）
+        self.stops = np.zeros((num_elevators, num_floors), dtype=np.int32)
+        self.position = np.zeros(num_elevators)
+        self.direction = np.zeros(num_elevators, dtype=np.int8)
+        self.dirty = np.ones(num_elevators, dtype=bool)
+        # 统计：整行重算次数
+        self.recomputed = 0
+
+    # ---------------- 查询 ----------------
+    def lookup(self, elevator_id: int, floor: int, direction: str) -> float:
+        if self.dirty[elevator_id]:
+            self._recompute(elevator_id)
+        return self.eta[elevator_id, floor, UP if direction == 'up' else DOWN]
+
+    def row(self, elevator_id: int) -> np.ndarray:
+        '''电梯 elevator_id 的整行 ETA，形状 (楼层数, 2)'''
+        if self.dirty[elevator_id]:
+            self._recompute(elevator_id)
+        return self.eta[elevator_id]
+
+    def column(self, floor: int, direction: str) -> np.ndarray:
+        '''所有电梯到达 floor 层（按 direction 方向接客）的 ETA，形状 (电梯数,)'''
+        for elevator_id in np.flatnonzero(self.dirty).tolist():
+            self._recompute(elevator_id)
+        return self.eta[:, floor, UP if direction == 'up' else DOWN]
+
+    def has_stop(self, elevator_id: int, floor: int) -> bool:
+        return self.stops[elevator_id, floor] > 0
+
+    # ---------------- 更新 ----------------
+    def move(self, elevator_id: int, position: float, direction: int):
+        '''电梯的新位置和方向（1 上 / -1 下 / 0 停）'''
+        old = self.position[elevator_id]
+        if position == old and direction == self.direction[elevator_id]:
+            return
+        self.position[elevator_id] = position
+        if self.dirty[elevator_id] or direction != self.direction[elevator_id] or direction == 0:
+            self.direction[elevator_id] = direction
+            self.dirty[elevator_id] = True
+            return
+        # 同方向前进：没有越过（或离开）楼层、并且前方还有停靠点时，整行统一减去行驶的距离
+        floors = np.flatnonzero(self.stops[elevator_id])
+        if direction > 0:
+            crossed = old == math.floor(old) or math.floor(old) != math.floor(position)
+            ahead = len(floors) and floors[-1] > position > old
+        else:
+            crossed = old == math.ceil(old) or math.ceil(old) != math.ceil(position)
+            ahead = len(floors) and floors[0] < position < old
+        if crossed or not ahead:
+            self.dirty[elevator_id] = True
+            return
+        step = abs(position - old)
+        self.dist[elevator_id] -= step
+        self.eta[elevator_id] -= step * TICKS_PER_FLOOR
+
+    def add_stop(self, elevator_id: int, floor: int):
+        self.stops[elevator_id, floor] += 1
+        if self.stops[elevator_id, floor] == 1:
+            self._stop_changed(elevator_id, floor, 1)
+
+    def remove_stop(self, elevator_id: int, floor: int):
+        if self.stops[elevator_id, floor] <= 0:
+            return
+        self.stops[elevator_id, floor] -= 1
+        if self.stops[elevator_id, floor] == 0:
+            self._stop_changed(elevator_id, floor, -1)
+
+    def _stop_changed(self, elevator_id: int, floor: int, sign: int):
+        '''停靠点严格位于路线两端之间时，路线不变，只有排在它之后的表项多（少）停一次'''
+        if self.dirty[elevator_id] or self.direction[elevator_id] == 0:
+            self.dirty[elevator_id] = True
+            return
+        others = np.flatnonzero(self.stops[elevator_id])
+        others = others[others != floor]
+        position = self.position[elevator_id]
+        if not len(others) or not (min(others[0], position) < floor < max(others[-1], position)):
+            self.dirty[elevator_id] = True
+            return
+        reached = self._stop_distance(elevator_id, floor)
+        row = self.eta[elevator_id]
+        row[self.dist[elevator_id] > reached + EPS] += sign * TICKS_PER_STOP
+
+    def _stop_distance(self, elevator_id: int, floor: int) -> float:
+        '''停靠点第一次被经过时在路线上的距离'''
+        position = self.position[elevator_id]
+        if self.direction[elevator_id] > 0:
+            if floor >= position:
+                return floor - position
+            top = max(np.flatnonzero(self.stops[elevator_id])[-1], position)
+            return (top - position) + (top - floor)
+        if floor <= position:
+            return position - floor
+        bottom = min(np.flatnonzero(self.stops[elevator_id])[0], position)
+        return (position - bottom) + (floor - bottom)
+
+    # ---------------- 整行重算 ----------------
+    def _recompute(self, elevator_id: int):
+        self.recomputed += 1
+        position = self.position[elevator_id]
+        direction = self.direction[elevator_id]
+        stops = np.flatnonzero(self.stops[elevator_id]).astype(float)
+        if direction == 0:
+            d = np.abs(self.floors - position)
+            same = opposite = d
+            reached = np.abs(stops - position)
+        else:
+            # 沿行驶方向的坐标：上行时就是楼层，下行时取相反数，两种情况用同一套公式
+            x = self.floors * direction
+            p = position * direction
+            s = stops * direction
+            far = max(s.max(), p) if len(s) else p
+            near = min(s.min(), p) if len(s) else p
+            turn = np.maximum(far, x)
+            # 与电梯同向的呼叫：在前方直接到达，在后方要先走到最远点、再到另一端、再掉头
+            back = np.minimum(near, x)
+            same = np.where(x >= p, x - p, (far - p) + (far - back) + (x - back))
+            # 反向的呼叫：先走到最远点（或这一层本身更远）再掉头回来
+            opposite = (turn - p) + (turn - x)
+            reached = np.where(s >= p, s - p, (far - p) + (far - s))
+        reached.sort()
+        dist = self.dist[elevator_id]
+        if direction >= 0:
+            dist[:, UP], dist[:, DOWN] = same, opposite
+        else:
+            dist[:, DOWN], dist[:, UP] = same, opposite
+        # 路线上排在这一项之前经过的停靠点个数
+        halts = np.searchsorted(reached, dist - EPS, side='left')
+        self.eta[elevator_id] = dist * TICKS_PER_FLOOR + halts * TICKS_PER_STOP
+        self.dirty[elevator_id] = False
@@ -0,0 +1,144 @@
+'''
+群控派梯：把每个楼层呼叫 (楼层, 方向) 分配给恰好一台电梯。
+代价是估计的接客时间：直接查 eta_table.EtaTable（沿 LOOK 路线的行驶时间 + 途中已承诺停靠点的停靠时间），
+再加上多停一站给车内乘客带来的延误。满载的电梯在卸客之前接不了新乘客。
+新呼叫到来时贪心地分配给代价最小的电梯；每个 tick 按呼叫等待时间从长到短重新分配一次，
+重新分配有时间预算，超时后剩下的呼叫保持原来的分配。
+'''
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+import numpy as np
+
+from eta_table import TICKS_PER_FLOOR, TICKS_PER_STOP, EtaTable
+
+# 车内每位乘客因多停一站而延误的时间，按这个权重计入代价
+RIDER_DELAY_WEIGHT = 0.5
+# 满载电梯的额外代价
+FULL_PENALTY = 1000
+# 重新分配时新电梯至少要快这么多 tick 才改派，避免呼叫在代价相近的电梯之间来回跳
+REASSIGN_MARGIN = TICKS_PER_FLOOR
+
+Call = Tuple[int, str]
+
+
+class CarState(NamedTuple):
+    '''一个 tick 内电梯的状态：浮点楼层位置，运动方向（1 上 / -1 下 / 0 停），载客数，容量'''
+    position: float
+    direction: int
+    load: int
+    capacity: int
+
+
+class HallCallAssigner:
+    '''
+    每台电梯的停靠点（车内目的层和分配给它的呼叫楼层）记在 ETA 表里，
+    估算代价只是一次 ETA 查表，O(1)
+    '''
+    def __init__(self, num_elevators: int, num_floors: int, budget: float = 0.005):
+        self.budget = budget
+        self.eta = EtaTable(num_elevators, num_floors)
+        self.owner: Dict[Call, Optional[int]] = {}
+        self.since: Dict[Call, int] = {}
+        self.assigned: List[Set[Call]] = [set() for _ in range(num_elevators)]
+        self.reassigned = 0
+
+    def update_cars(self, cars: List[CarState]):
+        '''把电梯的最新位置和方向同步到 ETA 表，并准备好按载客量计算的代价项'''
+        for elevator_id, car in enumerate(cars):
+            self.eta.move(elevator_id, car.position, car.direction)
+        load = np.array([car.load for car in cars], dtype=float)
+        self._delay = load * TICKS_PER_STOP * RIDER_DELAY_WEIGHT
+        self._full = np.array([car.load >= car.capacity for car in cars]) * FULL_PENALTY
+
+    def add_car_stop(self, elevator_id: int, floor: int):
+        '''乘客上车，登记车内目的层'''
+        self.eta.add_stop(elevator_id, floor)
+
+    def remove_car_stop(self, elevator_id: int, floor: int):
+        '''乘客下车'''
+        self.eta.remove_stop(elevator_id, floor)
+
+    # ---------------- 呼叫 ----------------
+    def add_call(self, call: Call, tick: int):
+        '''登记一个新呼叫（同一楼层同一方向只登记一次），暂不分配'''
+        if call not in self.owner:
+            self.owner[call] = None
+            self.since[call] = tick
+
+    def remove_call(self, call: Call):
+        '''呼叫已被服务（这一层这个方向没人在等了）'''
+        self._unassign(call)
+        self.owner.pop(call, None)
+        self.since.pop(call, None)
+
+    def _unassign(self, call: Call):
+        elevator_id = self.owner.get(call)
+        if elevator_id is not None:
+            self.assigned[elevator_id].discard(call)
+            self.eta.remove_stop(elevator_id, call[0])
+            self.owner[call] = None
+
+    def _set_owner(self, call: Call, elevator_id: int):
+        self.owner[call] = elevator_id
+        self.assigned[elevator_id].add(call)
+        self.eta.add_stop(elevator_id, call[0])
+
+    def owner_of(self, call: Call) -> Optional[int]:
+        return self.owner.get(call)
+
+    # ---------------- 代价 ----------------
+    def cost(self, elevator_id: int, car: CarState, call: Call) -> float:
+        '''电梯 elevator_id 到达呼叫楼层并按呼叫方向接客的估计时间，加上车内乘客的延误和满载惩罚'''
+        floor, direction = call
+        cost = self.eta.lookup(elevator_id, floor, direction)
+        if not self.eta.has_stop(elevator_id, floor):
+            cost += car.load * TICKS_PER_STOP * RIDER_DELAY_WEIGHT
+        if car.load >= car.capacity:
+            cost += FULL_PENALTY
+        return cost
+
+    def _best(self, cars: List[CarState], call: Call) -> int:
+        '''一次取出所有电梯的 ETA 列，向量化地加上延误和满载惩罚后取最小值'''
+        floor, direction = call
+        costs = self.eta.column(floor, direction) + (self.eta.stops[:, floor] == 0) * self._delay + self._full
+        return int(np.argmin(costs))
+
+    # ---------------- 分配 ----------------
+    def assign(self, call: Call, cars: List[CarState]) -> int:
+        '''把呼叫分配给代价最小的电梯，返回电梯 id'''
+        self.update_cars(cars)
+        self._unassign(call)
+        best = self._best(cars, call)
+        self._set_owner(call, best)
+        return best
+
+    def assign_to(self, call: Call, elevator_id: int):
+        '''把呼叫直接改派给指定电梯'''
+        self._unassign(call)
+        self._set_owner(call, elevator_id)
+
+    def rebalance(self, cars: List[CarState]) -> List[int]:
+        '''
+        按等待时间从长到短，逐个把呼叫从原电梯上摘下、重新分配给当前代价最小的电梯。
+        超出时间预算后停止，剩下的呼叫保持原来的分配。返回分配发生变化的电梯 id
+        '''
+        deadline = time.perf_counter() + self.budget
+        self.update_cars(cars)
+        changed = set()
+        for call in sorted(self.owner, key=self.since.__getitem__):
+            if time.perf_counter() > deadline:
+                break
+            old = self.owner[call]
+            self._unassign(call)
+            new = self._best(cars, call)
+            if old is not None and new != old and \
+                    self.cost(new, cars[new], call) + REASSIGN_MARGIN > self.cost(old, cars[old], call):
+                new = old
+            self._set_owner(call, new)
+            if new != old:
+                self.reassigned += 1
+                changed.add(new)
+                if old is not None:
+                    changed.add(old)
+        return sorted(changed)
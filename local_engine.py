@@ -0,0 +1,352 @@
+'''
+本地仿真引擎
+在进程内实现与模拟器服务器相同的 tick / 事件语义，并提供与 ElevatorAPIClient 相同的接口
+(get_state / step / go_to_floor / reset / next_traffic_round / get_traffic_info / mark_tick_processed)。
+控制器把它当作 api_client 使用即可，ProxyElevator / ProxyFloor / ProxyPassenger 无需任何改动，
+整个仿真不再经过 127.0.0.1:8000 上的 HTTP 往返。
+'''
+import glob
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+from elevator_saga.core.models import (
+    Direction,
+    ElevatorState,
+    ElevatorStatus,
+    EventType,
+    PassengerInfo,
+    PassengerStatus,
+    PerformanceMetrics,
+    SimulationEvent,
+    SimulationState,
+    StepResponse,
+    TrafficEntry,
+    create_empty_simulation_state,
+)
+
+
+def default_traffic_dir() -> str:
+    '''模拟器自带的流量文件目录（与服务器默认使用的目录相同）'''
+    import elevator_saga
+    return os.path.join(os.path.dirname(elevator_saga.__file__), 'traffic')
+
+
+def load_traffic_dir(traffic_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    '''按文件名顺序读取目录下所有流量文件，每个文件是一轮 {"building": {...}, "traffic": [...]}'''
+    traffic_dir = traffic_dir or default_traffic_dir()
+    rounds = []
+    for path in sorted(glob.glob(os.path.join(traffic_dir, '*.json'))):
+        with open(path, 'r', encoding='utf-8') as f:
+            rounds.append(json.load(f))
+    return rounds
+
+
+class LocalEngine:
+    '''
+    进程内的电梯仿真引擎，同时充当控制器的 api_client。
+    rounds 中的每一项与流量文件格式相同，依次作为一轮流量运行。
+    '''
+    def __init__(self, rounds: List[Dict[str, Any]]):
+        if not rounds:
+            raise ValueError('LocalEngine requires at least one traffic round')
+        self.base_url = 'local'
+        self.client_type = 'algorithm'
+        self.rounds = rounds
+        self.current_traffic_index = 0
+        self.max_duration_ticks = 0
+        self.state: SimulationState = create_empty_simulation_state(1, 1, 1)
+        self.traffic_queue: List[TrafficEntry] = []
+        self.traffic_pos = 0
+        self.tick_events: List[SimulationEvent] = []
+        self.load_current_traffic()
+
+    @classmethod
+    def from_dir(cls, traffic_dir: Optional[str] = None) -> 'LocalEngine':
+        return cls(load_traffic_dir(traffic_dir))
+
+    # ---------------- 流量管理 ----------------
+    def load_current_traffic(self) -> None:
+        '''根据当前轮次重建建筑与乘客队列'''
+        file_data = self.rounds[self.current_traffic_index]
+        building = file_data['building']
+        self.state = create_empty_simulation_state(
+            building['elevators'], building['floors'], building['elevator_capacity']
+        )
+        energy_rates = building.get('elevator_energy_rates', [1.0] * building['elevators'])
+        for i, elevator in enumerate(self.state.elevators):
+            if i < len(energy_rates):
+                elevator.energy_rate = energy_rates[i]
+        self.max_duration_ticks = building['duration']
+        # 每台电梯累计运行的楼层数，用于统计运行距离
+        self.travel_distance = [0.0] * building['elevators']
+
+        # 与服务器一致：按到达 tick 排序后从 1 开始编号
+        self.traffic_queue = []
+        for i, entry in enumerate(sorted(file_data['traffic'], key=lambda t: t['tick']), 1):
+            self.traffic_queue.append(
+                TrafficEntry(id=i, origin=entry['origin'], destination=entry['destination'], tick=entry['tick'])
+            )
+        self.traffic_pos = 0
+        self.tick_events = []
+
+    def next_traffic_round(self, full_reset: bool = False) -> bool:
+        '''切换到下一轮流量，没有更多流量时返回 False（full_reset 时从第一轮重新开始）'''
+        next_index = self.current_traffic_index + 1
+        if next_index >= len(self.rounds):
+            if not full_reset:
+                return False
+            next_index = 0
+        self.current_traffic_index = next_index
+        self.load_current_traffic()
+        return True
+
+    def reset(self) -> bool:
+        '''重新开始当前这一轮流量'''
+        self.load_current_traffic()
+        return True
+
+    def get_traffic_info(self) -> Dict[str, Any]:
+        return {
+            'current_index': self.current_traffic_index,
+            'total_files': len(self.rounds),
+            'max_tick': self.max_duration_ticks,
+        }
+
+    # ---------------- ElevatorAPIClient 接口 ----------------
+    def get_state(self, force_reload: bool = False) -> SimulationState:
+        '''直接返回内存中的状态；指标只在一轮结束时计算，避免每个 tick 遍历所有乘客'''
+        if self.state.tick >= self.max_duration_ticks:
+            self.state.metrics = self.calculate_metrics()
+        return self.state
+
+    def mark_tick_processed(self) -> None:
+        '''本地状态始终是最新的，无需缓存失效'''
+        pass
+
+    def step(self, ticks: int = 1) -> StepResponse:
+        events: List[SimulationEvent] = []
+        for _ in range(ticks):
+            self.state.tick += 1
+            events.extend(self._process_tick())
+            if self.state.tick >= self.max_duration_ticks:
+                self.force_complete_remaining_passengers()
+        return StepResponse(success=True, tick=self.state.tick, events=events, timestamp='')
+
+    def go_to_floor(self, elevator_id: int, floor: int, immediate: bool = False) -> bool:
+        if 0 <= elevator_id < len(self.state.elevators) and 0 <= floor < len(self.state.floors):
+            elevator = self.state.elevators[elevator_id]
+            if immediate:
+                self._set_elevator_target_floor(elevator, floor)
+            else:
+                elevator.next_target_floor = floor
+        return True
+
+    # ---------------- tick 处理，与服务器语义保持一致 ----------------
+    def _emit_event(self, event_type: EventType, data: Dict[str, Any]) -> None:
+        # timestamp 传空串，跳过 SimulationEvent 里每个事件一次的 datetime.now()
+        self.tick_events.append(SimulationEvent(tick=self.state.tick, type=event_type, data=data, timestamp=''))
+
+    def _process_tick(self) -> List[SimulationEvent]:
+        '''每个 tick 先更新电梯状态，再生成乘客，然后移动电梯，最后处理停靠与上下客'''
+        self.tick_events = []
+        self._update_elevator_status()
+        self._process_arrivals()
+        self._move_elevators()
+        self._process_elevator_stops()
+        return self.tick_events
+
+    def _process_passenger_in(self, elevator: ElevatorState) -> None:
+        current_floor = elevator.current_floor
+        floor = self.state.floors[current_floor]
+        passengers_to_board: List[int] = []
+        available_capacity = elevator.max_capacity - len(elevator.passengers)
+        if elevator.target_floor_direction == Direction.UP:
+            passengers_to_board.extend(floor.up_queue[:available_capacity])
+            floor.up_queue = floor.up_queue[available_capacity:]
+        if elevator.target_floor_direction == Direction.DOWN:
+            passengers_to_board.extend(floor.down_queue[:available_capacity])
+            floor.down_queue = floor.down_queue[available_capacity:]
+
+        for passenger_id in passengers_to_board:
+            passenger = self.state.passengers[passenger_id]
+            passenger.pickup_tick = self.state.tick
+            passenger.elevator_id = elevator.id
+            elevator.passengers.append(passenger_id)
+            self._emit_event(
+                EventType.PASSENGER_BOARD,
+                {'elevator': elevator.id, 'floor': current_floor, 'passenger': passenger_id},
+            )
+
+    def _update_elevator_status(self) -> None:
+        for elevator in self.state.elevators:
+            if elevator.target_floor_direction == Direction.STOPPED:
+                if elevator.next_target_floor is not None:
+                    self._set_elevator_target_floor(elevator, elevator.next_target_floor)
+                    self._process_passenger_in(elevator)
+                    elevator.next_target_floor = None
+                else:
+                    continue
+            if elevator.run_status == ElevatorStatus.STOPPED:
+                elevator.run_status = ElevatorStatus.START_UP
+            elif elevator.run_status == ElevatorStatus.START_UP:
+                elevator.run_status = ElevatorStatus.CONSTANT_SPEED
+
+    def _process_arrivals(self) -> None:
+        queue = self.traffic_queue
+        while self.traffic_pos < len(queue) and queue[self.traffic_pos].tick <= self.state.tick:
+            entry = queue[self.traffic_pos]
+            self.traffic_pos += 1
+            passenger = PassengerInfo(
+                id=entry.id, origin=entry.origin, destination=entry.destination, arrive_tick=self.state.tick
+            )
+            self.state.passengers[passenger.id] = passenger
+            if passenger.destination > passenger.origin:
+                self.state.floors[passenger.origin].up_queue.append(passenger.id)
+                self._emit_event(EventType.UP_BUTTON_PRESSED, {'floor': passenger.origin, 'passenger': passenger.id})
+            else:
+                self.state.floors[passenger.origin].down_queue.append(passenger.id)
+                self._emit_event(EventType.DOWN_BUTTON_PRESSED, {'floor': passenger.origin, 'passenger': passenger.id})
+
+    def _move_elevators(self) -> None:
+        for elevator in self.state.elevators:
+            target_floor = elevator.target_floor
+            new_floor = old_floor = elevator.position.current_floor
+            if elevator.run_status in (ElevatorStatus.START_UP, ElevatorStatus.START_DOWN):
+                movement_speed = 1
+            elif elevator.run_status == ElevatorStatus.CONSTANT_SPEED:
+                movement_speed = 2
+            else:
+                continue
+
+            direction = elevator.target_floor_direction
+            elevator.last_tick_direction = direction
+            if direction != Direction.STOPPED:
+                self.travel_distance[elevator.id] += movement_speed / 10
+            old_position = elevator.position.current_floor_float
+            if direction == Direction.UP:
+                new_floor = elevator.position.floor_up_position_add(movement_speed)
+                elevator.energy_consumed += elevator.energy_rate
+            elif direction == Direction.DOWN:
+                new_floor = elevator.position.floor_up_position_add(-movement_speed)
+                elevator.energy_consumed += elevator.energy_rate
+
+            # 与服务器一致，按移动后的方向判断：到站的这个 tick 方向已经是 STOPPED，不发移动事件
+            if elevator.target_floor_direction != Direction.STOPPED:
+                self._emit_event(
+                    EventType.ELEVATOR_MOVE,
+                    {
+                        'elevator': elevator.id,
+                        'from_position': old_position,
+                        'to_position': elevator.position.current_floor_float,
+                        'direction': elevator.target_floor_direction.value,
+                        'status': elevator.run_status.value,
+                    },
+                )
+
+            # 匀速运动中，判断是否需要减速 / 是否即将经过某层
+            if elevator.run_status == ElevatorStatus.CONSTANT_SPEED:
+                if self._distance_to_target(elevator) == 1:
+                    elevator.run_status = ElevatorStatus.START_DOWN
+                if self._distance_to_near_stop(elevator) == 1:
+                    self._emit_event(
+                        EventType.ELEVATOR_APPROACHING,
+                        {
+                            'elevator': elevator.id,
+                            'floor': int(round(elevator.position.current_floor_float)),
+                            'direction': elevator.target_floor_direction.value,
+                        },
+                    )
+
+            if old_floor != new_floor and new_floor != target_floor:
+                self._emit_event(
+                    EventType.PASSING_FLOOR,
+                    {'elevator': elevator.id, 'floor': new_floor, 'direction': elevator.target_floor_direction.value},
+                )
+
+            if target_floor == new_floor and elevator.position.floor_up_position == 0:
+                elevator.run_status = ElevatorStatus.STOPPED
+                self._emit_event(
+                    EventType.STOPPED_AT_FLOOR, {'elevator': elevator.id, 'floor': new_floor, 'reason': 'move_reached'}
+                )
+
+    def _process_elevator_stops(self) -> None:
+        for elevator in self.state.elevators:
+            current_floor = elevator.current_floor
+            if elevator.last_tick_direction == Direction.STOPPED:
+                self._emit_event(EventType.IDLE, {'elevator': elevator.id, 'floor': current_floor})
+                continue
+            if elevator.run_status != ElevatorStatus.STOPPED:
+                continue
+
+            alighted = [p for p in elevator.passengers if self.state.passengers[p].destination == current_floor]
+            for passenger_id in alighted:
+                passenger = self.state.passengers[passenger_id]
+                passenger.dropoff_tick = self.state.tick
+                passenger.arrived = True
+                elevator.passengers.remove(passenger_id)
+                self._emit_event(
+                    EventType.PASSENGER_ALIGHT,
+                    {'elevator': elevator.id, 'floor': current_floor, 'passenger': passenger_id},
+                )
+            if elevator.next_target_floor is not None:
+                self._set_elevator_target_floor(elevator, elevator.next_target_floor)
+                elevator.next_target_floor = None
+
+    def _set_elevator_target_floor(self, elevator: ElevatorState, floor: int) -> None:
+        elevator.position.target_floor = floor
+        if self._distance_to_target(elevator) == 1:
+            if elevator.run_status == ElevatorStatus.CONSTANT_SPEED:
+                elevator.run_status = ElevatorStatus.START_DOWN
+        elif elevator.run_status == ElevatorStatus.START_DOWN:
+            elevator.run_status = ElevatorStatus.CONSTANT_SPEED
+
+    def _distance_to_target(self, elevator: ElevatorState) -> int:
+        '''到目标楼层的距离（以 floor_up_position 为单位，一层为 10）'''
+        position = elevator.position
+        return abs(position.target_floor * 10 - (position.current_floor * 10 + position.floor_up_position))
+
+    def _distance_to_near_stop(self, elevator: ElevatorState) -> int:
+        '''到最近楼层的距离'''
+        up_position = elevator.position.floor_up_position
+        if up_position < 0:
+            return 10 + up_position
+        elif up_position > 0:
+            return 10 - up_position
+        return 0
+
+    # ---------------- 指标 ----------------
+    def force_complete_remaining_passengers(self) -> None:
+        '''到达最大时长时，把未完成乘客的上/下车时间记为当前 tick（与服务器一致）'''
+        for passenger in self.state.passengers.values():
+            if passenger.dropoff_tick == 0:
+                passenger.dropoff_tick = self.state.tick
+            if passenger.pickup_tick == 0:
+                passenger.pickup_tick = self.state.tick
+
+    def calculate_metrics(self) -> PerformanceMetrics:
+        passengers = list(self.state.passengers.values())
+        completed = [p for p in passengers if p.status == PassengerStatus.COMPLETED]
+        total_energy = sum(e.energy_consumed for e in self.state.elevators)
+        if not completed:
+            return PerformanceMetrics(total_passengers=len(passengers), total_energy_consumption=total_energy)
+
+        floor_wait_times = [float(p.floor_wait_time) for p in passengers]
+        arrival_wait_times = [float(p.arrival_wait_time) for p in passengers]
+
+        def average_excluding_top_percent(data: List[float], exclude_percent: int) -> float:
+            keep_count = int(len(data) * (100 - exclude_percent) / 100)
+            if keep_count == 0:
+                return 0.0
+            kept = sorted(data)[:keep_count]
+            return sum(kept) / len(kept)
+
+        return PerformanceMetrics(
+            completed_passengers=len(completed),
+            total_passengers=len(passengers),
+            average_floor_wait_time=sum(floor_wait_times) / len(floor_wait_times),
+            p95_floor_wait_time=average_excluding_top_percent(floor_wait_times, 5),
+            average_arrival_wait_time=sum(arrival_wait_times) / len(arrival_wait_times),
+            p95_arrival_wait_time=average_excluding_top_percent(arrival_wait_times, 5),
+            total_energy_consumption=total_energy,
+        )
@@ -1,6 +1,10 @@
 from algorithm import Start_Algorithm
 from GUI import GUI
 from multiprocessing import Process, Event, Queue
+from utils import SNAPSHOT_BUFFER
+from shared_state import SharedWorldState
+import argparse
+import os
 
 
 # Add: 确保标准输出和错误输出都使用 UTF-8 编码，以便终端输出内容保存到 result.txt 文件中进行后续分析
@@ -10,13 +14,53 @@ from multiprocessing import Process, Event, Queue
 # sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--local', action='store_true', help='使用进程内的本地仿真引擎，不连接 127.0.0.1:8000')
+    parser.add_argument('--traffic-dir', default=None, help='本地引擎使用的流量文件目录，默认为模拟器自带目录')
+    parser.add_argument('--trace', default=None, help='把运行过程记录到该二进制 trace 文件')
+    parser.add_argument('--trace-compress', action='store_true', help='trace 文件按块 zlib 压缩')
+    parser.add_argument('--log-level', default='warning', choices=['debug', 'info', 'warning', 'error', 'off'],
+                        help='日志级别：debug 记录每个 tick 的事件和电梯状态，info 记录呼叫/上下客/停靠')
+    parser.add_argument('--log-file', default=None, help='JSON lines 日志文件，默认写到标准输出')
+    parser.add_argument('--metrics-file', default=None, help='开启埋点，定期把指标快照写入该 JSON 文件')
+    parser.add_argument('--metrics-port', type=int, default=None, help='开启埋点，在 127.0.0.1 的该端口提供 Prometheus 格式的 /metrics')
+    parser.add_argument('--dispatch', default='group', choices=['bus', 'look', 'group'], help='调度策略，默认群控派梯')
+    parser.add_argument('--parking', default='demand', choices=['demand', 'idle_floor'], help='空闲电梯停靠策略')
+    parser.add_argument('--rollout', type=int, default=0, help='前向仿真决策的仿真 tick 数，0 关闭（见 rollout.py）')
+    parser.add_argument('--decoupled', action='store_true', help='调度算法不等待GUI，GUI只渲染最新的快照')
+    parser.add_argument('--shared-memory', action='store_true', help='解耦模式下通过共享内存表传递状态（隐含 --decoupled）')
+    args = parser.parse_args()
+
     #定义两个线程之间的同步变量
     start_event = Event()
     finish_event = Event()
-    message_queue = Queue()
+    #解耦模式下使用有界队列，GUI 跟不上时由调度算法丢弃旧快照
+    message_queue = Queue(maxsize=SNAPSHOT_BUFFER) if args.decoupled else Queue()
+    #共享内存表由主进程创建，两个子进程按名字连接，结束后由主进程删除
+    shared_state = SharedWorldState(create=True) if args.shared_memory else None
+    shared_name = shared_state.name if shared_state else None
 
-    algorithm = Process(target=Start_Algorithm, args=(start_event, finish_event, message_queue))
-    gui = Process(target=GUI,args=(start_event, finish_event, message_queue))
+    algorithm = Process(target=Start_Algorithm, kwargs=dict(
+        start_event=start_event, finish_event=finish_event, message_queue=message_queue,
+        local=args.local, traffic_dir=args.traffic_dir, decoupled=args.decoupled, shared_state=shared_name,
+        trace=args.trace, trace_compress=args.trace_compress, log_level=args.log_level, log_file=args.log_file,
+        metrics_file=args.metrics_file, metrics_port=args.metrics_port,
+        dispatch=args.dispatch, parking=args.parking, rollout=args.rollout))
+    #GUI 进程的日志写到单独的文件（run.jsonl -> run.gui.jsonl）
+    gui_log = None
+    if args.log_file is not None:
+        root, ext = os.path.splitext(args.log_file)
+        gui_log = root + '.gui' + ext
+    #GUI 进程的指标同样写到单独的文件，端口为 --metrics-port + 1
+    gui_metrics = None
+    if args.metrics_file is not None:
+        root, ext = os.path.splitext(args.metrics_file)
+        gui_metrics = root + '.gui' + ext
+    gui_port = args.metrics_port + 1 if args.metrics_port is not None else None
+    gui = Process(target=GUI, kwargs=dict(
+        start_event=start_event, finish_event=finish_event, message_queue=message_queue,
+        decoupled=args.decoupled, shared_state=shared_name,
+        log_level=args.log_level, log_file=gui_log, metrics_file=gui_metrics, metrics_port=gui_port))
 
     algorithm.start()
     gui.start() 
@@ -24,4 +68,7 @@ if __name__ == "__main__":
 
     algorithm.join()
     gui.terminate()
-    gui.join()
\ No newline at end of file
+    gui.join()
+    if shared_state is not None:
+        shared_state.close()
+        shared_state.unlink()
\ No newline at end of file
@@ -1,6 +1,6 @@
 from algorithm import Start_Algorithm
-from GUI import GUI
 from multiprocessing import Process, Event, Queue
+import argparse
 
 
 # Add: 确保标准输出和错误输出都使用 UTF-8 编码，以便终端输出内容保存到 result.txt 文件中进行后续分析
@@ -10,9 +10,40 @@ from multiprocessing import Process, Event, Queue
 # sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding='utf-8')
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--local', action='store_true', help='使用进程内的本地仿真引擎，不连接 127.0.0.1:8000')
+    parser.add_argument('--traffic-dir', default=None, help='本地引擎使用的流量文件目录，默认为模拟器自带目录')
+    parser.add_argument('--trace', default=None, help='把运行过程记录到该二进制 trace 文件')
+    parser.add_argument('--trace-compress', action='store_true', help='trace 文件按块 zlib 压缩')
+    parser.add_argument('--log-level', default='warning', choices=['debug', 'info', 'warning', 'error', 'off'],
+                        help='日志级别：debug 记录每个 tick 的事件和电梯状态，info 记录呼叫/上下客/停靠')
+    parser.add_argument('--log-file', default=None, help='JSON lines 日志文件，默认写到标准输出')
+    parser.add_argument('--metrics-file', default=None, help='开启埋点，定期把指标快照写入该 JSON 文件')
+    parser.add_argument('--metrics-port', type=int, default=None, help='开启埋点，在 127.0.0.1 的该端口提供 Prometheus 格式的 /metrics')
+    parser.add_argument('--profile', nargs='?', const='profile.folded', default=None,
+                        help='性能剖析：每轮流量结束时写出 collapsed-stack 文件（默认 profile.folded）和前 N 项汇总')
+    parser.add_argument('--profile-sample', type=float, default=0.0, help='剖析时另外按该间隔（毫秒）采样调用栈，0 不采样')
+    parser.add_argument('--dispatch', default='group', choices=['bus', 'look', 'group'], help='调度策略，默认群控派梯')
+    parser.add_argument('--parking', default='demand', choices=['demand', 'idle_floor'], help='空闲电梯停靠策略')
+    parser.add_argument('--rollout', type=int, default=0, help='前向仿真决策的仿真 tick 数，0 关闭（见 rollout.py）')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='asyncio 模式：指令、步进和取状态在一条连接上管线化发送，多个会话共用一个事件循环（见 async_controller.py）')
+    parser.add_argument('--servers', nargs='+', default=None, help='asyncio 模式下每个模拟器服务器一个会话，默认 http://127.0.0.1:8000')
+    parser.add_argument('--sessions', type=int, default=1, help='asyncio 模式加 --local 时运行的本地会话数')
+    args = parser.parse_args()
+
     #定义两个线程之间的同步变量
 
-    algorithm = Process(target=Start_Algorithm, args=(None, None, None))
+    #两种模式共用的参数，按名字传给入口函数
+    common = dict(local=args.local, traffic_dir=args.traffic_dir, trace=args.trace, trace_compress=args.trace_compress,
+                  log_level=args.log_level, log_file=args.log_file, metrics_file=args.metrics_file, metrics_port=args.metrics_port,
+                  profile=args.profile, profile_sample=args.profile_sample / 1000,
+                  dispatch=args.dispatch, parking=args.parking, rollout=args.rollout)
+    if args.use_async:
+        from async_controller import Start_Async
+        algorithm = Process(target=Start_Async, kwargs=dict(common, servers=args.servers, sessions=args.sessions))
+    else:
+        algorithm = Process(target=Start_Algorithm, kwargs=dict(common, start_event=None, finish_event=None, message_queue=None))
 
     algorithm.start()
 
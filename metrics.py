@@ -0,0 +1,206 @@
+'''
+热路径埋点与指标导出
+- Histogram：固定对数分桶的延迟直方图，observe 只是一次二分查找和几次加法；
+- Metrics：按 (指标名, 标签) 保存直方图、计数器和仪表值，timed() 给回调函数套上计时；
+- 导出：定期把快照写成 JSON 文件（先写临时文件再改名，读取方不会读到半个文件），
+  以及在本地端口上提供 Prometheus 文本格式的 /metrics。导出在 tick 末尾或后台线程里进行，不在回调内。
+'''
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# 直方图桶的上界（秒），最后还有一个 +Inf 桶
+BUCKETS = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3,
+           0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Key = Tuple[str, Tuple[Tuple[str, str], ...]]
+
+
+class Histogram:
+    __slots__ = ('counts', 'count', 'sum', 'max')
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q: float) -> float:
+        '''按桶估计分位数（返回所在桶的上界，落在 +Inf 桶时返回最大值）'''
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            seen += n
+            if seen >= rank and n:
+                return BUCKETS[i] if i < len(BUCKETS) else self.max
+        return self.max
+
+    def summary(self) -> dict:
+        return {
+            'count': self.count, 'sum': self.sum, 'max': self.max,
+            'mean': self.sum / self.count if self.count else 0.0,
+            'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+        }
+
+
+def _key(name: str, labels: dict) -> Key:
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _label_text(labels, extra: str = '') -> str:
+    parts = [f'{k}="{v}"' for k, v in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class Metrics:
+    def __init__(self, prefix: str = 'elevator', snapshot_path: Optional[str] = None,
+                 snapshot_interval: float = 5.0, port: Optional[int] = None):
+        '''
+        snapshot_path：定期写入的 JSON 快照文件，snapshot_interval 为写入间隔（秒）；
+        port：不为 None 时在 127.0.0.1:port 上提供 Prometheus 文本格式的 /metrics
+        '''
+        self.prefix = prefix
+        self.histograms: Dict[Key, Histogram] = {}
+        self.counters: Dict[Key, float] = {}
+        self.gauges: Dict[Key, float] = {}
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self._next_snapshot = time.monotonic() + snapshot_interval
+        self._server = None
+        if port is not None:
+            self.serve(port)
+
+    # ---------------- 记录 ----------------
+    def histogram(self, name: str, **labels) -> Histogram:
+        '''取出（第一次时创建）一个直方图；热路径上应预先取出并保存直方图对象，直接调用 observe'''
+        key = _key(name, labels)
+        hist = self.histograms.get(key)
+        if hist is None:
+            hist = self.histograms[key] = Histogram()
+        return hist
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = _key(name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def set(self, name: str, value: float, **labels):
+        self.gauges[_key(name, labels)] = value
+
+    def timed(self, name: str, func: Callable, **labels) -> Callable:
+        '''返回套上计时的 func，每次调用的耗时记入直方图 name'''
+        hist = self.histogram(name, **labels)
+        clock = time.perf_counter
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                hist.observe(clock() - start)
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    # ---------------- 导出 ----------------
+    def snapshot(self) -> dict:
+        def flat(key):
+            name, labels = key
+            return name + _label_text(labels)
+        return {
+            'time': time.time(),
+            'histograms': {flat(k): h.summary() for k, h in list(self.histograms.items())},
+            'counters': {flat(k): v for k, v in list(self.counters.items())},
+            'gauges': {flat(k): v for k, v in list(self.gauges.items())},
+        }
+
+    def prometheus(self) -> str:
+        '''Prometheus 文本格式 (text/plain; version=0.0.4)'''
+        lines = []
+        typed = set()
+
+        def declare(name, kind):
+            if name not in typed:
+                typed.add(name)
+                lines.append(f'# TYPE {name} {kind}')
+
+        for (name, labels), hist in sorted(list(self.histograms.items())):
+            full = f'{self.prefix}_{name}'
+            declare(full, 'histogram')
+            cumulative = 0
+            for bound, n in zip(BUCKETS + (float('inf'),), hist.counts):
+                cumulative += n
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                bucket = _label_text(labels, f'le="{le}"')
+                lines.append(f'{full}_bucket{bucket} {cumulative}')
+            lines.append(f'{full}_sum{_label_text(labels)} {hist.sum}')
+            lines.append(f'{full}_count{_label_text(labels)} {hist.count}')
+        for (name, labels), value in sorted(list(self.counters.items())):
+            full = f'{self.prefix}_{name}_total'
+            declare(full, 'counter')
+            lines.append(f'{full}{_label_text(labels)} {value}')
+        for (name, labels), value in sorted(list(self.gauges.items())):
+            full = f'{self.prefix}_{name}'
+            declare(full, 'gauge')
+            lines.append(f'{full}{_label_text(labels)} {value}')
+        lines.append('')
+        return '\n'.join(lines)
+
+    def write_snapshot(self, path: Optional[str] = None):
+        path = path or self.snapshot_path
+        if path is None:
+            return
+        tmp = f'{path}.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, ensure_ascii=False, indent=1)
+        os.replace(tmp, path)
+
+    def tick(self):
+        '''每个 tick（或每帧）末尾调用一次：到时间了就写一次快照'''
+        if self.snapshot_path is not None and time.monotonic() >= self._next_snapshot:
+            self._next_snapshot = time.monotonic() + self.snapshot_interval
+            self.write_snapshot()
+
+    def serve(self, port: int, host: str = '127.0.0.1'):
+        '''在后台线程中提供 GET /metrics'''
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, args=(0.1,), name='metrics-http', daemon=True).start()
+
+    def close(self):
+        '''写最后一次快照并关闭 HTTP 服务'''
+        self.write_snapshot()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
@@ -0,0 +1,285 @@
+'''
+GUI 使用的批量插值系统
+所有电梯和乘客精灵的锚点 (anchor)、起点 (src)、目标 (target) 都保存在 NumPy 数组中（世界坐标），
+每帧用一次数组运算推进所有精灵的插值，再只把屏幕内、真正移动过的精灵的 rect 写回。
+写回 rect 时按视图换算成屏幕坐标：屏幕 = (世界 - (x0, y0)) * zoom，默认视图下两者相同。
+锚点位于 image 的 bottom center 位置上。
+动画进度由 AnimationClock 按真实经过的时间和播放速度计算，与帧率无关
+'''
+import numpy as np
+
+
+def _round_half_away(values):
+    '''与 pygame.Rect 对浮点坐标的取整方式一致（四舍五入，0.5 远离 0）'''
+    return np.trunc(values + np.copysign(0.5, values)).astype(np.int64)
+
+
+class MotionTable:
+    '''
+    每个精灵占用一个槽位，精灵通过 motion_slot 记住自己的槽位。
+    槽位用完时容量翻倍，精灵移除后槽位放回空闲列表重复使用。
+    视野裁剪：精灵进入/离开屏幕（或被 set_hidden 隐藏/取消隐藏）时调用 on_enter / on_leave，
+    GUI 据此把精灵加入/移出绘制用的精灵组；屏幕外和隐藏的精灵只在数组里插值，不参与绘制
+    '''
+    def __init__(self, capacity = 64, screen_size = (800, 800)):
+        self.screen_width, self.screen_height = screen_size
+        #视图：屏幕 = (世界 - (x0, y0)) * zoom
+        self.x0 = 0.0
+        self.y0 = 0.0
+        self.zoom = 1.0
+        self.on_enter = None
+        self.on_leave = None
+        self.anchor = np.zeros((0, 2))
+        self.src = np.zeros((0, 2))
+        self.target = np.zeros((0, 2))
+        #image 的宽高和当前的屏幕位置
+        self.size = np.zeros((0, 2), dtype = np.int64)
+        self.rect = np.zeros((0, 2), dtype = np.int64)
+        self.active = np.zeros(0, dtype = bool)
+        #是否在屏幕内并且没有隐藏，以及精灵的类别（MovingSprite.motion_tag，GUI 按类别统计人数）
+        self.visible = np.zeros(0, dtype = bool)
+        self.hidden = np.zeros(0, dtype = bool)
+        self.tag = np.zeros(0, dtype = np.int64)
+        self.sprites = []
+        self.free = []
+        self._grow(capacity)
+
+    def _grow(self, capacity):
+        old = len(self.active)
+        for name in ('anchor', 'src', 'target', 'size', 'rect', 'active', 'visible', 'hidden', 'tag'):
+            array = getattr(self, name)
+            grown = np.zeros((capacity,) + array.shape[1:], dtype = array.dtype)
+            grown[:old] = array
+            setattr(self, name, grown)
+        self.sprites.extend([None] * (capacity - old))
+        #倒序放入，先分配小的槽位
+        self.free.extend(range(capacity - 1, old - 1, -1))
+
+    def add(self, sprite, x, y, tag = 0):
+        if not self.free:
+            self._grow(len(self.active) * 2)
+        slot = self.free.pop()
+        self.anchor[slot] = self.src[slot] = self.target[slot] = (x, y)
+        self.size[slot] = sprite.image.get_size()
+        self.active[slot] = True
+        self.visible[slot] = False
+        self.hidden[slot] = False
+        self.tag[slot] = tag
+        self.sprites[slot] = sprite
+        sprite.motion_slot = slot
+        self._place(np.array([slot]))
+        return slot
+
+    def remove(self, sprite):
+        slot = getattr(sprite, 'motion_slot', None)
+        if slot is None or self.sprites[slot] is not sprite:
+            return
+        self.active[slot] = False
+        self.visible[slot] = False
+        self.sprites[slot] = None
+        sprite.motion_slot = None
+        self.free.append(slot)
+
+    def set_view(self, x0, y0, zoom):
+        '''滚动或缩放之后重新计算所有精灵的屏幕位置和可见性'''
+        self.x0, self.y0, self.zoom = x0, y0, zoom
+        self._place(np.flatnonzero(self.active))
+
+    def set_hidden(self, slots, hidden):
+        '''隐藏的精灵即使在屏幕内也不显示（GUI 的 LOD），只有状态变化的精灵会重新摆放'''
+        changed = self.hidden[slots] != hidden
+        slots = slots[changed]
+        self.hidden[slots] = np.broadcast_to(hidden, changed.shape)[changed]
+        self._place(slots)
+
+    def resize(self, sprite):
+        '''精灵换了贴图（例如缩放级别变化）之后更新尺寸，随后的 set_view 会重新摆放'''
+        self.size[sprite.motion_slot] = sprite.image.get_size()
+
+    def _screen_rect(self, slots):
+        '''slots 的 rect 左上角的屏幕坐标，以及是否在屏幕内并且没有隐藏'''
+        size = self.size[slots]
+        rect = _round_half_away((self.anchor[slots] - (self.x0, self.y0)) * self.zoom - size // (2, 1))
+        visible = (rect + size > 0).all(axis = 1) & (rect < (self.screen_width, self.screen_height)).all(axis = 1) & ~self.hidden[slots]
+        return rect, visible
+
+    def _cull(self, slots, visible):
+        '''更新可见性，对进入/离开屏幕的精灵调用 on_enter / on_leave'''
+        changed = visible != self.visible[slots]
+        if not changed.any():
+            return
+        self.visible[slots] = visible
+        for slot, now in zip(slots[changed].tolist(), visible[changed].tolist()):
+            callback = self.on_enter if now else self.on_leave
+            if callback is not None:
+                callback(self.sprites[slot])
+
+    def _place(self, slots):
+        '''计算 slots 的屏幕位置和可见性，只把屏幕内的精灵的 rect 写回'''
+        if len(slots) == 0:
+            return
+        self.rect[slots], visible = self._screen_rect(slots)
+        self._cull(slots, visible)
+        self._write_rect(slots[visible])
+
+    def _write_rect(self, slots):
+        '''把 self.rect 中的屏幕位置写回到精灵上'''
+        for slot, (rx, ry) in zip(slots.tolist(), self.rect[slots].tolist()):
+            sprite = self.sprites[slot]
+            sprite.rect.x = rx
+            sprite.rect.y = ry
+            sprite.dirty = 1
+
+    def advance(self, fraction):
+        '''
+        所有精灵向目标前进 (target - src) * fraction，fraction 为这一帧推进的 tick 比例。
+        只有 rect 发生变化（或刚进入屏幕）、并且移动前或移动后位于屏幕内的精灵才写回 rect 并标记为需要重绘
+        '''
+        moving = self.active & np.any(self.target != self.src, axis = 1)
+        slots = np.flatnonzero(moving)
+        if len(slots) == 0:
+            return 0
+        self.anchor[slots] += (self.target[slots] - self.src[slots]) * fraction
+
+        rect, visible = self._screen_rect(slots)
+        changed = (rect != self.rect[slots]).any(axis = 1)
+        self.rect[slots] = rect
+        was_visible = self.visible[slots]
+        self._cull(slots, visible)
+        #屏幕外的移动只更新数组，等精灵进入屏幕时再写回
+        write = (visible | was_visible) & (changed | (visible & ~was_visible))
+        if write.any():
+            self._write_rect(slots[write])
+        return int(write.sum())
+
+    def snap(self):
+        '''所有精灵直接放到目标位置（跳转时使用），不播放动画'''
+        slots = np.flatnonzero(self.active)
+        self.anchor[slots] = self.target[slots]
+        self.src[slots] = self.target[slots]
+        self._place(slots)
+
+    def settle(self):
+        '''一个 tick 的动画结束，所有精灵以当前位置作为下一段插值的起点'''
+        self.src[self.active] = self.anchor[self.active]
+
+    def sprites_at_target_x(self, x):
+        '''目标横坐标为 x 的精灵（例如走向销毁位置的乘客）'''
+        return [self.sprites[slot] for slot in np.flatnonzero(self.active & (self.target[:, 0] == x)).tolist()]
+
+    def tagged(self, tag):
+        '''类别为 tag 的精灵的槽位'''
+        return np.flatnonzero(self.active & (self.tag == tag))
+
+
+class AnimationClock:
+    '''
+    一个 tick 的动画在 tick_seconds / speed 秒内播完（按真实时间，不按帧数）。
+    max_speed 模式下每个 tick 直接跳到终点；paused 时动画停住，锁步模式下调度算法也随之等待
+    '''
+    SPEEDS = (0.25, 0.5, 1, 2, 4, 8, 16, 32, 64)
+
+    def __init__(self, tick_seconds, fps = 60, speed = 1):
+        self.tick_seconds = tick_seconds
+        self.fps = fps
+        self.speed = speed
+        self.max_speed = False
+        self.paused = False
+        #当前 tick 的动画进度，1 表示已经播完
+        self.progress = 1.0
+
+    def start(self):
+        self.progress = 0.0
+
+    @property
+    def finished(self):
+        return self.progress >= 1.0
+
+    def advance(self, seconds):
+        '''经过 seconds 秒，返回这一帧应当推进的 tick 比例'''
+        if self.paused or self.finished:
+            return 0.0
+        remaining = 1.0 - self.progress
+        step = seconds * self.speed / self.tick_seconds
+        if self.max_speed or step >= remaining:
+            self.progress = 1.0
+            return remaining
+        self.progress += step
+        return step
+
+    def faster(self):
+        self._shift(1)
+
+    def slower(self):
+        self._shift(-1)
+
+    def _shift(self, offset):
+        speeds = self.SPEEDS
+        index = min(range(len(speeds)), key = lambda i: abs(speeds[i] - self.speed))
+        self.speed = speeds[max(0, min(len(speeds) - 1, index + offset))]
+
+    def reset_speed(self):
+        self.speed = 1
+        self.max_speed = False
+
+    def toggle_max_speed(self):
+        self.max_speed = not self.max_speed
+
+    def toggle_pause(self):
+        self.paused = not self.paused
+
+    @property
+    def frame_limited(self):
+        '''一个 tick 的动画至少要播一帧以上时才限制帧率；否则不限帧率，让 tick 尽快推进'''
+        return not self.max_speed and self.tick_seconds / self.speed >= 1 / self.fps
+
+    def label(self):
+        if self.paused:
+            return '暂停'
+        if self.max_speed:
+            return '最快'
+        return f'{self.speed:g}x'
+
+
+class MovingSprite:
+    '''
+    精灵的 anchor/src/target 直接映射到 MotionTable 中的一行，
+    读取得到的是该行的 NumPy 视图（支持下标和 copy()），赋值时写入数组
+    '''
+    motion = None
+    motion_slot = None
+    #在 MotionTable 中的类别
+    motion_tag = 0
+
+    def attach_motion(self, motion, x, y):
+        self.motion = motion
+        motion.add(self, x, y, self.motion_tag)
+
+    @property
+    def anchor(self):
+        return self.motion.anchor[self.motion_slot]
+
+    @anchor.setter
+    def anchor(self, value):
+        self.motion.anchor[self.motion_slot] = value
+
+    @property
+    def src(self):
+        return self.motion.src[self.motion_slot]
+
+    @src.setter
+    def src(self, value):
+        self.motion.src[self.motion_slot] = value
+
+    @property
+    def target(self):
+        return self.motion.target[self.motion_slot]
+
+    @target.setter
+    def target(self, value):
+        self.motion.target[self.motion_slot] = value
+
+    def kill(self):
+        super().kill()
+        if self.motion is not None:
+            self.motion.remove(self)
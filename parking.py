@@ -0,0 +1,86 @@
+'''
+按需求停靠空闲电梯
+DemandHistogram 记录每层每个方向的呼叫次数，按半衰期做时间衰减（越近的呼叫权重越大），跨轮次保留。
+plan_parking 把衰减后的呼叫量按楼层累加，切成与空闲电梯数相同的等量区间，每台电梯停在一个区间的加权中位楼层：
+上行高峰时呼叫集中在大堂，几台电梯都会停在大堂附近；下行高峰时则分散到上面各层。
+'''
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+UP = 0
+DOWN = 1
+# 电梯离所在区间的中位层不超过区间宽度的这个比例时原地停靠
+STAY_FRACTION = 0.25
+
+
+class DemandHistogram:
+    def __init__(self, num_floors: int, half_life: float = 300.0):
+        self.half_life = half_life
+        self.counts = np.zeros((num_floors, 2))
+        self.tick = 0
+
+    @property
+    def num_floors(self) -> int:
+        return len(self.counts)
+
+    def resize(self, num_floors: int):
+        '''新一轮流量的楼层数不同时，历史不再适用，清空'''
+        if num_floors != self.num_floors:
+            self.counts = np.zeros((num_floors, 2))
+
+    def _decay_to(self, tick: int):
+        # 新一轮流量的 tick 从 0 重新开始，此时不衰减，只重新对齐时间
+        if tick > self.tick:
+            self.counts *= 0.5 ** ((tick - self.tick) / self.half_life)
+        self.tick = tick
+
+    def add(self, floor: int, direction: str, tick: int):
+        self._decay_to(tick)
+        self.counts[floor, UP if direction == 'up' else DOWN] += 1
+
+    def weights(self) -> np.ndarray:
+        '''每层的呼叫量（两个方向合计），只用于比较，不需要衰减到当前时刻'''
+        return self.counts.sum(axis=1)
+
+    def rates(self, tick: int) -> np.ndarray:
+        '''
+        每层每方向每 tick 的预计呼叫数，形状 (楼层数, 2)。
+        到达率为 r 时衰减后的计数稳定在 r * half_life / ln2，反过来即可估计 r
+        '''
+        self._decay_to(tick)
+        return self.counts * (np.log(2) / self.half_life)
+
+    @property
+    def total(self) -> float:
+        return float(self.counts.sum())
+
+
+def plan_parking(weights: np.ndarray, cars: int) -> List[Tuple[int, int, int]]:
+    '''
+    把呼叫量切成 cars 个等量区间，返回每个区间的 (最低层, 加权中位层, 最高层)，从低到高排列。
+    没有任何呼叫记录时返回空列表
+    '''
+    total = weights.sum()
+    if cars <= 0 or total <= 0:
+        return []
+    cumulative = np.cumsum(weights)
+    # 区间 i 覆盖累计呼叫量 (i/cars, (i+1)/cars] 所在的楼层
+    lows = np.searchsorted(cumulative, np.arange(cars) / cars * total, side='right')
+    highs = np.searchsorted(cumulative, np.arange(1, cars + 1) / cars * total)
+    medians = np.searchsorted(cumulative, (np.arange(cars) + 0.5) / cars * total)
+    last = len(weights) - 1
+    return [(int(min(lows[i], medians[i])), int(medians[i]), int(min(highs[i], last))) for i in range(cars)]
+
+
+def match_parking(positions: Dict[int, float], zones: List[Tuple[int, int, int]]) -> Dict[int, int]:
+    '''
+    一维上按位置顺序与区间一一配对（总移动距离最小），返回 {电梯 id: 停靠楼层}。
+    离中位层不超过区间宽度 STAY_FRACTION 的电梯原地停靠，不必为一两层来回挪动
+    '''
+    order = sorted(positions, key=positions.__getitem__)
+    plan = {}
+    for elevator_id, (low, median, high) in zip(order, zones):
+        position = positions[elevator_id]
+        plan[elevator_id] = round(position) if abs(position - median) <= STAY_FRACTION * (high - low) else median
+    return plan
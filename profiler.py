@@ -0,0 +1,146 @@
+'''
+无 GUI 运行的性能剖析（main_no_gui.py --profile）
+- 计时：控制器回调、客户端调用（HTTP 或本地引擎）和日志调用外面各套一层计时，按调用栈累计“自身时间”
+  （扣掉内层被计时函数的时间），因此能区分时间花在调度逻辑、客户端 I/O 还是日志上；
+  一轮流量的总时间里没有落在任何被计时函数内的部分记为 sdk（SDK 的事件循环、构造代理对象等）；
+- 采样（可选）：后台线程每隔 sample_interval 秒抓一次主线程的 Python 调用栈并计数；
+- 每轮流量结束时写出 collapsed-stack 文件（每行 “栈;帧 数值”，flamegraph.pl / speedscope 可以直接读取，
+  计时的数值单位为微秒，采样的为次数），并输出按自身时间排序的前 N 项汇总。
+'''
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Dict, List, Tuple
+
+# 不在任何被计时函数内的时间记在这一帧下
+SDK = 'sdk'
+
+
+class CallProfiler:
+    def __init__(self, path: str = 'profile.folded', sample_interval: float = 0.0, top: int = 20):
+        '''
+        path：计时结果的 collapsed-stack 文件，采样结果写到同名的 .samples 文件，汇总写到 .txt 文件；
+        sample_interval：采样间隔（秒），0 关闭采样；top：汇总输出的行数
+        '''
+        self.path = path
+        self.sample_interval = sample_interval
+        self.top = top
+        self.round = 0
+        self._stack: List[str] = []
+        # 每一层已经计入内层函数的时间
+        self._child: List[float] = []
+        self._reset()
+        self._sampler = None
+        self._sampling = False
+
+    def start(self):
+        '''开始计时（和采样），在控制器开始运行之前调用'''
+        self._reset()
+        if self.sample_interval > 0 and self._sampler is None:
+            self._start_sampler()
+
+    def _reset(self):
+        # {调用栈: 自身时间（秒）}，{帧: [调用次数, 总时间]}
+        self.self_time: Dict[Tuple[str, ...], float] = defaultdict(float)
+        self.calls: Dict[str, List[float]] = defaultdict(lambda: [0, 0.0])
+        self.samples: Counter = Counter()
+        self.round_start = time.perf_counter()
+
+    # ---------------- 计时 ----------------
+    def wrap(self, category: str, name: str, func: Callable) -> Callable:
+        '''返回套上计时的 func，记为帧 “category:name”'''
+        frame = f'{category}:{name}'
+        stack = self._stack
+        child = self._child
+        clock = time.perf_counter
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            stack.append(frame)
+            child.append(0.0)
+            start = clock()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                inner = child.pop()
+                profiler.self_time[tuple(stack)] += elapsed - inner
+                stack.pop()
+                if child:
+                    child[-1] += elapsed
+                record = profiler.calls[frame]
+                record[0] += 1
+                record[1] += elapsed
+        wrapper.__wrapped__ = func
+        return wrapper
+
+    # ---------------- 采样 ----------------
+    def _start_sampler(self):
+        main_id = threading.main_thread().ident
+        self._sampling = True
+
+        def run():
+            while self._sampling:
+                time.sleep(self.sample_interval)
+                frame = sys._current_frames().get(main_id)
+                names = []
+                while frame is not None:
+                    code = frame.f_code
+                    names.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+                    frame = frame.f_back
+                if names:
+                    self.samples[';'.join(reversed(names))] += 1
+
+        self._sampler = threading.Thread(target=run, name='profile-sampler', daemon=True)
+        self._sampler.start()
+
+    # ---------------- 输出 ----------------
+    def end_round(self) -> str:
+        '''一轮流量结束：写出本轮的 collapsed-stack 文件和汇总，清空计数，返回汇总文本'''
+        wall = time.perf_counter() - self.round_start
+        timed = sum(t for stack, t in self.self_time.items())
+        self_time = dict(self.self_time)
+        self_time[(SDK,)] = max(wall - timed, 0.0)
+        root, ext = os.path.splitext(self.path)
+        suffix = f'.round{self.round}' if self.round else ''
+        with open(f'{root}{suffix}{ext}', 'w', encoding='utf-8') as f:
+            for stack, seconds in sorted(self_time.items()):
+                f.write(f'{";".join(stack)} {int(seconds * 1e6)}\n')
+        if self.samples:
+            with open(f'{root}{suffix}.samples{ext}', 'w', encoding='utf-8') as f:
+                for stack, count in sorted(self.samples.items()):
+                    f.write(f'{stack} {count}\n')
+        summary = self.summary(self_time, wall)
+        with open(f'{root}{suffix}.txt', 'w', encoding='utf-8') as f:
+            f.write(summary)
+        self.round += 1
+        self._reset()
+        return summary
+
+    def summary(self, self_time: Dict[Tuple[str, ...], float], wall: float) -> str:
+        '''按分类和按帧（自身时间从大到小的前 top 项）汇总'''
+        by_frame: Dict[str, float] = defaultdict(float)
+        by_category: Dict[str, float] = defaultdict(float)
+        for stack, seconds in self_time.items():
+            by_frame[stack[-1]] += seconds
+            by_category[stack[-1].split(':')[0]] += seconds
+        lines = [f'round {self.round}: wall {wall * 1000:.1f} ms', '']
+        lines.append(f'{"category":<12}{"self ms":>12}{"%":>8}')
+        for category, seconds in sorted(by_category.items(), key=lambda item: -item[1]):
+            lines.append(f'{category:<12}{seconds * 1000:>12.1f}{100 * seconds / wall if wall else 0:>8.1f}')
+        lines.append('')
+        lines.append(f'{"frame":<44}{"calls":>8}{"total ms":>12}{"self ms":>12}{"self %":>8}')
+        for frame, seconds in sorted(by_frame.items(), key=lambda item: -item[1])[:self.top]:
+            calls, total = self.calls[frame] if frame in self.calls else (0, seconds)
+            lines.append(f'{frame:<44}{int(calls):>8}{total * 1000:>12.1f}{seconds * 1000:>12.1f}'
+                         f'{100 * seconds / wall if wall else 0:>8.1f}')
+        lines.append('')
+        return '\n'.join(lines)
+
+    def close(self):
+        self._sampling = False
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sampler = None
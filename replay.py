@@ -0,0 +1,29 @@
+'''
+回放 trace 文件（由 --trace 记录，见 tick_trace.py），不需要调度算法和模拟器。
+GUI 中 左/右 前后一步，PageUp/PageDown 前后 100 步，Home/End 跳到开头/结尾，
+空格暂停，上/下 调整播放速度。
+
+用法：
+python replay.py run.trace [--round 0] [--tick 15000]
+'''
+import argparse
+
+from GUI import GUI
+from tick_trace import TraceReplay
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回放电梯调度 trace')
+    parser.add_argument('trace', help='trace 文件路径')
+    parser.add_argument('--round', type=int, default=0, help='从第几轮流量开始（从 0 开始）')
+    parser.add_argument('--tick', type=int, default=0, help='从该轮的第几个 tick 开始')
+    args = parser.parse_args()
+
+    replay = TraceReplay(args.trace)
+    start = replay.round_start(args.round) + args.tick
+    replay.close()
+    GUI(None, None, None, replay = args.trace, replay_start = start)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,184 @@
+'''
+基于前向仿真 (rollout) 的决策评估，用于可选的模型预测调度模式
+电梯停靠时给出几个候选目标楼层，对每个候选在若干组采样的未来到达下把整个楼宇向前仿真 horizon 个 tick，
+取平均的“乘客·tick”（等待中和乘梯中的乘客数按 tick 累加）最小的候选。
+
+仿真模型是真实引擎的简化版，所有 候选 × 样本 的仿真放在同一组 NumPy 数组里一起推进（批维度 B = 候选数 × 样本数）：
+- 位置以 0.1 层为单位，电梯每 tick 走 2 个单位，每次停靠额外停 STOP_TICKS 个 tick；
+- 电梯按 LOOK 规则行驶：沿当前方向驶向最远的需求，途经有人下车或有同向乘客等待的楼层时停靠，前方没有需求才掉头；
+- 等待和车内乘客用浮点人数表示，上车的乘客目的层在呼叫方向上均匀分布；
+- 未来到达按每层每方向的泊松过程采样，同一组样本在所有候选之间共用（公共随机数，减小比较的方差）。
+做决策的电梯在第 0 个 tick 驶向自己的候选目标，之后与其它电梯一样按 LOOK 行驶。
+'''
+import time
+from typing import Sequence, Tuple
+
+import numpy as np
+
+# 每次停靠额外花费的 tick 数（减速、开门上下客、起步）
+STOP_TICKS = 4
+# 每 tick 行驶的距离（0.1 层为单位）
+SPEED = 2
+EPS = 1e-6
+
+
+class RolloutEvaluator:
+    def __init__(self, num_floors: int, capacity: int, horizon: int = 60, samples: int = 32,
+                 budget: float = 0.05, max_samples: int = 256, seed: int = 0):
+        self.num_floors = num_floors
+        self.capacity = capacity
+        self.horizon = horizon
+        self.samples = samples
+        self.max_samples = max_samples
+        self.budget = budget
+        self.rng = np.random.default_rng(seed)
+        floors = np.arange(num_floors)
+        # dest_share[d, g, f]：在 g 层按方向 d 上车的乘客去往 f 层的比例
+        up = (floors[None, :] > floors[:, None]).astype(float)
+        down = (floors[None, :] < floors[:, None]).astype(float)
+        self.dest_share = np.stack([
+            up / np.maximum(up.sum(axis=1, keepdims=True), 1),
+            down / np.maximum(down.sum(axis=1, keepdims=True), 1),
+        ])
+        # 统计
+        self.rollouts = 0
+        self.last_elapsed = 0.0
+
+    def choose(self, elevator_id: int, candidates: Sequence[int], positions: Sequence[float], targets: Sequence[int],
+               riders: np.ndarray, waiting: np.ndarray, rates: np.ndarray) -> Tuple[int, np.ndarray]:
+        '''
+        elevator_id: 做决策的电梯（正停在某一层），candidates: 它的候选目标楼层
+        positions / targets: 每台电梯的浮点楼层和当前目标；riders: (电梯数, 楼层数) 车内各目的层人数
+        waiting: (楼层数, 2) 各层上行/下行等待人数；rates: (楼层数, 2) 每 tick 的预计到达人数
+        返回 (最优候选的下标, 每个候选的平均代价)
+        '''
+        t0 = time.perf_counter()
+        cost = self._simulate(elevator_id, list(candidates), positions, targets, riders, waiting, rates)
+        self.last_elapsed = elapsed = time.perf_counter() - t0
+        # 按上次的耗时调整样本数，让一次评估保持在时间预算以内
+        if elapsed > self.budget:
+            self.samples = max(8, self.samples // 2)
+        elif elapsed < self.budget / 3:
+            self.samples = min(self.max_samples, self.samples * 2)
+        return int(np.argmin(cost)), cost
+
+    def _simulate(self, elevator_id, candidates, positions, targets, riders, waiting, rates) -> np.ndarray:
+        num_candidates = len(candidates)
+        samples = self.samples
+        batch = num_candidates * samples
+        num_elevators = len(positions)
+        num_floors = self.num_floors
+        self.rollouts += batch
+        rows = np.arange(batch)[:, None]
+        cars = np.arange(num_elevators)[None, :]
+
+        # ---------------- 初始状态，复制到每一个 候选 × 样本 ----------------
+        # 位置取整到 SPEED 的倍数，行驶中恰好落在整层上
+        pos = np.tile(np.round(np.asarray(positions, dtype=float) * 10 / SPEED).astype(np.int64) * SPEED, (batch, 1))
+        tgt = np.tile(np.asarray(targets, dtype=np.int64), (batch, 1))
+        tgt[:, elevator_id] = np.repeat(candidates, samples)
+        direction = np.sign(tgt * 10 - pos)
+        dwell = np.zeros((batch, num_elevators), dtype=np.int64)
+        ride = np.tile(np.asarray(riders, dtype=float), (batch, 1, 1))
+        wait = np.tile(np.asarray(waiting, dtype=float), (batch, 1, 1))
+        # 样本 s 在所有候选中共用同一组到达（顶层没有上行、底层没有下行）
+        rates = np.array(rates, dtype=float)
+        rates[-1, 0] = rates[0, 1] = 0.0
+        arrivals = self.rng.poisson(rates, size=(self.horizon, samples, num_floors, 2)).astype(float)
+        arrivals = np.tile(arrivals, (1, num_candidates, 1, 1))
+
+        # 做决策的电梯此刻正停着：按候选方向让本层乘客上车
+        here = pos[0, elevator_id] // 10
+        first = np.zeros((batch, num_elevators), dtype=bool)
+        first[:, elevator_id] = direction[:, elevator_id] != 0
+        self._board(first, here * np.ones((batch, num_elevators), dtype=np.int64), direction, ride, wait)
+
+        cost = np.zeros(batch)
+        for step in range(self.horizon):
+            wait += arrivals[step]
+
+            # 停靠中的电梯倒计时
+            dwelling = dwell > 0
+            dwell[dwelling] -= 1
+
+            # 行驶
+            moving = ~dwelling & (direction != 0)
+            pos += SPEED * direction * moving
+            floor = pos // 10
+            # 到达楼层：目标层，或有人下车，或有同向乘客等待时停靠
+            stopping = moving & (pos % 10 == 0) & (
+                (floor == tgt)
+                | (ride[rows, cars, floor] > EPS)
+                | (wait[rows, floor, (direction < 0).view(np.int8)] > EPS)
+            )
+            # 没有方向、也不在停靠中的电梯每个 tick 重新看一次有没有需求
+            stopping |= ~dwelling & (direction == 0)
+            if stopping.any():
+                self._stop(stopping, floor, pos, tgt, direction, dwell, ride, wait)
+
+            cost += wait.sum(axis=(1, 2)) + ride.sum(axis=(1, 2))
+
+        return cost.reshape(num_candidates, samples).mean(axis=1)
+
+    def _stop(self, stopping, floor, pos, tgt, direction, dwell, ride, wait):
+        '''停靠：下客，按 LOOK 选方向，按这个方向上客，再把目标设为这个方向上最远的需求'''
+        b, e = np.nonzero(stopping)
+        g = floor[b, e]
+        alighted = ride[b, e, g] > EPS
+        ride[b, e, g] = 0.0
+
+        # 需求：车内目的层，或任意方向有人等待的楼层（不含本层）
+        floors = np.arange(self.num_floors)
+        demand = (ride[b, e] > EPS) | (wait[b].sum(axis=2) > EPS)
+        above = demand & (floors[None, :] > g[:, None])
+        below = demand & (floors[None, :] < g[:, None])
+        has_up = above.any(axis=1)
+        has_down = below.any(axis=1)
+        here_up = wait[b, g, 0] > EPS
+        here_down = wait[b, g, 1] > EPS
+        want_up = has_up | here_up
+        want_down = has_down | here_down
+        # 保持原方向，原方向上没有需求才掉头；空闲的电梯先看上方
+        current = direction[b, e]
+        new_direction = np.where((current > 0) & want_up, 1,
+                                 np.where((current < 0) & want_down, -1,
+                                          np.where(want_up, 1, np.where(want_down, -1, 0))))
+
+        # 上客（同一 tick 同一层同一方向有多台电梯时平分等待的乘客）
+        mask = np.zeros_like(stopping)
+        mask[b, e] = new_direction != 0
+        full_direction = direction.copy()
+        full_direction[b, e] = new_direction
+        boarded = self._board(mask, floor, full_direction, ride, wait)
+
+        # 目标：这个方向上最远的需求（上客后重新计算，包含新乘客的目的层）
+        demand = (ride[b, e] > EPS) | (wait[b].sum(axis=2) > EPS)
+        last_above = np.where(demand & (floors[None, :] > g[:, None]), floors[None, :], -1).max(axis=1)
+        first_below = np.where(demand & (floors[None, :] < g[:, None]), floors[None, :], self.num_floors).min(axis=1)
+        target = np.where(new_direction > 0, np.maximum(last_above, g + 1),
+                          np.where(new_direction < 0, np.minimum(first_below, g - 1), g))
+        new_direction = np.sign(target - g)
+
+        direction[b, e] = new_direction
+        tgt[b, e] = target
+        pos[b, e] = g * 10
+        dwell[b, e] = np.where(alighted | (boarded[b, e] > EPS), STOP_TICKS, 0)
+
+    def _board(self, mask, floor, direction, ride, wait) -> np.ndarray:
+        '''mask 中的电梯按 direction 方向在 floor 层上客，返回 (B, 电梯数) 的上车人数'''
+        boarded = np.zeros(mask.shape)
+        b, e = np.nonzero(mask)
+        if not len(b):
+            return boarded
+        g = floor[b, e]
+        d = (direction[b, e] < 0).astype(np.int64)
+        # 同一批次中同一层同一方向上客的电梯数
+        sharing = np.zeros(wait.shape)
+        np.add.at(sharing, (b, g, d), 1)
+        free = np.maximum(self.capacity - ride[b, e].sum(axis=1), 0)
+        take = np.minimum(wait[b, g, d] / sharing[b, g, d], free)
+        np.subtract.at(wait, (b, g, d), take)
+        np.maximum(wait, 0, out=wait)
+        ride[b, e] += take[:, None] * self.dest_share[d, g]
+        boarded[b, e] = take
+        return boarded
@@ -0,0 +1,169 @@
+'''
+共享内存中的世界状态表（可选的解耦模式传输方式）
+调度算法进程直接把电梯位置/方向/载客数、乘客位置/状态写进一块 multiprocessing.shared_memory，
+GUI 进程每帧通过 memoryview 直接读取，不再有任何序列化，也不需要回放消息：任何时刻读到的都是完整状态。
+
+一致性使用顺序锁 (seqlock)：写入前把序号加一变成奇数，写完再加一变回偶数；
+读者读到奇数序号或读前读后序号不一致时重读。
+'''
+import struct
+from multiprocessing import shared_memory
+
+from utils import Snapshot
+
+# 头部：序号, tick, 楼层数, 电梯数, 活跃乘客 id 下界, 乘客 id 上界(不含), 流量轮次
+_HEADER = struct.Struct('<Qiiiiii')
+_SEQ = struct.Struct('<Q')
+
+# 乘客状态
+ABSENT = 0
+WAITING = 1
+RIDING = 2
+DEPARTED = 3
+
+# 电梯方向
+DIRECTION_CODE = {'up': 1, 'down': -1, 'stopped': 0}
+
+
+class SharedWorldState:
+    '''
+    内存布局（按对齐从大到小排列）：
+    header | 电梯位置 float32[max_elevators] | 电梯载客数 int16[max_elevators] | 电梯方向 int8[max_elevators]
+           | 乘客所在楼层/电梯 int16[max_passengers] | 乘客状态 int8[max_passengers]
+    id 超出 max_passengers 的乘客不会写入
+    '''
+    def __init__(self, name: str = None, max_elevators: int = 64, max_passengers: int = 65536, create: bool = False):
+        self.max_elevators = max_elevators = (max_elevators + 7) // 8 * 8
+        self.max_passengers = max_passengers
+        size = _HEADER.size + max_elevators * 7 + max_passengers * 3
+        if create:
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        else:
+            self.shm = _attach(name)
+        buf = self.shm.buf
+        self._views = []
+        offset = _HEADER.size
+        self.positions = self._view(buf, offset, max_elevators * 4, 'f')
+        offset += max_elevators * 4
+        self.loads = self._view(buf, offset, max_elevators * 2, 'h')
+        offset += max_elevators * 2
+        self.directions = self._view(buf, offset, max_elevators, 'b')
+        offset += max_elevators
+        self.where = self._view(buf, offset, max_passengers * 2, 'h')
+        offset += max_passengers * 2
+        self.states = self._view(buf, offset, max_passengers, 'b')
+
+        # 仅写者使用
+        self._seq = 0
+        self._live = set()
+        self._hi = 0
+        self._round = 0
+        if create:
+            _HEADER.pack_into(buf, 0, 0, 0, 0, 0, 0, 0, 0)
+
+    def _view(self, buf, offset, size, fmt):
+        raw = buf[offset:offset + size]
+        view = raw.cast(fmt)
+        # 关闭共享内存前必须释放所有导出的 memoryview，包括切片本身
+        self._views += [view, raw]
+        return view
+
+    @property
+    def name(self) -> str:
+        return self.shm.name
+
+    # ---------------- 写者（调度算法进程） ----------------
+    def _begin(self):
+        self._seq += 1
+        _SEQ.pack_into(self.shm.buf, 0, self._seq)
+
+    def _end(self, tick, num_floors, num_elevators, lo, hi):
+        self._seq += 1
+        _HEADER.pack_into(self.shm.buf, 0, self._seq, tick, num_floors, num_elevators, lo, hi, self._round)
+
+    def clear(self, tick: int = 0, num_floors: int = 0, round: int = 0):
+        '''新一轮流量开始时清空乘客表（乘客 id 会从 1 重新编号），之后写入的状态都带上新的轮次'''
+        self._round = round
+        self._begin()
+        self.states[:self._hi] = memoryview(bytes(self._hi)).cast('b')
+        self._live = set()
+        self._hi = 0
+        self._end(tick, num_floors, 0, 0, 0)
+
+    def write(self, tick: int, num_floors: int, elevators, waiting, riding):
+        '''
+        elevators: [(浮点楼层, 方向 'up'/'down'/'stopped', 载客数)]，按电梯 id 排列
+        waiting: [(乘客 id, 楼层)]；riding: [(乘客 id, 电梯 id)]
+        之前在表里、这次不在的乘客标记为 DEPARTED
+        '''
+        cap = self.max_passengers
+        self._begin()
+        num_elevators = min(len(elevators), self.max_elevators)
+        for i in range(num_elevators):
+            position, direction, load = elevators[i]
+            self.positions[i] = position
+            self.directions[i] = DIRECTION_CODE.get(direction, 0)
+            self.loads[i] = load
+
+        live = set()
+        for pid, floor in waiting:
+            if pid < cap:
+                self.states[pid] = WAITING
+                self.where[pid] = floor
+                live.add(pid)
+        for pid, elevator_id in riding:
+            if pid < cap:
+                self.states[pid] = RIDING
+                self.where[pid] = elevator_id
+                live.add(pid)
+        for pid in self._live - live:
+            self.states[pid] = DEPARTED
+        self._live = live
+        if live:
+            self._hi = max(self._hi, max(live) + 1)
+        lo = min(live) if live else self._hi
+        self._end(tick, num_floors, num_elevators, lo, self._hi)
+
+    # ---------------- 读者（GUI 进程） ----------------
+    def read(self, last_seq: int = -1, retries: int = 100):
+        '''
+        返回 (Snapshot, 序号)；状态自 last_seq 以来没有变化时返回 (None, last_seq)。
+        只扫描 [活跃乘客 id 下界, 上界) 这一段，开销与当前在场人数相当而不是与历史总人数相当
+        '''
+        buf = self.shm.buf
+        for _ in range(retries):
+            seq, tick, num_floors, num_elevators, lo, hi, round = _HEADER.unpack_from(buf, 0)
+            if seq & 1:
+                continue
+            if seq == last_seq:
+                return None, last_seq
+            positions = self.positions[:num_elevators].tolist()
+            states = self.states[lo:hi].tolist()
+            where = self.where[lo:hi].tolist()
+            if _SEQ.unpack_from(buf, 0)[0] != seq:
+                continue
+            waiting = [(lo + i, where[i]) for i, state in enumerate(states) if state == WAITING]
+            riding = [(lo + i, where[i]) for i, state in enumerate(states) if state == RIDING]
+            return Snapshot(tick, num_floors, positions, waiting, riding, round), seq
+        return None, last_seq
+
+    def close(self):
+        for view in self._views:
+            view.release()
+        self._views = []
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+def _attach(name: str) -> shared_memory.SharedMemory:
+    '''
+    连接到已有的共享内存，只由创建方负责 unlink。
+    Python 3.13 起可以直接关闭跟踪；更早的版本中子进程与主进程共用同一个 resource_tracker，
+    重复登记不会产生影响，也不能在这里取消登记（否则主进程 unlink 时会找不到登记项）
+    '''
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
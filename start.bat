@@ -1,12 +1,12 @@
 @echo off
 
-:: 安装pygame
-pip install pygame
+:: 安装pygame和numpy
+pip install pygame numpy
 if %ERRORLEVEL% == 0 (
-    echo pygame安装成功
+    echo pygame和numpy安装成功
     :: 运行main.py
     python main.py
 ) else (
-    echo pygame安装失败，请检查网络或Python环境
+    echo pygame或numpy安装失败，请检查网络或Python环境
 )
 
@@ -0,0 +1,132 @@
+'''
+调度参数搜索
+对控制器参数做网格搜索或随机搜索，每个 (参数组合, 流量, 种子) 是一次独立的仿真，
+用进程池分发到所有 CPU 核心上运行（每个进程各自创建 LocalEngine），最后汇总 KPI 并按目标指标排序。
+
+用法：
+python sweep.py --grid dispatch=bus,look,group idle_floor=0,2,4 init_spread=even,lobby reverse_rule=here_or_ahead,ahead \
+                --profiles up_peak inter_floor --size 12x4 --seeds 1 2 3 [--random 50] [--rank-by avg_wait]
+'''
+import argparse
+import itertools
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List
+
+from benchmark import PROFILES, parse_size, run_case, write_table
+
+# 汇总时取平均的指标
+KPIS = ['avg_wait', 'p95_wait', 'max_wait', 'avg_journey', 'p95_journey', 'delivered_per_tick', 'travel_distance']
+
+
+def parse_value(text: str):
+    for cast in (int, float):
+        try:
+            return cast(text)
+        except ValueError:
+            pass
+    return text
+
+
+def parse_grid(items: List[str]) -> Dict[str, List[Any]]:
+    '''把 ["idle_floor=0,2,4", ...] 解析为 {"idle_floor": [0, 2, 4], ...}'''
+    grid = {}
+    for item in items:
+        name, values = item.split('=', 1)
+        grid[name] = [parse_value(v) for v in values.split(',')]
+    return grid
+
+
+def expand_configs(grid: Dict[str, List[Any]], samples: int = 0, seed: int = 0) -> List[Dict[str, Any]]:
+    '''网格中的全部组合；samples > 0 时从中不重复地随机抽取 samples 个'''
+    names = list(grid)
+    configs = [dict(zip(names, values)) for values in itertools.product(*(grid[n] for n in names))]
+    if 0 < samples < len(configs):
+        configs = random.Random(seed).sample(configs, samples)
+    return configs
+
+
+def _run_task(task):
+    '''进程池中执行的单次仿真，task 只包含可 pickle 的基本类型'''
+    config_id, policy, params, profile, floors, elevators, seed, duration, passengers = task
+    row = run_case(policy, profile, floors, elevators, seed, duration, passengers, params)
+    row['config_id'] = config_id
+    return row
+
+
+def aggregate(configs: List[Dict[str, Any]], rows: List[Dict[str, Any]], rank_by: str) -> List[Dict[str, Any]]:
+    '''
+    按参数组合汇总所有流量和种子上的 KPI 平均值，按 rank_by 从小到大排序（delivered_per_tick 从大到小）。
+    一个乘客都没送达的组合乘梯时间为 0，会被排到最后而不是最前
+    '''
+    grouped: Dict[int, List[Dict[str, Any]]] = {}
+    for row in rows:
+        grouped.setdefault(row['config_id'], []).append(row)
+
+    report = []
+    for config_id, config in enumerate(configs):
+        runs = grouped.get(config_id, [])
+        entry = {'config_id': config_id, 'runs': len(runs)}
+        entry.update(config)
+        for kpi in KPIS:
+            entry[kpi] = round(sum(r[kpi] for r in runs) / len(runs), 3) if runs else 0.0
+        report.append(entry)
+    report.sort(key=lambda e: (e['delivered_per_tick'] == 0,
+                               -e[rank_by] if rank_by == 'delivered_per_tick' else e[rank_by]))
+    for rank, entry in enumerate(report, 1):
+        entry['rank'] = rank
+    return report
+
+
+def run_sweep(configs: List[Dict[str, Any]], policy: str, profiles: List[str], size: str, seeds: List[int],
+              duration: int = 200, passengers: int = 0, workers: int = 0) -> List[Dict[str, Any]]:
+    floors, elevators = parse_size(size)
+    tasks = [
+        (config_id, policy, config, profile, floors, elevators, seed, duration, passengers)
+        for config_id, config in enumerate(configs)
+        for profile in profiles
+        for seed in seeds
+    ]
+    workers = workers or os.cpu_count() or 1
+    # 单次仿真很短，按块分发以减少进程间通信
+    chunksize = max(1, len(tasks) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_task, tasks, chunksize=chunksize))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='电梯调度参数搜索')
+    parser.add_argument('--grid', nargs='+', required=True, help='参数=取值1,取值2,...')
+    parser.add_argument('--random', type=int, default=0, help='从网格中随机抽取的组合数，0 表示全部')
+    parser.add_argument('--policy', default='group', help='策略名（bus / look / group）或 模块:类名，--grid 中的 dispatch 优先')
+    parser.add_argument('--profiles', nargs='+', default=PROFILES, choices=PROFILES)
+    parser.add_argument('--size', default='12x4', help='楼层数x电梯数')
+    parser.add_argument('--seeds', nargs='+', type=int, default=[1, 2, 3])
+    parser.add_argument('--duration', type=int, default=200)
+    parser.add_argument('--passengers', type=int, default=0)
+    parser.add_argument('--workers', type=int, default=0, help='进程数，0 表示使用全部 CPU 核心')
+    parser.add_argument('--rank-by', default='avg_journey', choices=KPIS)
+    parser.add_argument('--top', type=int, default=10)
+    parser.add_argument('--output', default='sweep.csv')
+    args = parser.parse_args()
+
+    grid = parse_grid(args.grid)
+    configs = expand_configs(grid, args.random)
+    t0 = time.perf_counter()
+    rows = run_sweep(configs, args.policy, args.profiles, args.size, args.seeds,
+                     args.duration, args.passengers, args.workers)
+    report = aggregate(configs, rows, args.rank_by)
+    print(f'{len(configs)} configs, {len(rows)} simulations in {time.perf_counter() - t0:.1f}s')
+
+    write_table(report, args.output, ['rank', 'config_id', *grid, 'runs', *KPIS])
+    for entry in report[:args.top]:
+        params = ' '.join(f'{name}={entry[name]}' for name in grid)
+        print(f"#{entry['rank']:<3} {params}  {args.rank_by}={entry[args.rank_by]} "
+              f"avg_wait={entry['avg_wait']} delivered/tick={entry['delivered_per_tick']}")
+    print(f'results written to {args.output}')
+
+
+if __name__ == '__main__':
+    main()
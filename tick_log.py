@@ -0,0 +1,116 @@
+'''
+分级的结构化日志，取代 tick 热路径上的 print
+- 每条记录是一个字典：{"ts": 时间戳, "level": 级别, "event": 事件名, ...字段}，输出为 JSON lines（每行一个 JSON 对象）；
+- 低于当前级别的记录在 log() 的第一行就返回，不构造、不格式化任何东西；
+  要输出的内容本身计算较贵时（例如遍历所有电梯的状态），调用方先用 enabled(级别) 判断；
+- 热路径上只把记录追加到队列，序列化和写文件都在后台线程里按批完成（大缓冲区、定时刷新）。
+  第一条记录出现时才启动后台线程，默认的 warning 级别下一次正常运行没有任何控制台 I/O。
+'''
+import atexit
+import json
+import sys
+import threading
+import time
+from collections import deque
+from typing import Optional, Union
+
+DEBUG = 10
+INFO = 20
+WARNING = 30
+ERROR = 40
+OFF = 100
+
+LEVELS = {'debug': DEBUG, 'info': INFO, 'warning': WARNING, 'error': ERROR, 'off': OFF}
+LEVEL_NAMES = {value: name for name, value in LEVELS.items()}
+
+
+class TickLog:
+    def __init__(self, path: Optional[str] = None, level: Union[str, int] = 'warning',
+                 flush_interval: float = 0.5, buffer_size: int = 1 << 20):
+        '''
+        path: 输出文件（追加写入），None 时写到标准输出
+        level: 'debug' / 'info' / 'warning' / 'error' / 'off' 或对应的整数
+        flush_interval: 后台线程写一批的间隔（秒），buffer_size: 文件缓冲区大小
+        '''
+        self.level = LEVELS[level] if isinstance(level, str) else level
+        self.path = path
+        self.flush_interval = flush_interval
+        self.buffer_size = buffer_size
+        self._pending = deque()
+        self._wake = threading.Event()
+        self._closed = False
+        self._thread = None
+        self._lock = threading.Lock()
+        # 统计：写出的记录数
+        self.written = 0
+
+    def enabled(self, level: int) -> bool:
+        return level >= self.level
+
+    def log(self, level: int, event: str, **fields) -> None:
+        if level < self.level or self._closed:
+            return
+        self._pending.append({'ts': time.time(), 'level': LEVEL_NAMES.get(level, level), 'event': event, **fields})
+        if self._thread is None:
+            self._start()
+
+    def debug(self, event: str, **fields) -> None:
+        if DEBUG >= self.level:
+            self.log(DEBUG, event, **fields)
+
+    def info(self, event: str, **fields) -> None:
+        if INFO >= self.level:
+            self.log(INFO, event, **fields)
+
+    def warning(self, event: str, **fields) -> None:
+        if WARNING >= self.level:
+            self.log(WARNING, event, **fields)
+
+    def error(self, event: str, **fields) -> None:
+        if ERROR >= self.level:
+            self.log(ERROR, event, **fields)
+
+    # ---------------- 后台写入 ----------------
+    def _start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='tick-log', daemon=True)
+            self._thread.start()
+            atexit.register(self.close)
+
+    def _run(self):
+        if self.path is None:
+            out, owned = sys.stdout, False
+        else:
+            out, owned = open(self.path, 'a', encoding='utf-8', buffering=self.buffer_size), True
+        try:
+            while True:
+                self._wake.wait(self.flush_interval)
+                self._wake.clear()
+                self._drain(out)
+                if self._closed:
+                    self._drain(out)
+                    break
+        finally:
+            if owned:
+                out.close()
+
+    def _drain(self, out):
+        lines = []
+        pending = self._pending
+        while pending:
+            lines.append(json.dumps(pending.popleft(), ensure_ascii=False, default=str))
+        if lines:
+            lines.append('')
+            out.write('\n'.join(lines))
+            out.flush()
+            self.written += len(lines) - 1
+
+    def close(self) -> None:
+        '''写完队列里剩下的记录后停止后台线程，可以重复调用'''
+        self._closed = True
+        thread = self._thread
+        if thread is not None and thread.is_alive() and thread is not threading.current_thread():
+            self._wake.set()
+            thread.join()
@@ -0,0 +1,422 @@
+'''
+仿真过程的二进制追加式记录 (trace)
+控制器在每个 tick 结束时 (on_event_execute_end) 追加一条记录：本 tick 的事件、每台电梯的位置/方向/载客数、
+本 tick 发出的指令。记录先写入内存缓冲，攒够一个块再整块（可选 zlib 压缩）写入文件，tick 循环里只有几次 struct.pack。
+
+文件格式：
+    文件头  MAGIC(8) + 版本(u8) + 标志(u8，bit0 表示块经过 zlib 压缩)
+    块      存储长度(u32) + 原始长度(u32) + 数据
+    块数据  若干条记录，每条为 长度(u32) + 类型(u8) + 内容
+    索引    （正常关闭时写在文件末尾）关键帧 [步号(i32) 轮次(i32) tick(i32) 块偏移(u64)]
+            + 关键帧数(u32) + 总步数(i32) + 索引偏移(u64) + INDEX_MAGIC(8)
+步号是所有轮次的 TRACE_TICK 记录的全局序号（从 0 开始）。
+每轮开始时以及每 keyframe_interval 步写一个关键帧，关键帧总是块中的第一条记录，
+因此跳转到任意一步只需要从最近的关键帧所在的块开始解码（见 TraceReplay）。
+记录类型：
+    TRACE_ROUND  新一轮流量开始：楼层数(i32) + 电梯数(i32)
+    TRACE_TICK   tick(i32) + 事件数/电梯数/指令数(u16 x3)
+                 + 事件 [类型(u8) 电梯(i16) 楼层(i16) 乘客(i32)]，字段不存在时为 -1
+                 + 电梯 [位置(f32) 方向(i8) 载客数(u8)]，按电梯 id 排列
+                 + 指令 [电梯(i16) 楼层(i16) immediate(u8)]
+    TRACE_KEYFRAME 步号(i32) 轮次(i32) tick(i32) 楼层数(i32) 电梯数(u16) 等待人数(u32) 乘梯人数(u32)
+                 + 电梯位置 f32[] + 等待 [乘客(i32) 楼层(i16)] + 乘梯 [乘客(i32) 电梯(i16)]
+'''
+import bisect
+import struct
+import zlib
+from typing import Iterator, List, NamedTuple, Optional, Tuple
+
+from elevator_saga.core.models import EventType
+
+from utils import Snapshot
+
+MAGIC = b'ELVTRACE'
+INDEX_MAGIC = b'ELVINDEX'
+VERSION = 2
+FLAG_ZLIB = 1
+
+TRACE_ROUND = 1
+TRACE_TICK = 2
+TRACE_KEYFRAME = 3
+
+KEYFRAME_INTERVAL = 500
+
+# 事件类型 <-> 编码
+EVENT_TYPES = list(EventType)
+EVENT_CODE = {event_type: code for code, event_type in enumerate(EVENT_TYPES)}
+DIRECTION_CODE = {'up': 1, 'down': -1, 'stopped': 0}
+
+_FILE_HEADER = struct.Struct('<8sBB')
+_BLOCK_HEADER = struct.Struct('<II')
+_RECORD_HEADER = struct.Struct('<IB')
+_ROUND = struct.Struct('<ii')
+_TICK = struct.Struct('<iHHH')
+_EVENT = struct.Struct('<Bhhi')
+_ELEVATOR = struct.Struct('<fbB')
+_COMMAND = struct.Struct('<hhB')
+_KEYFRAME = struct.Struct('<iiiiHII')
+_PLACEMENT = struct.Struct('<ih')
+_INDEX_ENTRY = struct.Struct('<iiiQ')
+_INDEX_TRAILER = struct.Struct('<IiQ8s')
+
+
+class TraceEvent(NamedTuple):
+    type: EventType
+    elevator: int
+    floor: int
+    passenger: int
+
+
+class TraceElevator(NamedTuple):
+    position: float
+    direction: int
+    load: int
+
+
+class TraceCommand(NamedTuple):
+    elevator: int
+    floor: int
+    immediate: bool
+
+
+class TraceRound(NamedTuple):
+    num_floors: int
+    num_elevators: int
+
+
+class TraceTick(NamedTuple):
+    tick: int
+    events: List[TraceEvent]
+    elevators: List[TraceElevator]
+    commands: List[TraceCommand]
+
+
+class Keyframe(NamedTuple):
+    step: int
+    round: int
+    tick: int
+    offset: int
+
+
+class TraceState:
+    '''由事件增量维护的世界状态：写 trace 时用来生成关键帧，回放时用来还原每一步的快照'''
+    def __init__(self):
+        self.round = -1
+        self.tick = 0
+        self.num_floors = 0
+        self.elevators = []
+        self.waiting = {}
+        self.riding = {}
+
+    def start_round(self, num_floors: int, num_elevators: int) -> None:
+        self.round += 1
+        self.tick = 0
+        self.num_floors = num_floors
+        self.elevators = [0.0] * num_elevators
+        self.waiting = {}
+        self.riding = {}
+
+    def apply_event(self, event_type: EventType, elevator: int, floor: int, passenger: int) -> None:
+        if event_type is EventType.UP_BUTTON_PRESSED or event_type is EventType.DOWN_BUTTON_PRESSED:
+            self.waiting[passenger] = floor
+        elif event_type is EventType.PASSENGER_BOARD:
+            self.waiting.pop(passenger, None)
+            self.riding[passenger] = elevator
+        elif event_type is EventType.PASSENGER_ALIGHT:
+            self.riding.pop(passenger, None)
+
+    def apply_tick(self, record: 'TraceTick') -> None:
+        self.tick = record.tick
+        for event in record.events:
+            self.apply_event(event.type, event.elevator, event.floor, event.passenger)
+        self.elevators = [elevator.position for elevator in record.elevators]
+
+    def snapshot(self) -> Snapshot:
+        return Snapshot(self.tick, self.num_floors, list(self.elevators), list(self.waiting.items()), list(self.riding.items()),
+                        self.round)
+
+
+def _field(data, name):
+    value = data.get(name)
+    return -1 if value is None else int(value)
+
+
+class TraceWriter:
+    '''
+    compress=True 时每个块用 zlib 压缩（level 越小越快）；block_size 为攒满后写盘的未压缩字节数；
+    keyframe_interval 为关键帧间隔（步数），越小跳转越快、文件越大
+    '''
+    def __init__(self, path: str, compress: bool = False, block_size: int = 1 << 20, level: int = 1,
+                 keyframe_interval: int = KEYFRAME_INTERVAL):
+        self.path = path
+        self.compress = compress
+        self.block_size = block_size
+        self.level = level
+        self.keyframe_interval = keyframe_interval
+        self.buffer = bytearray()
+        self.state = TraceState()
+        self.step = -1
+        self.keyframes = []
+        self.file = open(path, 'wb')
+        self.file.write(_FILE_HEADER.pack(MAGIC, VERSION, FLAG_ZLIB if compress else 0))
+
+    def _append(self, kind: int, body: bytes) -> None:
+        self.buffer += _RECORD_HEADER.pack(len(body), kind)
+        self.buffer += body
+        if len(self.buffer) >= self.block_size:
+            self.flush()
+
+    def write_round(self, num_floors: int, num_elevators: int) -> None:
+        self.state.start_round(num_floors, num_elevators)
+        self._append(TRACE_ROUND, _ROUND.pack(num_floors, num_elevators))
+
+    def write_tick(self, tick: int, events, elevators, commands) -> None:
+        '''
+        events: SimulationEvent 列表；elevators: [(位置, 方向 'up'/'down'/'stopped', 载客数)]；
+        commands: [(电梯 id, 楼层, immediate)]
+        '''
+        state = self.state
+        parts = [_TICK.pack(tick, len(events), len(elevators), len(commands))]
+        for e in events:
+            data = e.data
+            elevator, floor, passenger = _field(data, 'elevator'), _field(data, 'floor'), _field(data, 'passenger')
+            parts.append(_EVENT.pack(EVENT_CODE[e.type], elevator, floor, passenger))
+            state.apply_event(e.type, elevator, floor, passenger)
+        for position, direction, load in elevators:
+            parts.append(_ELEVATOR.pack(position, DIRECTION_CODE.get(direction, 0), min(load, 255)))
+        for elevator_id, floor, immediate in commands:
+            parts.append(_COMMAND.pack(elevator_id, floor, immediate))
+        self._append(TRACE_TICK, b''.join(parts))
+
+        self.step += 1
+        state.tick = tick
+        if tick == 0 or self.step % self.keyframe_interval == 0:
+            # 电梯位置只在写关键帧时需要（关键帧里同样以 f32 保存）
+            state.elevators = [position for position, _, _ in elevators]
+            self._write_keyframe()
+
+    def _write_keyframe(self) -> None:
+        '''关键帧必须是块中的第一条记录：先把当前块写盘，再把关键帧作为新块的开头'''
+        self.flush()
+        state = self.state
+        self.keyframes.append(Keyframe(self.step, state.round, state.tick, self.file.tell()))
+        parts = [_KEYFRAME.pack(self.step, state.round, state.tick, state.num_floors,
+                                len(state.elevators), len(state.waiting), len(state.riding))]
+        parts.append(struct.pack(f'<{len(state.elevators)}f', *state.elevators))
+        parts.extend(_PLACEMENT.pack(pid, floor) for pid, floor in state.waiting.items())
+        parts.extend(_PLACEMENT.pack(pid, elevator) for pid, elevator in state.riding.items())
+        self._append(TRACE_KEYFRAME, b''.join(parts))
+
+    def flush(self) -> None:
+        if not self.buffer:
+            return
+        raw = bytes(self.buffer)
+        data = zlib.compress(raw, self.level) if self.compress else raw
+        self.file.write(_BLOCK_HEADER.pack(len(data), len(raw)))
+        self.file.write(data)
+        self.buffer = bytearray()
+
+    def close(self) -> None:
+        '''写出最后一个块和关键帧索引'''
+        if self.file.closed:
+            return
+        self.flush()
+        index_offset = self.file.tell()
+        for keyframe in self.keyframes:
+            self.file.write(_INDEX_ENTRY.pack(*keyframe))
+        self.file.write(_INDEX_TRAILER.pack(len(self.keyframes), self.step + 1, index_offset, INDEX_MAGIC))
+        self.file.close()
+
+
+def _decode_tick(body: bytes) -> TraceTick:
+    tick, num_events, num_elevators, num_commands = _TICK.unpack_from(body, 0)
+    offset = _TICK.size
+    events = [
+        TraceEvent(EVENT_TYPES[code], elevator, floor, passenger)
+        for code, elevator, floor, passenger in _EVENT.iter_unpack(body[offset:offset + num_events * _EVENT.size])
+    ]
+    offset += num_events * _EVENT.size
+    elevators = [TraceElevator(*item) for item in _ELEVATOR.iter_unpack(body[offset:offset + num_elevators * _ELEVATOR.size])]
+    offset += num_elevators * _ELEVATOR.size
+    commands = [
+        TraceCommand(elevator, floor, bool(immediate))
+        for elevator, floor, immediate in _COMMAND.iter_unpack(body[offset:offset + num_commands * _COMMAND.size])
+    ]
+    return TraceTick(tick, events, elevators, commands)
+
+
+def _decode_keyframe(body: bytes) -> Tuple[Keyframe, TraceState]:
+    step, round, tick, num_floors, num_elevators, num_waiting, num_riding = _KEYFRAME.unpack_from(body, 0)
+    offset = _KEYFRAME.size
+    state = TraceState()
+    state.round = round
+    state.tick = tick
+    state.num_floors = num_floors
+    state.elevators = list(struct.unpack_from(f'<{num_elevators}f', body, offset))
+    offset += num_elevators * 4
+    size = _PLACEMENT.size
+    state.waiting = dict(_PLACEMENT.iter_unpack(body[offset:offset + num_waiting * size]))
+    offset += num_waiting * size
+    state.riding = dict(_PLACEMENT.iter_unpack(body[offset:offset + num_riding * size]))
+    return Keyframe(step, round, tick, -1), state
+
+
+def _open_trace(path: str):
+    '''打开文件并检查文件头，返回 (文件, 标志, 块数据结束的位置, 索引尾部)；没有索引时尾部为 None'''
+    f = open(path, 'rb')
+    magic, version, flags = _FILE_HEADER.unpack(f.read(_FILE_HEADER.size))
+    if magic != MAGIC:
+        f.close()
+        raise ValueError(f'{path} is not an elevator trace')
+    if version not in (1, VERSION):
+        f.close()
+        raise ValueError(f'unsupported trace version {version}')
+    end = f.seek(0, 2)
+    trailer = None
+    if end >= _FILE_HEADER.size + _INDEX_TRAILER.size:
+        f.seek(end - _INDEX_TRAILER.size)
+        trailer = _INDEX_TRAILER.unpack(f.read(_INDEX_TRAILER.size))
+        if trailer[3] == INDEX_MAGIC:
+            end = trailer[2]
+        else:
+            trailer = None
+    f.seek(_FILE_HEADER.size)
+    return f, flags, end, trailer
+
+
+def _read_blocks(f, flags: int, end: int, offset: int) -> Iterator[Tuple[int, bytes]]:
+    f.seek(offset)
+    while offset + _BLOCK_HEADER.size <= end:
+        size, raw_size = _BLOCK_HEADER.unpack(f.read(_BLOCK_HEADER.size))
+        data = f.read(size)
+        if len(data) < size:
+            # 进程被强行结束时最后一个块可能不完整
+            return
+        if flags & FLAG_ZLIB:
+            try:
+                data = zlib.decompress(data)
+            except zlib.error:
+                return
+        yield offset, data
+        offset += _BLOCK_HEADER.size + size
+        # 调用方在两次 yield 之间可能移动了文件指针
+        f.seek(offset)
+
+
+def iter_blocks(path: str) -> Iterator[Tuple[int, bytes]]:
+    '''依次返回 (块在文件中的偏移, 解压后的块数据)'''
+    f, flags, end, _ = _open_trace(path)
+    with f:
+        yield from _read_blocks(f, flags, end, _FILE_HEADER.size)
+
+
+def iter_records(block: bytes) -> Iterator[Tuple[int, bytes]]:
+    '''依次返回块中的 (记录类型, 记录内容)'''
+    offset = 0
+    while offset < len(block):
+        length, kind = _RECORD_HEADER.unpack_from(block, offset)
+        offset += _RECORD_HEADER.size
+        yield kind, block[offset:offset + length]
+        offset += length
+
+
+def decode_record(kind: int, body: bytes):
+    if kind == TRACE_ROUND:
+        return TraceRound(*_ROUND.unpack(body))
+    if kind == TRACE_TICK:
+        return _decode_tick(body)
+    if kind == TRACE_KEYFRAME:
+        return _decode_keyframe(body)[0]
+    raise ValueError(f'unknown trace record type {kind}')
+
+
+def read_trace(path: str) -> Iterator:
+    '''按顺序解码整个文件，返回 TraceRound / TraceTick（关键帧只是冗余的状态，这里跳过）'''
+    for _, block in iter_blocks(path):
+        for kind, body in iter_records(block):
+            if kind != TRACE_KEYFRAME:
+                yield decode_record(kind, body)
+
+
+class TraceReplay:
+    '''
+    可跳转的 trace 回放：seek(step) 从不晚于 step 的最近关键帧开始，只解码两者之间的记录，
+    因此跳转的开销与 trace 的总长度无关；next() 顺序前进一步。
+    文件没有索引（运行被强行中断）时扫描一遍块来重建索引；旧版本（没有关键帧）的文件只能从头解码
+    '''
+    def __init__(self, path: str):
+        self.file, self.flags, self.end, trailer = _open_trace(path)
+        if trailer is not None:
+            count, self.total_steps, index_offset, _ = trailer
+            self.file.seek(index_offset)
+            data = self.file.read(count * _INDEX_ENTRY.size)
+            self.keyframes = [Keyframe(*entry) for entry in _INDEX_ENTRY.iter_unpack(data)]
+        else:
+            self._rebuild_index()
+        self._steps = [keyframe.step for keyframe in self.keyframes]
+        self.state = TraceState()
+        self.position = -1
+        self._records = iter(())
+
+    def _rebuild_index(self) -> None:
+        self.keyframes = []
+        steps = 0
+        for offset, block in _read_blocks(self.file, self.flags, self.end, _FILE_HEADER.size):
+            for i, (kind, body) in enumerate(iter_records(block)):
+                if kind == TRACE_TICK:
+                    steps += 1
+                elif kind == TRACE_KEYFRAME and i == 0:
+                    self.keyframes.append(_decode_keyframe(body)[0]._replace(offset = offset))
+        self.total_steps = steps
+
+    def _iter_records(self, offset: int) -> Iterator[Tuple[int, bytes]]:
+        for _, block in _read_blocks(self.file, self.flags, self.end, offset):
+            yield from iter_records(block)
+
+    def round_start(self, round: int) -> int:
+        '''第 round 轮（从 0 开始）tick 0 所在的步号'''
+        for keyframe in self.keyframes:
+            if keyframe.round == round and keyframe.tick == 0:
+                return keyframe.step
+        return 0
+
+    def seek(self, step: int) -> Optional[Snapshot]:
+        '''跳转到第 step 步（超出范围时取边界），返回该步之后的快照'''
+        if self.total_steps <= 0:
+            return None
+        step = max(0, min(step, self.total_steps - 1))
+        index = bisect.bisect_right(self._steps, step) - 1
+        if index >= 0:
+            keyframe = self.keyframes[index]
+            self._records = self._iter_records(keyframe.offset)
+            kind, body = next(self._records)
+            _, self.state = _decode_keyframe(body)
+            self.position = keyframe.step
+        else:
+            self._records = self._iter_records(_FILE_HEADER.size)
+            self.state = TraceState()
+            self.position = -1
+        while self.position < step:
+            if not self._advance():
+                break
+        return self.state.snapshot()
+
+    def _advance(self) -> bool:
+        '''解码到下一条 TRACE_TICK 为止'''
+        for kind, body in self._records:
+            if kind == TRACE_ROUND:
+                self.state.start_round(*_ROUND.unpack(body))
+            elif kind == TRACE_TICK:
+                self.state.apply_tick(_decode_tick(body))
+                self.position += 1
+                return True
+        return False
+
+    def next(self) -> Optional[Snapshot]:
+        '''前进一步；已经是最后一步时返回 None'''
+        if self.position + 1 >= self.total_steps or not self._advance():
+            return None
+        return self.state.snapshot()
+
+    def close(self) -> None:
+        self.file.close()
@@ -0,0 +1,92 @@
+'''
+EtaTable 增量更新的随机校验
+随机生成电梯移动和停靠点增减，每一步之后把增量维护的表与按同样状态从头重算的表逐项比较。
+move 的整行平移和 _stop_changed 的停靠时间增减只在特定条件下生效，改动这两处之后应该跑一遍。
+
+用法：
+python -m tools.check_eta_table [--seeds 30] [--ops 2000] [--floors 20] [--elevators 4]
+'''
+import argparse
+import random
+import sys
+
+import numpy as np
+
+from eta_table import EtaTable
+
+# 电梯每 tick 行驶的层数（与 eta_table.TICKS_PER_FLOOR 一致）
+STEP = 0.2
+
+
+def rebuild(table: EtaTable) -> EtaTable:
+    '''按 table 当前的位置、方向和停靠点从头计算的表'''
+    fresh = EtaTable(*table.stops.shape)
+    fresh.stops[:] = table.stops
+    fresh.position[:] = table.position
+    fresh.direction[:] = table.direction
+    for elevator_id in range(len(fresh.position)):
+        fresh._recompute(elevator_id)
+    return fresh
+
+
+def random_op(rng: random.Random, table: EtaTable) -> None:
+    '''一次随机操作：大部分是沿当前方向前进一步，其余为增减停靠点或换方向'''
+    num_elevators, num_floors = table.stops.shape
+    elevator_id = rng.randrange(num_elevators)
+    r = rng.random()
+    if r < 0.5:
+        direction = int(table.direction[elevator_id]) or rng.choice((1, -1))
+        position = round(float(table.position[elevator_id]) + direction * STEP, 6)
+        if not 0 <= position <= num_floors - 1:
+            direction = -direction
+            position = round(float(table.position[elevator_id]) + direction * STEP, 6)
+        table.move(elevator_id, position, direction)
+    elif r < 0.75:
+        table.add_stop(elevator_id, rng.randrange(num_floors))
+    elif r < 0.95:
+        stops = np.flatnonzero(table.stops[elevator_id])
+        if len(stops):
+            table.remove_stop(elevator_id, int(rng.choice(stops.tolist())))
+    else:
+        table.move(elevator_id, float(table.position[elevator_id]), rng.choice((1, -1, 0)))
+
+
+def check(seed: int, ops: int, floors: int, elevators: int) -> int:
+    '''跑一个种子，返回不一致的检查点个数'''
+    rng = random.Random(seed)
+    table = EtaTable(elevators, floors)
+    mismatches = 0
+    for i in range(ops):
+        random_op(rng, table)
+        expected = rebuild(table)
+        for elevator_id in range(elevators):
+            row = table.row(elevator_id)
+            if not np.allclose(row, expected.eta[elevator_id], atol=1e-6):
+                mismatches += 1
+                bad = np.argwhere(~np.isclose(row, expected.eta[elevator_id], atol=1e-6))
+                floor, direction = bad[0]
+                print(f'seed {seed} op {i} elevator {elevator_id}: floor {floor} dir {direction} '
+                      f'incremental {row[floor, direction]:.3f} expected {expected.eta[elevator_id, floor, direction]:.3f}')
+                # 从正确的状态继续，避免一个错误在后面的每一步重复报告
+                table.eta[elevator_id] = expected.eta[elevator_id]
+                table.dist[elevator_id] = expected.dist[elevator_id]
+    return mismatches
+
+
+def main():
+    parser = argparse.ArgumentParser(description='EtaTable 增量更新的随机校验')
+    parser.add_argument('--seeds', type=int, default=30)
+    parser.add_argument('--ops', type=int, default=2000)
+    parser.add_argument('--floors', type=int, default=20)
+    parser.add_argument('--elevators', type=int, default=4)
+    args = parser.parse_args()
+
+    total = 0
+    for seed in range(args.seeds):
+        total += check(seed, args.ops, args.floors, args.elevators)
+    print(f'{args.seeds} seeds x {args.ops} ops: {total} mismatches')
+    sys.exit(1 if total else 0)
+
+
+if __name__ == '__main__':
+    main()
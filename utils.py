@@ -2,11 +2,15 @@
 prensted by LiYongKang
 The util includes several common class definitions and functions.
 '''
+from array import array
+import struct
 
 class Message:
     '''
     Message class for inter-process communication.
     '''
+    __slots__ = ('type', 'object', 'id', 'floor', 'state', 'delay')
+
     def __init__(self, type: str, object: str, id: int, floor: int, state  : int = 0, delay = False):
         self.type = type  # 'init', 'passenger', 'elevator'
         self.object = object  # 'elevator' or 'passenger'
@@ -16,3 +20,191 @@ class Message:
         self.delay = delay
       
 
+
+
+class HallCallIndex:
+    '''
+    楼层呼叫索引：按 (楼层, 方向) 记录等待人数，并用树状数组 (Fenwick tree) 维护各层总人数的前缀和。
+    - 查询“某层以上/以下是否有人在等”：O(log F)
+    - 查询“某层某方向是否有人在等”：O(1)
+    - 乘客呼叫 / 上电梯时增量更新：O(log F)
+    '''
+    def __init__(self, num_floors: int):
+        self.num_floors = num_floors
+        self.up = [0] * num_floors  # 每层等待上行的人数
+        self.down = [0] * num_floors  # 每层等待下行的人数
+        self.tree = [0] * (num_floors + 1)  # 树状数组，下标从 1 开始
+        self.total = 0
+
+    def _update(self, floor: int, delta: int):
+        i = floor + 1
+        while i <= self.num_floors:
+            self.tree[i] += delta
+            i += i & (-i)
+        self.total += delta
+
+    def _prefix(self, floor: int) -> int:
+        '''返回 [0, floor] 层的等待总人数'''
+        i = min(floor, self.num_floors - 1) + 1
+        s = 0
+        while i > 0:
+            s += self.tree[i]
+            i -= i & (-i)
+        return s
+
+    def add(self, floor: int, direction: str):
+        '''登记一个呼叫，direction 为 'up' 或 'down' '''
+        if direction == 'up':
+            self.up[floor] += 1
+        else:
+            self.down[floor] += 1
+        self._update(floor, 1)
+
+    def remove(self, floor: int, direction: str):
+        '''撤销一个呼叫（乘客已上电梯），计数不会减到负数'''
+        counts = self.up if direction == 'up' else self.down
+        if counts[floor] <= 0:
+            return
+        counts[floor] -= 1
+        self._update(floor, -1)
+
+    def count_here(self, floor: int, direction: str) -> int:
+        return self.up[floor] if direction == 'up' else self.down[floor]
+
+    def any_above(self, floor: int) -> bool:
+        if floor < 0:
+            return self.total > 0
+        return self.total - self._prefix(floor) > 0
+
+    def any_below(self, floor: int) -> bool:
+        if floor <= 0:
+            return False
+        return self._prefix(floor - 1) > 0
+
+    def _find(self, k: int) -> int:
+        '''前缀和 >= k 的最低楼层（树上二分），k 须在 [1, total] 内'''
+        pos = 0
+        step = 1 << self.num_floors.bit_length()
+        while step:
+            nxt = pos + step
+            if nxt <= self.num_floors and self.tree[nxt] < k:
+                pos = nxt
+                k -= self.tree[nxt]
+            step >>= 1
+        return pos
+
+    def lowest(self):
+        '''有人等待的最低楼层，没有呼叫时返回 None：O(log F)'''
+        return self._find(1) if self.total > 0 else None
+
+    def highest(self):
+        '''有人等待的最高楼层，没有呼叫时返回 None：O(log F)'''
+        return self._find(self.total) if self.total > 0 else None
+
+
+# 解耦模式下快照缓冲区的容量：GUI 落后超过这么多 tick 时，控制器丢弃最旧的快照
+SNAPSHOT_BUFFER = 8
+
+
+class Snapshot:
+    '''
+    解耦（非锁步）模式下每个 tick 的完整世界状态，GUI 只需要最新的一份就能重建画面。
+    elevators: 按电梯 id 排列的浮点楼层位置
+    waiting: [(乘客 id, 所在楼层)]
+    riding: [(乘客 id, 电梯 id)]
+    round: 第几轮流量。新一轮的乘客 id 从 1 重新编号，GUI 看到 round 变化时必须重建场景
+    不在 waiting / riding 中的乘客视为已经离开
+    '''
+    __slots__ = ('tick', 'num_floors', 'elevators', 'waiting', 'riding', 'round')
+
+    def __init__(self, tick: int, num_floors: int, elevators, waiting, riding, round: int = 0):
+        self.tick = tick
+        self.num_floors = num_floors
+        self.elevators = elevators
+        self.waiting = waiting
+        self.riding = riding
+        self.round = round
+
+
+# ---------------- 每个 tick 一帧的紧凑编码 ----------------
+# 锁步模式下，一个 tick 的所有消息打包成一帧（列式数组），整帧只作为一个队列元素发送，GUI 一次解码
+FRAME_INIT_FLOOR = 0  # id 无意义，floor 为楼层数
+FRAME_INIT_ELEVATOR = 1
+FRAME_INIT_PASSENGER = 2
+FRAME_ELEVATOR = 3
+FRAME_PASSENGER = 4  # state: -1 前往销毁位置 / -2 随电梯移动 / >=0 走进该电梯
+
+_FRAME_HEADER = struct.Struct('<I')  # 记录条数
+
+
+class FrameBuilder:
+    '''
+    按列收集一个 tick 内的消息记录：kind / id / floor / state / delay 各占一个 array，
+    追加只是 C 层面的数组写入，最后 to_bytes 拼成一段连续内存
+    '''
+    __slots__ = ('kinds', 'ids', 'floors', 'states', 'delays')
+
+    def __init__(self):
+        self.kinds = array('b')
+        self.ids = array('i')
+        self.floors = array('f')
+        self.states = array('h')
+        self.delays = array('b')
+
+    def add(self, kind: int, id: int, floor: float, state: int = 0, delay: bool = False):
+        self.kinds.append(kind)
+        self.ids.append(id)
+        self.floors.append(floor)
+        self.states.append(state)
+        self.delays.append(delay)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def to_bytes(self) -> bytes:
+        return b''.join((
+            _FRAME_HEADER.pack(len(self.kinds)),
+            self.kinds.tobytes(), self.ids.tobytes(), self.floors.tobytes(),
+            self.states.tobytes(), self.delays.tobytes(),
+        ))
+
+
+def decode_frame(buf: bytes):
+    '''把 FrameBuilder.to_bytes 的结果解码为 [(kind, id, floor, state, delay), ...]'''
+    n, = _FRAME_HEADER.unpack_from(buf)
+    view = memoryview(buf)[_FRAME_HEADER.size:]
+    columns = []
+    for typecode in ('b', 'i', 'f', 'h', 'b'):
+        column = array(typecode)
+        size = n * column.itemsize
+        column.frombytes(view[:size])
+        view = view[size:]
+        columns.append(column)
+    return list(zip(*columns))
+
+
+_SNAPSHOT_HEADER = struct.Struct('<iiiiii')  # 轮次, tick, 楼层数, 电梯数, 等待人数, 乘梯人数
+
+
+def encode_snapshot(snapshot: Snapshot) -> bytes:
+    '''解耦模式的快照编码：定长头 + 电梯位置 float 数组 + (乘客, 楼层/电梯) int 对数组'''
+    waiting = array('i', [v for pair in snapshot.waiting for v in pair])
+    riding = array('i', [v for pair in snapshot.riding for v in pair])
+    return b''.join((
+        _SNAPSHOT_HEADER.pack(snapshot.round, snapshot.tick, snapshot.num_floors, len(snapshot.elevators),
+                              len(snapshot.waiting), len(snapshot.riding)),
+        array('f', snapshot.elevators).tobytes(), waiting.tobytes(), riding.tobytes(),
+    ))
+
+
+def decode_snapshot(buf: bytes) -> Snapshot:
+    round, tick, num_floors, n_elevators, n_waiting, n_riding = _SNAPSHOT_HEADER.unpack_from(buf)
+    view = memoryview(buf)[_SNAPSHOT_HEADER.size:]
+    elevators = array('f')
+    elevators.frombytes(view[:n_elevators * elevators.itemsize])
+    view = view[n_elevators * elevators.itemsize:]
+    pairs = array('i')
+    pairs.frombytes(view[:(n_waiting + n_riding) * 2 * pairs.itemsize])
+    waiting = list(zip(pairs[0:n_waiting * 2:2], pairs[1:n_waiting * 2:2]))
+    riding = list(zip(pairs[n_waiting * 2::2], pairs[n_waiting * 2 + 1::2]))
+    return Snapshot(tick, num_floors, list(elevators), waiting, riding, round)
@@ -0,0 +1,148 @@
+'''
+GUI 的视口：电梯井布局和摄像机
+- ShaftLayout：按电梯数计算每个电梯井、墙和销毁位置的横坐标，电梯数不再受固定坐标表的限制；
+- Camera：世界坐标到屏幕坐标的平移 + 缩放，可以滚动、按离散的缩放级别缩放，并给出当前可见的楼层范围。
+世界坐标的单位是 1 倍缩放时的像素；楼层 f 的地面在 y = -f * floor_height（向上为负，与屏幕方向一致），
+x 与原来的屏幕横坐标相同。电梯数不超过 5、楼层不超过 6 层时 1 倍缩放下的画面与原来的固定布局完全一样。
+'''
+import math
+
+
+class ShaftLayout:
+    def __init__(self, num_elevators = 0, first = 250, spacing = 100, min_wall = 700, wall_width = 100):
+        '''first / spacing：第一个电梯井的横坐标和电梯井间距；墙至少在 min_wall，墙外 50 像素处是乘客的销毁位置'''
+        self.first = first
+        self.spacing = spacing
+        self.min_wall = min_wall
+        self.wall_width = wall_width
+        self.resize(num_elevators)
+
+    def resize(self, num_elevators):
+        '''电梯数变化后重新计算墙和销毁位置，返回世界宽度是否变化'''
+        width = getattr(self, 'width', None)
+        self.num_elevators = num_elevators
+        self.wall_x = max(self.min_wall, self.shaft_x(num_elevators - 1) + self.spacing // 2)
+        self.destroy_x = self.wall_x + 50
+        self.width = self.wall_x + self.wall_width
+        return width != self.width
+
+    def shaft_x(self, elevator_id):
+        return self.first + elevator_id * self.spacing
+
+    def shaft_index(self, x):
+        '''横坐标（可以是 NumPy 数组）最近的电梯井编号'''
+        return ((x - self.first) / self.spacing + 0.5) // 1
+
+
+class Camera:
+    '''
+    屏幕坐标 = (世界坐标 - (x0, y0)) * zoom。缩放只取 ZOOMS 中的级别，贴图按级别缓存。
+    version 在视图每次变化时加一，GUI 据此重新烘焙静态图层
+    '''
+    ZOOMS = (0.0625, 0.125, 0.1875, 0.25, 0.375, 0.5, 0.75, 1.0, 1.5, 2.0)
+
+    def __init__(self, screen_width, screen_height, floor_height, margin = 100):
+        '''margin：一楼地面下方和顶层上方留出的屏幕像素'''
+        self.screen_width = screen_width
+        self.screen_height = screen_height
+        self.floor_height = floor_height
+        self.margin = margin
+        self.world_width = screen_width
+        self.num_floors = 0
+        self.level = self.ZOOMS.index(1.0)
+        self.x0 = 0.0
+        self.y0 = -(screen_height - margin)
+        self.version = 0
+
+    @property
+    def zoom(self):
+        return self.ZOOMS[self.level]
+
+    def world_y(self, floor):
+        return -floor * self.floor_height
+
+    def to_world(self, sx, sy):
+        return self.x0 + sx / self.zoom, self.y0 + sy / self.zoom
+
+    def screen_x(self, x):
+        return round((x - self.x0) * self.zoom)
+
+    def screen_y(self, y):
+        return round((y - self.y0) * self.zoom)
+
+    def fit(self, world_width, num_floors, min_zoom = 0.375):
+        '''
+        换一栋楼：选能放下整栋楼的最大级别（不超过 1 倍），楼太高时不低于 min_zoom，镜头对准一楼，可以向上滚动
+        '''
+        self.world_width = world_width
+        self.num_floors = num_floors
+        height = num_floors * self.floor_height
+        fits = [i for i, zoom in enumerate(self.ZOOMS)
+                if zoom <= 1.0 and world_width * zoom <= self.screen_width
+                and height * zoom <= self.screen_height - 2 * self.margin]
+        floor = min(i for i, zoom in enumerate(self.ZOOMS) if zoom >= min(min_zoom, 1.0))
+        self.level = max(fits + [floor]) if fits else floor
+        self.x0 = 0.0
+        self.y0 = -(self.screen_height - self.margin) / self.zoom
+        self._clamp()
+        self.version += 1
+
+    def overview(self):
+        '''缩小到能看到整栋楼（或最小的级别）'''
+        height = self.num_floors * self.floor_height
+        level = 0
+        for i, zoom in enumerate(self.ZOOMS):
+            if self.world_width * zoom <= self.screen_width and height * zoom <= self.screen_height - 2 * self.margin:
+                level = i
+        return self.zoom_to(level, self.screen_width / 2, self.screen_height / 2)
+
+    def _clamp(self):
+        zoom = self.zoom
+        view_width = self.screen_width / zoom
+        # 横向：整栋楼放得下时靠左，否则限制在楼的范围内
+        if self.world_width <= view_width:
+            self.x0 = 0.0
+        else:
+            self.x0 = min(max(self.x0, 0.0), self.world_width - view_width)
+        # 纵向：一楼地面不高于屏幕下方 margin 处，顶层不低于屏幕上方 margin 处；放得下时一楼对齐到下方
+        lowest = -(self.screen_height - self.margin) / zoom
+        highest = self.world_y(self.num_floors) - self.margin / zoom
+        if highest >= lowest:
+            self.y0 = lowest
+        else:
+            self.y0 = min(max(self.y0, highest), lowest)
+
+    def scroll(self, dx, dy):
+        '''按屏幕像素平移，返回视图是否变化'''
+        old = (self.x0, self.y0)
+        self.x0 += dx / self.zoom
+        self.y0 += dy / self.zoom
+        self._clamp()
+        if (self.x0, self.y0) != old:
+            self.version += 1
+            return True
+        return False
+
+    def zoom_by(self, steps, sx = None, sy = None):
+        '''放大（steps > 0）或缩小若干级，(sx, sy) 处的世界坐标保持在屏幕上不动，默认为屏幕中心'''
+        level = min(max(self.level + steps, 0), len(self.ZOOMS) - 1)
+        return self.zoom_to(level, self.screen_width / 2 if sx is None else sx, self.screen_height / 2 if sy is None else sy)
+
+    def zoom_to(self, level, sx, sy):
+        if level == self.level:
+            return False
+        wx, wy = self.to_world(sx, sy)
+        self.level = level
+        self.x0 = wx - sx / self.zoom
+        self.y0 = wy - sy / self.zoom
+        self._clamp()
+        self.version += 1
+        return True
+
+    def visible_floors(self):
+        '''屏幕上能看到的楼层 range（含楼顶那一层楼板，即最大为 num_floors）'''
+        top = self.y0
+        bottom = self.y0 + self.screen_height / self.zoom
+        first = max(0, math.floor(-bottom / self.floor_height))
+        last = min(self.num_floors, math.ceil(-top / self.floor_height))
+        return range(first, last + 1)